@@ -1,108 +1,46 @@
 import arcade
-import random
-import math
+import argparse
+from frame_recording import RecordingWriter, open_recording, writer_class_for
+from compact_recording import CompactRecordingWriter
+from batch_renderer import CircleBatch
+from playback import Playback
+from scenarios import initial_states, make_engine
+from backends import BACKENDS
+from checkpoint import load_checkpoint, record_run
+from run_cache import RunCache, run_config
 
 SCREEN_WIDTH = 2000
 SCREEN_HEIGHT = 900
 SCREEN_TITLE = "Simulação Bola - Pré-processada"
 
+# Frames gravados em disco e reproduzidos por memory map
+# "sequential" reproduz exatamente a ordem da força bruta; "jacobi" é vetorizado
+MODO_COLISAO = "sequential"
+# Regras de física (scenarios.py) e backend padrão (backends.py); o backend
+# também pode ser escolhido com --backend. O "process" faz o passo de cada
+# frame em um processo por núcleo, por faixas verticais da tela (com poucas
+# bolas, no principal); os pares entre faixas são resolvidos em Jacobi, então
+# com ele o "sequential" segue a ordem da força bruta só dentro de cada faixa
+CENARIO = "bolinha"
+BACKEND = "process"
+# Semente do estado inicial (None: sorteio diferente a cada execução)
+SEED = 0
+CHECKPOINT_A_CADA = 10  # frames entre checkpoints (retomar com --resume)
+# Posições quantizadas e codificadas por predição (ver compact_recording.py)
+FORMATO_COMPACTO = True
+# Execuções já feitas com a mesma configuração e semente saem do cache
+# (run_cache.py), sem simular de novo; as menos usadas saem ao passar do limite
+USAR_CACHE = True
+PASTA_CACHE = "cache_execucoes"
+LIMITE_CACHE = 2 * 1024 ** 3  # bytes
+QUADROS_POR_PASSO = 10  # Shift + seta na reprodução
+ARQUIVO_GRAVACAO = "bolinha-preprocessing.rec"
+
 NUM_BALLS = 32000 # 21 horas
 NUM_BALLS = 2000 # 21 horas
 
 SIMULATION_FRAMES = 30 * 5  # 5 segundos a 30fps
 
-class Bola:
-    def __init__(self, x, y, vx, vy, radius=10, cor=None):
-        self.x = x
-        self.y = y
-        self.vx = vx
-        self.vy = vy
-        self.radius = radius
-        self.cor = cor or (
-            random.randint(0, 255),
-            random.randint(0, 255),
-            random.randint(0, 255)
-        )
-
-    def mover(self):
-        self.x += self.vx
-        self.y += self.vy
-
-        if self.x + self.radius > SCREEN_WIDTH:
-            self.x = SCREEN_WIDTH - self.radius
-            self.vx *= -1
-        if self.x - self.radius < 0:
-            self.x = self.radius
-            self.vx *= -1
-        if self.y + self.radius > SCREEN_HEIGHT:
-            self.y = SCREEN_HEIGHT - self.radius
-            self.vy *= -1
-        if self.y - self.radius < 0:
-            self.y = self.radius
-            self.vy *= -1
-
-    def desenhar(self):
-        arcade.draw_circle_filled(self.x, self.y, self.radius, self.cor)
-
-    def colidiu_com(self, outra):
-        dx = self.x - outra.x
-        dy = self.y - outra.y
-        dist = math.hypot(dx, dy)
-        return dist < self.radius + outra.radius
-
-    def resolver_colisao(self, outra):
-        dx = outra.x - self.x
-        dy = outra.y - self.y
-        dist = math.hypot(dx, dy)
-        if dist == 0:
-            return
-
-        nx = dx / dist
-        ny = dy / dist
-        tx = -ny
-        ty = nx
-
-        v1n = self.vx * nx + self.vy * ny
-        v1t = self.vx * tx + self.vy * ty
-        v2n = outra.vx * nx + outra.vy * ny
-        v2t = outra.vx * tx + outra.vy * ty
-
-        v1n, v2n = v2n, v1n
-
-        self.vx = v1n * nx + v1t * tx
-        self.vy = v1n * ny + v1t * ty
-        outra.vx = v2n * nx + v2t * tx
-        outra.vy = v2n * ny + v2t * ty
-
-        sobreposicao = self.radius + outra.radius - dist
-        self.x -= nx * sobreposicao / 2
-        self.y -= ny * sobreposicao / 2
-        outra.x += nx * sobreposicao / 2
-        outra.y += ny * sobreposicao / 2
-
-def simular_frame(args):
-    bolas_state, width, height = args
-    bolas = []
-    for b in bolas_state:
-        bola = Bola(b[0], b[1], b[2], b[3], b[4], b[5])
-        bolas.append(bola)
-
-    for bola in bolas:
-        bola.mover()
-
-    n = len(bolas)
-    for i in range(n):
-        for j in range(i + 1, n):
-            b1 = bolas[i]
-            b2 = bolas[j]
-            if b1.colidiu_com(b2):
-                b1.resolver_colisao(b2)
-
-    novo_estado = []
-    for b in bolas:
-        novo_estado.append((b.x, b.y, b.vx, b.vy, b.radius, b.cor))
-    return novo_estado
-
 def barra_progresso(atual, total, comprimento=40):
     proporcao = atual / total
     preenchido = int(comprimento * proporcao)
@@ -111,64 +49,145 @@ def barra_progresso(atual, total, comprimento=40):
     if atual == total:
         print()
 
-def preprocessar_bolas(bolas_iniciais, num_frames):
-    estados = []
-    estado_atual = bolas_iniciais
-    for i in range(num_frames):
-        estado_atual = simular_frame((estado_atual, SCREEN_WIDTH, SCREEN_HEIGHT))
-        estados.append(estado_atual)
-        barra_progresso(i + 1, num_frames)
-    return estados
+def preprocessar_bolas(bolas_iniciais, num_frames, caminho=ARQUIVO_GRAVACAO, modo="novo", backend=BACKEND):
+    # modo "novo": simula do zero; "retomar": continua do último checkpoint
+    # até num_frames; "estender": acrescenta num_frames a uma gravação pronta
+    checkpoint = caminho + ".ckpt"
+    if modo == "novo":
+        motor = make_engine(
+            CENARIO, bolas_iniciais, backend=backend, collision_mode=MODO_COLISAO,
+        )
+        total = num_frames
+    else:
+        motor = load_checkpoint(checkpoint)
+        total = num_frames if modo == "retomar" else motor.frame + num_frames
+
+    if modo == "novo":
+        formato = CompactRecordingWriter if FORMATO_COMPACTO else RecordingWriter
+    else:
+        formato = writer_class_for(caminho)
+    try:
+        record_run(motor, caminho, total, checkpoint, CHECKPOINT_A_CADA,
+                   append=modo != "novo", progress=barra_progresso, writer_class=formato)
+    finally:
+        motor.close()
+    return open_recording(caminho)
+
+def configuracao(seed, backend=BACKEND):
+    # Tudo o que define a gravação de uma simulação nova (chave do cache)
+    return run_config(
+        CENARIO, NUM_BALLS, SIMULATION_FRAMES, seed, backend, MODO_COLISAO,
+        compact=FORMATO_COMPACTO,
+    )
 
 class Jogo(arcade.Window):
-    def __init__(self, estados_simulados):
+    def __init__(self, gravacao):
         super().__init__(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE)
         arcade.set_background_color(arcade.color.WHITE)
-        self.estados_simulados = estados_simulados
-        self.frame_atual = 0
-        self.direcao = 1  # 1 = ida, -1 = volta
-        self.bolas = []
-        if estados_simulados:
-            primeiro_estado = estados_simulados[0]
-            for b in primeiro_estado:
-                bola = Bola(b[0], b[1], b[2], b[3], b[4], b[5])
-                self.bolas.append(bola)
+        self.gravacao = gravacao
+        # Vai-e-volta como antes. Espaço pausa, as setas andam quadro a quadro
+        # (com Shift, QUADROS_POR_PASSO), cima/baixo dobram ou dividem a
+        # velocidade, R inverte, Home/End e 0-9 pulam para um ponto, e clicar
+        # ou arrastar na janela posiciona a reprodução
+        self.reproducao = Playback(len(gravacao))
+        # Raio e cor são fixos: vão para o lote uma vez, e só quando o frame
+        # muda as posições dele são lidas da gravação e copiadas para o lote
+        self.lote = CircleBatch(self.ctx, capacity=max(1, gravacao.num_balls))
+        if len(gravacao):
+            inicio = gravacao.positions(0)
+            self.lote.update(inicio[:, 0], inicio[:, 1], gravacao.radius, gravacao.color)
+        self.desenhado = 0
 
     def on_draw(self):
         self.clear()
-        for bola in self.bolas:
-            bola.desenhar()
+        if len(self.gravacao):
+            frame = self.reproducao.frame
+            if frame != self.desenhado:
+                self.lote.update_points(self.gravacao.positions(frame))
+                self.desenhado = frame
+            self.lote.draw()
+        arcade.draw_text(self.reproducao.status(), 10, SCREEN_HEIGHT - 30, arcade.color.BLACK, 14)
 
     def on_update(self, delta_time):
-        estado = self.estados_simulados[self.frame_atual]
-        for i, b in enumerate(estado):
-            self.bolas[i].x = b[0]
-            self.bolas[i].y = b[1]
-            self.bolas[i].vx = b[2]
-            self.bolas[i].vy = b[3]
-            self.bolas[i].radius = b[4]
-            self.bolas[i].cor = b[5]
-
-        self.frame_atual += self.direcao
-        if self.frame_atual >= len(self.estados_simulados) - 1:
-            self.direcao = -1
-        elif self.frame_atual <= 0:
-            self.direcao = 1
+        self.reproducao.advance()
+
+    def on_key_press(self, key, modifiers):
+        reproducao = self.reproducao
+        passo = QUADROS_POR_PASSO if modifiers & arcade.key.MOD_SHIFT else 1
+        if key == arcade.key.SPACE:
+            reproducao.toggle_pause()
+        elif key == arcade.key.RIGHT:
+            reproducao.step(passo)
+        elif key == arcade.key.LEFT:
+            reproducao.step(-passo)
+        elif key == arcade.key.UP:
+            reproducao.scale_speed(2)
+        elif key == arcade.key.DOWN:
+            reproducao.scale_speed(0.5)
+        elif key == arcade.key.R:
+            reproducao.reverse()
+        elif key == arcade.key.HOME:
+            reproducao.seek(0)
+        elif key == arcade.key.END:
+            reproducao.seek(reproducao.last)
+        elif arcade.key.KEY_0 <= key <= arcade.key.KEY_9:
+            reproducao.seek_fraction((key - arcade.key.KEY_0) / 10)
+
+    def on_mouse_press(self, x, y, button, modifiers):
+        self.reproducao.seek_fraction(x / self.width)
+
+    def on_mouse_drag(self, x, y, dx, dy, buttons, modifiers):
+        self.reproducao.seek_fraction(x / self.width)
 
 def main():
-    bolas = []
-    for _ in range(NUM_BALLS):
-        x = random.randint(50, SCREEN_WIDTH - 50)
-        y = random.randint(50, SCREEN_HEIGHT - 50)
-        vx = random.uniform(-3, 3)
-        vy = random.uniform(-3, 3)
-        radius = random.randint(2, 5)
-        cor = (random.randint(0, 255), random.randint(0, 255), random.randint(0, 255))
-        bolas.append((x, y, vx, vy, radius, cor))
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--replay", action="store_true",
+                        help="reproduz a última gravação sem simular de novo")
+    parser.add_argument("--resume", action="store_true",
+                        help="continua a simulação do último checkpoint")
+    parser.add_argument("--extend", type=int, metavar="N",
+                        help="acrescenta N frames a uma gravação já concluída")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default=BACKEND,
+                        help="backend de física de uma simulação nova")
+    parser.add_argument("--seed", type=int, default=SEED,
+                        help="semente do estado inicial de uma simulação nova")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="simula de novo mesmo com a execução no cache")
+    args = parser.parse_args()
+
+    if args.replay:
+        janela = Jogo(open_recording(ARQUIVO_GRAVACAO))
+        arcade.run()
+        return
+
+    if args.resume or args.extend:
+        modo = "retomar" if args.resume else "estender"
+        num_frames = SIMULATION_FRAMES if args.resume else args.extend
+        print("Continuando o pré-processamento a partir do checkpoint...")
+        estados = preprocessar_bolas(None, num_frames, modo=modo)
+        print("Pré-processamento concluído!")
+        janela = Jogo(estados)
+        arcade.run()
+        return
+
+    cache = None
+    if USAR_CACHE and not args.no_cache and args.seed is not None:
+        cache = RunCache(PASTA_CACHE, LIMITE_CACHE)
+        config = configuracao(args.seed, args.backend)
+        guardada = cache.lookup(config)
+        if guardada is not None:
+            print(f"Reutilizando a gravação do cache: {guardada}")
+            janela = Jogo(open_recording(guardada))
+            arcade.run()
+            return
+
+    bolas = initial_states(CENARIO, NUM_BALLS, args.seed)
 
     print("Iniciando pré-processamento dos frames...")
-    estados = preprocessar_bolas(bolas, SIMULATION_FRAMES)
+    estados = preprocessar_bolas(bolas, SIMULATION_FRAMES, backend=args.backend)
     print("Pré-processamento concluído!")
+    if cache is not None:
+        cache.store(config, ARQUIVO_GRAVACAO)
 
     janela = Jogo(estados)
     arcade.run()
@@ -1,6 +1,41 @@
 import arcade
+import argparse
 import random
 import math
+from spatial_hash import grid_pairs, cell_size_for
+from sweep_prune import SweepAndPrune
+from quadtree import LooseQuadtree
+from batch_renderer import CircleBatch
+from scenarios import make_engine
+from backends import BACKENDS
+from fixed_step import FixedTimestep, interpolate
+from seeding import seeded
+
+# Broad-phase: "grid" (grade espacial), "sweep" (sweep-and-prune com a
+# ordem mantida entre frames), "tree" (quadtree loose, para raios muito
+# diferentes) ou "brute" (testa todos os pares)
+BROAD_PHASE = "sweep"
+# Guarda as bolas em arrays NumPy (BallWorld) em vez de objetos Bola
+USE_NUMPY_WORLD = True
+# Regras de física (scenarios.py) e backend do passo do mundo NumPy
+# (backends.py), também escolhido com --backend; spatial e process usam a
+# BROAD_PHASE acima, e a força bruta no mundo NumPy é o backend numpy
+CENARIO = "bolinha"
+BACKEND = "numpy" if BROAD_PHASE == "brute" else "spatial"
+# Resolve as colisões em lote (Jacobi); desligado, segue a ordem da força bruta
+USE_BATCHED_COLLISIONS = False
+# Desenha todas as bolas numa única chamada instanciada (requer USE_NUMPY_WORLD)
+USE_BATCH_RENDERER = True
+# Física em passo fixo (PHYSICS_RATE passos por segundo, no máximo
+# MAX_STEPS_PER_FRAME por frame), independente da taxa de desenho; o desenho
+# do mundo NumPy interpola entre os dois últimos estados
+USE_FIXED_TIMESTEP = True
+PHYSICS_RATE = 60
+RENDER_RATE = 60
+MAX_STEPS_PER_FRAME = 5
+
+# Semente dos sorteios (None: cada execução é diferente)
+SEED = 0
 
 SCREEN_WIDTH = 2000
 SCREEN_HEIGHT = 900
@@ -86,8 +121,9 @@ class Bola:
 
 
 class MyGame(arcade.Window):
-    def __init__(self):
-        super().__init__(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE)
+    def __init__(self, backend=BACKEND):
+        super().__init__(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE,
+                         update_rate=1 / RENDER_RATE, draw_rate=1 / RENDER_RATE)
         arcade.set_background_color(arcade.color.WHITE)
         self.bolas = []
 
@@ -98,17 +134,72 @@ class MyGame(arcade.Window):
             vy = random.uniform(-3, 3)
             self.bolas.append(Bola(x, y, vx, vy))
 
+        # Tamanho da célula adaptado ao maior raio sorteado
+        self.raios = [bola.radius for bola in self.bolas]
+        self.tamanho_celula = cell_size_for(self.raios)
+        self.varredura = SweepAndPrune()
+        self.arvore = LooseQuadtree(SCREEN_WIDTH, SCREEN_HEIGHT)
+        self.relogio = FixedTimestep(PHYSICS_RATE, MAX_STEPS_PER_FRAME)
+
+        self.motor = None
+        if USE_NUMPY_WORLD:
+            estados = [(bola.x, bola.y, bola.vx, bola.vy, bola.radius, bola.cor) for bola in self.bolas]
+            opcoes = {"broad_phase": BROAD_PHASE} if backend in ("spatial", "process") else {}
+            self.motor = make_engine(
+                CENARIO, estados, backend=backend,
+                collision_mode="jacobi" if USE_BATCHED_COLLISIONS else "sequential", **opcoes,
+            )
+            self.mundo = self.motor.world
+            self.lote = CircleBatch(self.ctx, capacity=len(self.bolas))
+            self.anterior_x = self.mundo.x.copy()
+            self.anterior_y = self.mundo.y.copy()
+
     def on_draw(self):
         self.clear()
+        if USE_NUMPY_WORLD:
+            mundo = self.mundo
+            xs, ys = self.posicoes_desenho()
+            if USE_BATCH_RENDERER:
+                self.lote.update(xs, ys, mundo.radius, mundo.color)
+                self.lote.draw()
+                return
+            for x, y, r, cor in zip(xs.tolist(), ys.tolist(), mundo.radius.tolist(), mundo.color.tolist()):
+                arcade.draw_circle_filled(x, y, r, cor)
+            return
         for bola in self.bolas:
             bola.desenhar()
 
+    def posicoes_desenho(self):
+        mundo = self.mundo
+        if not USE_FIXED_TIMESTEP:
+            return mundo.x, mundo.y
+        alpha = self.relogio.alpha
+        return interpolate(self.anterior_x, mundo.x, alpha), interpolate(self.anterior_y, mundo.y, alpha)
+
     def on_update(self, delta_time):
+        if not USE_FIXED_TIMESTEP:
+            self.passo()
+            return
+        for _ in range(self.relogio.advance(delta_time)):
+            if USE_NUMPY_WORLD:
+                self.anterior_x = self.mundo.x.copy()
+                self.anterior_y = self.mundo.y.copy()
+            self.passo()
+
+    def passo(self):
+        if USE_NUMPY_WORLD:
+            self.atualizar_mundo()
+            return
+
         # mover todas
         for bola in self.bolas:
             bola.mover()
 
         # checar colisões
+        if BROAD_PHASE != "brute":
+            self.checar_colisoes_candidatas()
+            return
+
         for i in range(len(self.bolas)):
             for j in range(i + 1, len(self.bolas)):
                 b1 = self.bolas[i]
@@ -116,10 +207,42 @@ class MyGame(arcade.Window):
                 if b1.colidiu_com(b2):
                     b1.resolver_colisao(b2)
 
+    def pares_candidatos(self, xs, ys, raios):
+        # Pares da broad-phase escolhida, na mesma ordem da força bruta
+        if BROAD_PHASE == "sweep":
+            return self.varredura.pairs(xs, ys, raios)
+        if BROAD_PHASE == "tree":
+            self.arvore.refit(xs, ys, raios)
+            return self.arvore.pairs()
+        return grid_pairs(xs, ys, self.tamanho_celula)
+
+    def checar_colisoes_candidatas(self):
+        xs = [bola.x for bola in self.bolas]
+        ys = [bola.y for bola in self.bolas]
+        pares_i, pares_j = self.pares_candidatos(xs, ys, self.raios)
+        for i, j in zip(pares_i.tolist(), pares_j.tolist()):
+            b1 = self.bolas[i]
+            b2 = self.bolas[j]
+            if b1.colidiu_com(b2):
+                b1.resolver_colisao(b2)
+
+    def atualizar_mundo(self):
+        self.motor.step_once()
+
+    def on_close(self):
+        if self.motor is not None:
+            self.motor.close()
+        super().on_close()
+
 
 def main():
-    game = MyGame()
-    arcade.run()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default=BACKEND,
+                        help="backend de física do mundo NumPy")
+    args = parser.parse_args()
+    with seeded(SEED):
+        game = MyGame(args.backend)
+        arcade.run()
 
 if __name__ == "__main__":
     main()
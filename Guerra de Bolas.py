@@ -1,11 +1,43 @@
 import arcade
+import argparse
 import random
 import math
 import threading
-import time
+import numpy as np
 from concurrent.futures import ThreadPoolExecutor
 
+from scenarios import make_engine
+from backends import BACKENDS
+from partition import BisectionPartitioner
+from population import ColorPopulation
+from profiler import Profiler, candidate_pairs
+from slot_map import SlotMap
+from seeding import seeded
+
+# Guarda as bolas num BallWorld (arrays NumPy) avançado pelo
+# SimulationEngine: integração e separação dos contatos no backend, e as
+# regras de cor aplicadas aos contatos que o motor passa a cada passo.
+# Desligado, volta aos objetos Ball nas threads por quadrante abaixo
+USE_NUMPY_WORLD = True
+# Regras de física (scenarios.py) e backend do passo do mundo NumPy
+# (backends.py), também escolhido com --backend. As regras de cor precisam
+# ver cada contato, então com o process o passo roda no processo principal
+CENARIO = "guerra"
+BACKEND = "spatial"
+
 USE_PARALLELISM = True
+# Divide o trabalho das threads pela densidade das bolas (bisseção recursiva)
+# em vez dos quadrantes fixos; os pares entre partes vão para um passe de
+# fronteira. Os quadrantes continuam valendo para o impulso.
+USE_ADAPTIVE_PARTITION = True
+REPARTITION_EVERY = 1
+
+# Semente dos sorteios (None: cada execução é diferente)
+SEED = 0
+# Tempo por fase do frame no canto da tela e trace do Chrome (Perfetto)
+# gravado em PROFILE_TRACE ao fechar a janela; desligado não custa nada
+PROFILE = False
+PROFILE_TRACE = "guerra-de-bolas.trace.json"
 
 SCREEN_WIDTH = 1600
 SCREEN_HEIGHT = 900
@@ -39,21 +71,28 @@ BALL_COLORS = [
 ]
 
 MAX_BALLS_PER_COLOR = 50
-COOLDOWN_SECONDS = 0.5
+# Intervalo mínimo entre nascimentos de um mesmo par, em frames (ticks da
+# simulação, não tempo de relógio: 30 frames = 0,5 s a 60 fps)
+COOLDOWN_TICKS = 30
 
 lock = threading.Lock()
+profiler = Profiler(PROFILE)
 
 
 class Ball:
     def __init__(self, x, y, change_x, change_y, color):
+        self.radius = BALL_RADIUS
+        self.handle = None
+        self.reset(x, y, change_x, change_y, color)
+
+    def reset(self, x, y, change_x, change_y, color):
         self.x = x
         self.y = y
-        self.radius = BALL_RADIUS
         self.color = color
         self.change_x = change_x
         self.change_y = change_y
         self.previous_quad = None
-        self.last_spawn_time = 0
+        self.last_spawn_tick = -COOLDOWN_TICKS
 
     @property
     def speed(self):
@@ -94,17 +133,35 @@ def average_velocity(ball1, ball2):
     return avg_speed_x, avg_speed_y
 
 
-def update_and_collide(balls, all_balls, game):
-    balls_to_remove = set()
-    balls_to_add = []
+def spawn_ball(all_balls, x, y, change_x, change_y, color):
+    # Reaproveita o objeto de uma bola morta quando houver
+    ball = all_balls.recycle()
+    if ball is None:
+        ball = Ball(x, y, change_x, change_y, color)
+    else:
+        ball.reset(x, y, change_x, change_y, color)
+    ball.handle = all_balls.insert(ball)
+    return ball
+
 
+def update_and_collide(balls, all_balls, game):
     for ball in balls:
         ball.update()
+    collide(balls, all_balls, game)
+
+
+def collide(balls, all_balls, game, parts=None):
+    # Com parts, só os pares entre partes diferentes (passe de fronteira)
+    balls_to_remove = set()
+    balls_to_add = []
+    contacts = 0
 
     n = len(balls)
     for i in range(n):
         b1 = balls[i]
         for j in range(i + 1, n):
+            if parts is not None and parts[i] == parts[j]:
+                continue
             b2 = balls[j]
             dx = b1.x - b2.x
             dy = b1.y - b2.y
@@ -112,6 +169,7 @@ def update_and_collide(balls, all_balls, game):
             min_dist = b1.radius + b2.radius
 
             if dist < min_dist and dist > 0:
+                contacts += 1
                 overlap = 0.5 * (min_dist - dist)
                 nx = dx / dist
                 ny = dy / dist
@@ -133,73 +191,107 @@ def update_and_collide(balls, all_balls, game):
                         b1.change_x *= 0.8
                         b1.change_y *= 0.8
                 else:
-                    now = time.time()
-                    if now - b1.last_spawn_time >= COOLDOWN_SECONDS and now - b2.last_spawn_time >= COOLDOWN_SECONDS:
-                        with lock:
-                            count_color = sum(1 for ball in all_balls if ball.color == b1.color)
-                            if count_color < MAX_BALLS_PER_COLOR:
-                                mid_x = (b1.x + b2.x) / 2
-                                mid_y = (b1.y + b2.y) / 2
-                                new_cx, new_cy = average_velocity(b1, b2)
-                                new_ball = Ball(mid_x, mid_y, new_cx, new_cy, b1.color)
-                                balls_to_add.append(new_ball)
-                                all_balls.append(new_ball)
-                                b1.last_spawn_time = now
-                                b2.last_spawn_time = now
-
-    with lock:
+                    tick = game.tick
+                    if tick - b1.last_spawn_tick >= COOLDOWN_TICKS and tick - b2.last_spawn_tick >= COOLDOWN_TICKS:
+                        # Reserva a vaga da cor sem varrer all_balls
+                        if game.population.try_spawn(b1.color, MAX_BALLS_PER_COLOR):
+                            mid_x = (b1.x + b2.x) / 2
+                            mid_y = (b1.y + b2.y) / 2
+                            new_cx, new_cy = average_velocity(b1, b2)
+                            balls_to_add.append((mid_x, mid_y, new_cx, new_cy, b1.color))
+                            b1.last_spawn_tick = tick
+                            b2.last_spawn_tick = tick
+
+    if profiler.enabled:
+        profiler.count("pairs_tested", candidate_pairs(n, parts))
+        profiler.count("contacts", contacts)
+
+    with profiler.span("spawn/kill (lock)"), lock:
         for index in sorted(balls_to_remove, reverse=True):
-            if balls[index] in all_balls:
-                all_balls.remove(balls[index])
+            if all_balls.remove(balls[index].handle) is not None:
+                game.population.killed(balls[index].color)
             del balls[index]
-        for ball in balls_to_add:
-            balls.append(ball)
+        for spawn in balls_to_add:
+            balls.append(spawn_ball(all_balls, *spawn))
 
 
 class MyGame(arcade.Window):
-    def __init__(self):
+    def __init__(self, backend=BACKEND):
         super().__init__(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE)
         self.background_color = arcade.color.LIGHT_GRAY
-        self.ball_list = []
+        self.ball_list = SlotMap()
         self.total_balls_created = 0
         self.time_since_last_launch = 0.0
+        self.tick = 0   # frames simulados, relógio do cooldown
         self.executor = ThreadPoolExecutor(max_workers=NUM_QUADS)
         self.last_winner_color = None
+        self.population = ColorPopulation()
+        self.partitioner = BisectionPartitioner(SCREEN_WIDTH, SCREEN_HEIGHT, NUM_QUADS, REPARTITION_EVERY)
+        # A separação segue a ordem dos pares, como no laço das Ball
+        self.engine = make_engine(CENARIO, backend=backend, capacity=BALL_COUNT, collision_mode="sequential")
+        self.engine.on_contacts = self.collide_world
+        self.world = self.engine.world
+        self.reset_world_state()
 
         # Carrega a música uma vez e toca em loop
         self.music = arcade.Sound("lofi123.mp3")
         self.music_player = self.music.play(loop=True)
 
+    def reset_world_state(self):
+        # Dados de jogo das bolas do mundo NumPy, na ordem dos índices dele
+        self.color_index = np.empty(0, dtype=np.int64)
+        self.previous_quad = np.empty(0, dtype=np.int64)   # -1: ainda sem quadrante
+        self.last_spawn_tick = np.empty(0, dtype=np.int64)
+        self.dead = set()     # mortas no passo, saem do mundo depois dele
+        self.births = []
+
     def setup(self):
         self.ball_list.clear()
+        self.world.clear()
+        self.reset_world_state()
+        self.population.reset()
         self.total_balls_created = 0
         self.time_since_last_launch = 0.0
+        self.tick = 0
         # Não toca a música aqui para não reiniciar
 
     def create_new_ball(self):
         with lock:
-            color_count = {}
-            for ball in self.ball_list:
-                color_count[ball.color] = color_count.get(ball.color, 0) + 1
-
             color = random.choice(BALL_COLORS)
-            if color_count.get(color, 0) >= MAX_BALLS_PER_COLOR:
+            if self.population.count(color) >= MAX_BALLS_PER_COLOR:
                 return
 
             x = random.uniform(BALL_RADIUS, SCREEN_WIDTH - BALL_RADIUS)
             y = random.uniform(BALL_RADIUS, SCREEN_HEIGHT - BALL_RADIUS)
             change_x = random.uniform(-4, 4)
             change_y = random.uniform(-4, 4)
-            new_ball = Ball(x, y, change_x, change_y, color)
+
+            if USE_NUMPY_WORLD:
+                world = self.world
+                if np.any(np.hypot(world.x - x, world.y - y) < BALL_RADIUS * 2):
+                    return
+                if not self.population.try_spawn(color, MAX_BALLS_PER_COLOR):
+                    return
+                self.add_ball(x, y, change_x, change_y, BALL_COLORS.index(color))
+                self.total_balls_created += 1
+                return
 
             for ball in self.ball_list:
-                dist = math.hypot(ball.x - new_ball.x, ball.y - new_ball.y)
+                dist = math.hypot(ball.x - x, ball.y - y)
                 if dist < BALL_RADIUS * 2:
                     return
 
-            self.ball_list.append(new_ball)
+            if not self.population.try_spawn(color, MAX_BALLS_PER_COLOR):
+                return
+            spawn_ball(self.ball_list, x, y, change_x, change_y, color)
             self.total_balls_created += 1
 
+    def add_ball(self, x, y, change_x, change_y, color_index):
+        self.world.add(x, y, change_x, change_y, BALL_RADIUS, BALL_COLORS[color_index])
+        self.color_index = np.append(self.color_index, color_index)
+        self.previous_quad = np.append(self.previous_quad, -1)
+        self.last_spawn_tick = np.append(self.last_spawn_tick, -COOLDOWN_TICKS)
+
     def get_quadrant(self, ball):
         quad_w = SCREEN_WIDTH / NUM_QUADS_X
         quad_h = SCREEN_HEIGHT / NUM_QUADS_Y
@@ -209,7 +301,28 @@ class MyGame(arcade.Window):
         y_index = min(y_index, NUM_QUADS_Y - 1)
         return y_index * NUM_QUADS_X + x_index
 
+    def get_quadrants(self, world):
+        # get_quadrant para todas as bolas de uma vez
+        quad_w = SCREEN_WIDTH / NUM_QUADS_X
+        quad_h = SCREEN_HEIGHT / NUM_QUADS_Y
+        x_index = np.minimum((world.x // quad_w).astype(np.int64), NUM_QUADS_X - 1)
+        y_index = np.minimum((world.y // quad_h).astype(np.int64), NUM_QUADS_Y - 1)
+        return y_index * NUM_QUADS_X + x_index
+
     def on_draw(self):
+        with profiler.phase("on_draw"):
+            self.draw_scene()
+        if PROFILE:
+            self.draw_profile()
+        profiler.end_frame()
+
+    def draw_profile(self):
+        y = SCREEN_HEIGHT - 60
+        for line in profiler.overlay_lines():
+            arcade.draw_text(line, 10, y, arcade.color.BLACK, 12)
+            y -= 18
+
+    def draw_scene(self):
         self.clear()
         quad_w = SCREEN_WIDTH / NUM_QUADS_X
         quad_h = SCREEN_HEIGHT / NUM_QUADS_Y
@@ -246,23 +359,24 @@ class MyGame(arcade.Window):
                 arcade.draw_line(x, y, min(x + dash_length, x_end), y, arcade.color.GRAY)
                 x += dash_length + gap_length
 
+        if USE_NUMPY_WORLD:
+            world = self.world
+            for x, y, color in zip(world.x.tolist(), world.y.tolist(), world.color.tolist()):
+                arcade.draw_circle_filled(x, y, BALL_RADIUS, color)
         for ball in self.ball_list:
             ball.draw()
 
         arcade.draw_text(f"Bolas criadas: {self.total_balls_created}", 10, SCREEN_HEIGHT - 30, arcade.color.BLACK, 18)
 
-        counts = {}
-        for ball in self.ball_list:
-            counts[ball.color] = counts.get(ball.color, 0) + 1
-
         x = 10
         y = 10
         for color in BALL_COLORS:
-            count = counts.get(color, 0)
+            count = self.population.count(color)
             arcade.draw_text(f"{count}", x, y, color, 16)
             x += 60
 
-        arcade.draw_text(f"Total: {len(self.ball_list)}", SCREEN_WIDTH - 130, 10, arcade.color.BLACK, 18)
+        total = len(self.world) if USE_NUMPY_WORLD else len(self.ball_list)
+        arcade.draw_text(f"Total: {total}", SCREEN_WIDTH - 130, 10, arcade.color.BLACK, 18)
 
         if self.last_winner_color is not None:
             try:
@@ -283,51 +397,155 @@ class MyGame(arcade.Window):
             )
 
     def on_update(self, delta_time: float):
+        self.tick += 1
         self.time_since_last_launch += delta_time
-        if self.total_balls_created < BALL_COUNT and self.time_since_last_launch >= BALL_LAUNCH_INTERVAL:
-            self.create_new_ball()
-            self.time_since_last_launch = 0.0
+        with profiler.phase("launch"):
+            if self.total_balls_created < BALL_COUNT and self.time_since_last_launch >= BALL_LAUNCH_INTERVAL:
+                self.create_new_ball()
+                self.time_since_last_launch = 0.0
 
-        quads = [[] for _ in range(NUM_QUADS)]
-        for ball in self.ball_list:
-            current_quad = self.get_quadrant(ball)
+        if USE_NUMPY_WORLD:
+            self.update_world()
+            return
 
-            if ball.previous_quad is not None and ball.previous_quad != current_quad:
-                impulse_strength = 4.0
+        with profiler.phase("quadrants"):
+            quads = [[] for _ in range(NUM_QUADS)]
+            for ball in self.ball_list:
+                current_quad = self.get_quadrant(ball)
+
+                if ball.previous_quad is not None and ball.previous_quad != current_quad:
+                    impulse_strength = 4.0
+                    angle = random.uniform(0, 2 * math.pi)
+                    impulse_x = math.cos(angle) * impulse_strength
+                    impulse_y = math.sin(angle) * impulse_strength
+                    ball.change_x += impulse_x
+                    ball.change_y += impulse_y
+
+                ball.previous_quad = current_quad
+                quads[current_quad].append(ball)
+
+            if USE_ADAPTIVE_PARTITION:
+                quads = self.partitioner.split_balls(list(self.ball_list))
+
+        if self.restart_if_won():
+            return
+
+        with profiler.phase("update_and_collide"):
+            if USE_PARALLELISM:
+                futures = [self.executor.submit(profiler.worker(f"update_and_collide[{k}]", update_and_collide),
+                                                quad, self.ball_list, self)
+                           for k, quad in enumerate(quads)]
+                for future in futures:
+                    future.result()
+            else:
+                for quad in quads:
+                    update_and_collide(quad, self.ball_list, self)
+
+        if USE_ADAPTIVE_PARTITION:
+            with profiler.phase("border"):
+                # Passe de fronteira; bolas nascidas neste frame (previous_quad
+                # ainda None) ficam de fora, como nas partes
+                alive = [[ball for ball in quad if ball.previous_quad is not None] for quad in quads]
+                border, parts = self.partitioner.border_balls(alive, 2 * BALL_RADIUS)
+                collide(border, self.ball_list, self, parts)
+
+    def restart_if_won(self):
+        winner_color = self.population.single_color()
+        if winner_color is None or self.total_balls_created < 10:
+            return False
+        self.last_winner_color = winner_color
+        print("Reiniciando o jogo: apenas uma cor restante.")
+        self.setup()
+        return True
+
+    def update_world(self):
+        world = self.world
+        with profiler.phase("quadrants"):
+            current_quad = self.get_quadrants(world)
+            changed = np.flatnonzero((self.previous_quad >= 0) & (self.previous_quad != current_quad))
+            impulse_strength = 4.0
+            for i in changed.tolist():
                 angle = random.uniform(0, 2 * math.pi)
-                impulse_x = math.cos(angle) * impulse_strength
-                impulse_y = math.sin(angle) * impulse_strength
-                ball.change_x += impulse_x
-                ball.change_y += impulse_y
-
-            ball.previous_quad = current_quad
-            quads[current_quad].append(ball)
-
-        unique_colors = set(ball.color for ball in self.ball_list)
-        if len(unique_colors) == 1 and self.total_balls_created >= 10:
-            self.last_winner_color = next(iter(unique_colors))
-            print("Reiniciando o jogo: apenas uma cor restante.")
-            self.setup()
+                world.vx[i] += math.cos(angle) * impulse_strength
+                world.vy[i] += math.sin(angle) * impulse_strength
+            self.previous_quad = current_quad
+
+        if self.restart_if_won():
             return
 
-        if USE_PARALLELISM:
-            futures = [self.executor.submit(update_and_collide, quad, self.ball_list, self) for quad in quads]
-            for future in futures:
-                future.result()
-        else:
-            for quad in quads:
-                update_and_collide(quad, self.ball_list, self)
+        with profiler.phase("engine_step"):
+            self.engine.step_once()
+        with profiler.phase("spawn/kill"):
+            self.apply_deaths_and_births()
+
+    def collide_world(self, world, pairs_i, pairs_j):
+        # Chamado pelo motor com os pares candidatos, antes da separação:
+        # aplica as regras de cor aos pares em contato, na ordem dos pares.
+        # Quem morre fica em self.dead (e não joga mais neste passo) e os
+        # nascimentos em self.births; os dois entram no mundo depois do passo
+        dx = world.x[pairs_j] - world.x[pairs_i]
+        dy = world.y[pairs_j] - world.y[pairs_i]
+        dist = np.hypot(dx, dy)
+        touching = (dist < world.radius[pairs_i] + world.radius[pairs_j]) & (dist > 0)
+        if profiler.enabled:
+            profiler.count("pairs_tested", len(pairs_i))
+            profiler.count("contacts", int(np.count_nonzero(touching)))
+
+        x, y, vx, vy = world.x, world.y, world.vx, world.vy
+        color = self.color_index
+        last_spawn = self.last_spawn_tick
+        dead = self.dead
+        tick = self.tick
+        for i, j in zip(pairs_i[touching].tolist(), pairs_j[touching].tolist()):
+            if i in dead or j in dead:
+                continue
+            if color[i] != color[j]:
+                if math.hypot(vx[i], vy[i]) < math.hypot(vx[j], vy[j]):
+                    loser, winner = i, j
+                else:
+                    loser, winner = j, i
+                dead.add(loser)
+                vx[winner] *= 0.8
+                vy[winner] *= 0.8
+            elif tick - last_spawn[i] >= COOLDOWN_TICKS and tick - last_spawn[j] >= COOLDOWN_TICKS:
+                if self.population.try_spawn(BALL_COLORS[color[i]], MAX_BALLS_PER_COLOR):
+                    self.births.append(((x[i] + x[j]) / 2, (y[i] + y[j]) / 2,
+                                        (vx[i] + vx[j]) / 2, (vy[i] + vy[j]) / 2, int(color[i])))
+                    last_spawn[i] = tick
+                    last_spawn[j] = tick
+
+    def apply_deaths_and_births(self):
+        if self.dead:
+            dead = np.fromiter(self.dead, dtype=np.int64)
+            for k in self.color_index[dead].tolist():
+                self.population.killed(BALL_COLORS[k])
+            keep = self.world.remove(dead)
+            self.color_index = self.color_index[keep]
+            self.previous_quad = self.previous_quad[keep]
+            self.last_spawn_tick = self.last_spawn_tick[keep]
+            self.dead = set()
+        for birth in self.births:
+            self.add_ball(*birth)
+        self.births = []
 
     def on_close(self):
+        self.engine.close()
         if self.music_player:
             self.music_player.stop()
+        if PROFILE:
+            profiler.write_chrome_trace(PROFILE_TRACE)
         super().on_close()
 
 
 def main():
-    game = MyGame()
-    game.setup()
-    arcade.run()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default=BACKEND,
+                        help="backend de física do mundo NumPy")
+    args = parser.parse_args()
+    with seeded(SEED):
+        game = MyGame(args.backend)
+        game.setup()
+        arcade.run()
 
 
 if __name__ == "__main__":
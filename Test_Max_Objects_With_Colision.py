@@ -1,6 +1,38 @@
 import arcade
+import argparse
 import random
 import math
+import numpy as np
+from batch_renderer import CircleBatch
+from scenarios import make_engine
+from backends import BACKENDS
+from fixed_step import FixedTimestep, interpolate
+from seeding import seeded
+
+# Guarda as bolas em arrays NumPy (BallWorld) em vez de objetos Ball
+USE_NUMPY_WORLD = True
+# Desenha todas as bolas numa única chamada instanciada (requer USE_NUMPY_WORLD)
+USE_BATCH_RENDERER = True
+# Resolve as colisões do frame em lote (vetorizado) em vez de par a par
+USE_BATCHED_COLLISIONS = True
+COLLISION_ITERATIONS = 3  # iterações de relaxação da separação
+# Regras de física (scenarios.py) e backend do passo do mundo NumPy
+# (backends.py); o backend também pode ser escolhido com --backend
+CENARIO = "with_colision"
+BACKEND = "spatial"
+# Broad-phase dos backends spatial e process: "grid" (grade refeita a cada
+# frame), "sweep" (sweep-and-prune com a ordem mantida entre frames) ou "tree"
+BROAD_PHASE = "sweep"
+# Física em passo fixo (PHYSICS_RATE passos por segundo, no máximo
+# MAX_STEPS_PER_FRAME por frame), independente da taxa de desenho; o desenho
+# interpola entre os dois últimos estados do mundo NumPy
+USE_FIXED_TIMESTEP = True
+PHYSICS_RATE = 60
+RENDER_RATE = 60
+MAX_STEPS_PER_FRAME = 5
+
+# Semente dos sorteios (None: cada execução é diferente)
+SEED = 0
 
 SCREEN_WIDTH = 800
 SCREEN_HEIGHT = 600
@@ -65,15 +97,31 @@ class Ball:
         arcade.draw_circle_filled(self.x, self.y, self.radius, self.color)
 
 class MyGame(arcade.Window):
-    def __init__(self):
-        super().__init__(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE)
+    def __init__(self, backend=BACKEND):
+        super().__init__(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE,
+                         update_rate=1 / RENDER_RATE, draw_rate=1 / RENDER_RATE)
         self.background_color = arcade.color.LIGHT_GRAY
         self.ball_list: list[Ball] = []
         self.total_balls_created = 0
         self.time_since_last_launch = 0.0
+        options = {"broad_phase": BROAD_PHASE} if backend in ("spatial", "process") else {}
+        self.engine = make_engine(
+            CENARIO, backend=backend, capacity=BALL_COUNT,
+            collision_mode="jacobi" if USE_BATCHED_COLLISIONS else "sequential",
+            iterations=COLLISION_ITERATIONS, **options,
+        )
+        self.world = self.engine.world
+        self.batch = CircleBatch(self.ctx, capacity=BALL_COUNT)
+        self.timestep = FixedTimestep(PHYSICS_RATE, MAX_STEPS_PER_FRAME)
+        self.previous_x = self.world.x.copy()
+        self.previous_y = self.world.y.copy()
 
     def setup(self):
         self.ball_list.clear()
+        self.world.clear()
+        self.timestep = FixedTimestep(PHYSICS_RATE, MAX_STEPS_PER_FRAME)
+        self.previous_x = self.world.x.copy()
+        self.previous_y = self.world.y.copy()
         self.total_balls_created = 0
         self.time_since_last_launch = 0.0
 
@@ -95,6 +143,15 @@ class MyGame(arcade.Window):
         ]
 
         color = random.choice(colors)
+
+        if USE_NUMPY_WORLD:
+            world = self.world
+            if np.any(np.hypot(world.x - x, world.y - y) < BALL_RADIUS * 2):
+                return
+            world.add(x, y, HORIZONTAL_SPEED, 0.0, BALL_RADIUS, color)
+            self.total_balls_created += 1
+            return
+
         new_ball = Ball(x, y, change_x=HORIZONTAL_SPEED, color=color)
 
         for ball in self.ball_list:
@@ -119,15 +176,44 @@ class MyGame(arcade.Window):
     def on_draw(self):
         self.clear()
         self.draw_launcher()
+        if USE_NUMPY_WORLD:
+            world = self.world
+            xs, ys = self.draw_positions()
+            if USE_BATCH_RENDERER:
+                self.batch.update(xs, ys, world.radius, world.color)
+                self.batch.draw()
+            else:
+                for x, y, r, color in zip(xs.tolist(), ys.tolist(), world.radius.tolist(), world.color.tolist()):
+                    arcade.draw_circle_filled(x, y, r, color)
         for ball in self.ball_list:
             ball.draw()
 
+    def draw_positions(self):
+        world = self.world
+        if not USE_FIXED_TIMESTEP:
+            return world.x, world.y
+        alpha = self.timestep.alpha
+        return interpolate(self.previous_x, world.x, alpha), interpolate(self.previous_y, world.y, alpha)
+
     def on_update(self, delta_time: float):
         self.time_since_last_launch += delta_time
         if self.total_balls_created < BALL_COUNT and self.time_since_last_launch >= BALL_LAUNCH_INTERVAL:
             self.create_new_ball()
             self.time_since_last_launch = 0.0
 
+        if not USE_FIXED_TIMESTEP:
+            self.step()
+            return
+        for _ in range(self.timestep.advance(delta_time)):
+            self.previous_x = self.world.x.copy()
+            self.previous_y = self.world.y.copy()
+            self.step()
+
+    def step(self):
+        if USE_NUMPY_WORLD:
+            self.engine.step_once()
+            return
+
         for ball in self.ball_list:
             ball.update()
 
@@ -159,10 +245,19 @@ class MyGame(arcade.Window):
                     b2.change_x += (v1n - v2n) * nx
                     b2.change_y += (v1n - v2n) * ny
 
+    def on_close(self):
+        self.engine.close()
+        super().on_close()
+
 def main():
-    game = MyGame()
-    game.setup()
-    arcade.run()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default=BACKEND,
+                        help="backend de física do mundo NumPy")
+    args = parser.parse_args()
+    with seeded(SEED):
+        game = MyGame(args.backend)
+        game.setup()
+        arcade.run()
 
 if __name__ == "__main__":
     main()
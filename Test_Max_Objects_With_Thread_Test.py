@@ -1,10 +1,55 @@
 import arcade
+import argparse
 import random
 import math
+import os
+import numpy as np
 from concurrent.futures import ThreadPoolExecutor
+from ball_world import substep_count
+from batch_renderer import CircleBatch
+from spatial_hash import grid_pairs, cell_size_for
+from collision import resolve_contacts
+from scenarios import make_engine
+from backends import BACKENDS
+from partition import BisectionPartitioner
+from profiler import Profiler, candidate_pairs
+from seeding import seeded
 
 # ✅ Ativa ou desativa o paralelismo
 USE_PARALLELISM = True
+# Guarda as bolas em arrays NumPy (BallWorld) em vez de objetos Ball
+USE_NUMPY_WORLD = True
+# Desenha todas as bolas numa única chamada instanciada (requer USE_NUMPY_WORLD)
+USE_BATCH_RENDERER = True
+# Resolve as colisões do quadrante em lote (vetorizado) em vez de par a par
+USE_BATCHED_COLLISIONS = True
+# Regras de física (scenarios.py) e backend do passo do mundo NumPy
+# (backends.py), também escolhido com --backend. O "process" faz o passo
+# inteiro em processos persistentes, por faixas verticais, com o estado em
+# memória compartilhada; "quadrants" faz o passo nas threads por quadrante
+# (ou partição) deste script, no ThreadPoolExecutor
+CENARIO = "without_gravity"
+BACKEND = "process"
+QUADRANTS = "quadrants"
+NUM_WORKERS = os.cpu_count() or 1
+# Divide o trabalho das threads pela densidade das bolas (bisseção recursiva)
+# em vez dos quadrantes fixos; os pares entre partes vão para um passe de
+# fronteira. Os quadrantes continuam valendo para o impulso.
+USE_ADAPTIVE_PARTITION = True
+REPARTITION_EVERY = 1
+# Subpassos adaptativos: quando a bola mais rápida andaria mais que meio raio
+# num frame (o impulso de até 10 px/frame), o frame é dividido em subpassos
+# para as bolas não se atravessarem. Com um backend do registro os
+# subpassos rodam dentro de SimulationEngine.step_once.
+USE_SUBSTEPS = True
+MAX_SUBSTEPS = 8
+
+# Semente dos sorteios (None: cada execução é diferente)
+SEED = 0
+# Tempo por fase do frame no canto da tela e trace do Chrome (Perfetto)
+# gravado em PROFILE_TRACE ao fechar a janela; desligado não custa nada
+PROFILE = False
+PROFILE_TRACE = "thread-test.trace.json"
 
 SCREEN_WIDTH = 1600
 SCREEN_HEIGHT = 900
@@ -30,6 +75,8 @@ QUAD_COLORS = [
     arcade.color.LIGHT_YELLOW,
 ]
 
+profiler = Profiler(PROFILE)
+
 class Ball:
     def __init__(self, x, y, change_x, change_y, color=arcade.color.BLUE_BELL):
         self.x = x
@@ -40,9 +87,9 @@ class Ball:
         self.change_y = change_y
         self.previous_quad = None
 
-    def update(self):
-        self.x += self.change_x
-        self.y += self.change_y
+    def update(self, dt=1.0):
+        self.x += self.change_x * dt
+        self.y += self.change_y * dt
 
         # Rebote nas bordas
         if self.x - self.radius < 0:
@@ -58,9 +105,10 @@ class Ball:
             self.y = SCREEN_HEIGHT - self.radius
             self.change_y *= -1
 
-        # Fricção
-        self.change_x *= FRICTION
-        self.change_y *= FRICTION
+        # Fricção (por frame, dividida entre os subpassos)
+        friction = FRICTION ** dt
+        self.change_x *= friction
+        self.change_y *= friction
 
         if abs(self.change_x) < 0.01:
             self.change_x = 0
@@ -70,13 +118,19 @@ class Ball:
     def draw(self):
         arcade.draw_circle_filled(self.x, self.y, self.radius, self.color)
 
-def update_and_collide(balls):
+def update_and_collide(balls, dt=1.0):
     for ball in balls:
-        ball.update()
+        ball.update(dt)
+    collide(balls)
 
+def collide(balls, parts=None):
+    # Com parts, só os pares entre partes diferentes (passe de fronteira)
+    contacts = 0
     n = len(balls)
     for i in range(n):
         for j in range(i + 1, n):
+            if parts is not None and parts[i] == parts[j]:
+                continue
             b1 = balls[i]
             b2 = balls[j]
             dx = b1.x - b2.x
@@ -85,6 +139,7 @@ def update_and_collide(balls):
             min_dist = b1.radius + b2.radius
 
             if dist < min_dist and dist > 0:
+                contacts += 1
                 overlap = 0.5 * (min_dist - dist)
                 nx = dx / dist
                 ny = dy / dist
@@ -101,17 +156,52 @@ def update_and_collide(balls):
                 b2.change_x += (v1n - v2n) * nx
                 b2.change_y += (v1n - v2n) * ny
 
+    if profiler.enabled:
+        profiler.count("pairs_tested", candidate_pairs(n, parts))
+        profiler.count("contacts", contacts)
+
+def update_and_collide_world(world, idx, dt=1.0):
+    # Mesmo passo de update_and_collide, só com os índices do quadrante
+    world.integrate(idx, dt)
+    pairs_i, pairs_j = grid_pairs(world.x[idx], world.y[idx], cell_size_for(world.radius[idx]))
+    mode = "jacobi" if USE_BATCHED_COLLISIONS else "sequential"
+    contacts = resolve_contacts(world, pairs_i, pairs_j, mode=mode, idx=idx)
+    profiler.count("pairs_tested", len(pairs_i))
+    profiler.count("contacts", contacts)
+
+def collide_world_border(world, idx, parts):
+    # Pares entre partes diferentes, resolvidos uma única vez depois das threads
+    pairs_i, pairs_j = grid_pairs(world.x[idx], world.y[idx], cell_size_for(world.radius[idx]))
+    cross = parts[pairs_i] != parts[pairs_j]
+    mode = "jacobi" if USE_BATCHED_COLLISIONS else "sequential"
+    contacts = resolve_contacts(world, pairs_i[cross], pairs_j[cross], mode=mode, idx=idx)
+    profiler.count("pairs_tested", int(np.count_nonzero(cross)))
+    profiler.count("contacts", contacts)
+
 class MyGame(arcade.Window):
-    def __init__(self):
+    def __init__(self, backend=BACKEND):
         super().__init__(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE)
         self.background_color = arcade.color.LIGHT_GRAY
         self.ball_list = []
         self.total_balls_created = 0
         self.time_since_last_launch = 0.0
         self.executor = ThreadPoolExecutor(max_workers=NUM_QUADS)
+        self.partitioner = BisectionPartitioner(SCREEN_WIDTH, SCREEN_HEIGHT, NUM_QUADS, REPARTITION_EVERY)
+        # Com "quadrants" o motor só guarda o mundo e as regras
+        self.backend = backend
+        options = {"workers": NUM_WORKERS} if backend == "process" else {}
+        self.engine = make_engine(
+            CENARIO, backend="spatial" if backend == QUADRANTS else backend, capacity=BALL_COUNT,
+            collision_mode="jacobi" if USE_BATCHED_COLLISIONS else "sequential", **options,
+        )
+        self.world = self.engine.world
+        self.previous_quad = np.empty(0, dtype=np.int64)
+        self.batch = CircleBatch(self.ctx, capacity=BALL_COUNT)
 
     def setup(self):
         self.ball_list.clear()
+        self.world.clear()
+        self.previous_quad = np.empty(0, dtype=np.int64)
         self.total_balls_created = 0
         self.time_since_last_launch = 0.0
 
@@ -128,6 +218,16 @@ class MyGame(arcade.Window):
         change_x = random.uniform(-4, 4)
         change_y = random.uniform(-4, 4)
         color = random.choice(colors)
+
+        if USE_NUMPY_WORLD:
+            world = self.world
+            if np.any(np.hypot(world.x - x, world.y - y) < BALL_RADIUS * 2):
+                return
+            world.add(x, y, change_x, change_y, BALL_RADIUS, color)
+            self.previous_quad = np.append(self.previous_quad, -1)
+            self.total_balls_created += 1
+            return
+
         new_ball = Ball(x, y, change_x, change_y, color)
 
         for ball in self.ball_list:
@@ -147,7 +247,28 @@ class MyGame(arcade.Window):
         y_index = min(y_index, NUM_QUADS_Y - 1)
         return y_index * NUM_QUADS_X + x_index
 
+    def get_quadrants(self, world):
+        # get_quadrant para todas as bolas de uma vez
+        quad_w = SCREEN_WIDTH / NUM_QUADS_X
+        quad_h = SCREEN_HEIGHT / NUM_QUADS_Y
+        x_index = np.minimum((world.x // quad_w).astype(np.int64), NUM_QUADS_X - 1)
+        y_index = np.minimum((world.y // quad_h).astype(np.int64), NUM_QUADS_Y - 1)
+        return y_index * NUM_QUADS_X + x_index
+
     def on_draw(self):
+        with profiler.phase("on_draw"):
+            self.draw_scene()
+        if PROFILE:
+            self.draw_profile()
+        profiler.end_frame()
+
+    def draw_profile(self):
+        y = SCREEN_HEIGHT - 60
+        for line in profiler.overlay_lines():
+            arcade.draw_text(line, 10, y, arcade.color.BLACK, 12)
+            y -= 18
+
+    def draw_scene(self):
         self.clear()
         quad_w = SCREEN_WIDTH / NUM_QUADS_X
         quad_h = SCREEN_HEIGHT / NUM_QUADS_Y
@@ -159,6 +280,14 @@ class MyGame(arcade.Window):
             bottom = row * quad_h
             arcade.draw_lrbt_rectangle_filled(left, left + quad_w, bottom, bottom + quad_h, QUAD_COLORS[i])
 
+        if USE_NUMPY_WORLD:
+            world = self.world
+            if USE_BATCH_RENDERER:
+                self.batch.update(world.x, world.y, world.radius, world.color)
+                self.batch.draw()
+            else:
+                for x, y, r, color in zip(world.x.tolist(), world.y.tolist(), world.radius.tolist(), world.color.tolist()):
+                    arcade.draw_circle_filled(x, y, r, color)
         for ball in self.ball_list:
             ball.draw()
 
@@ -167,32 +296,112 @@ class MyGame(arcade.Window):
 
     def on_update(self, delta_time: float):
         self.time_since_last_launch += delta_time
-        if self.total_balls_created < BALL_COUNT and self.time_since_last_launch >= BALL_LAUNCH_INTERVAL:
-            self.create_new_ball()
-            self.time_since_last_launch = 0.0
-
-        quads = [[] for _ in range(NUM_QUADS)]
-        for ball in self.ball_list:
-            current_quad = self.get_quadrant(ball)
-            if ball.previous_quad is not None and ball.previous_quad != current_quad:
-                impulse = 10
-                ball.change_x += random.uniform(-impulse, impulse)
-                ball.change_y += random.uniform(-impulse, impulse)
-            ball.previous_quad = current_quad
-            quads[current_quad].append(ball)
-
-        if USE_PARALLELISM:
-            futures = [self.executor.submit(update_and_collide, quad) for quad in quads]
-            for future in futures:
-                future.result()
-        else:
-            for quad in quads:
-                update_and_collide(quad)
+        with profiler.phase("launch"):
+            if self.total_balls_created < BALL_COUNT and self.time_since_last_launch >= BALL_LAUNCH_INTERVAL:
+                self.create_new_ball()
+                self.time_since_last_launch = 0.0
+
+        if USE_NUMPY_WORLD:
+            self.update_world()
+            return
+
+        with profiler.phase("quadrants"):
+            quads = [[] for _ in range(NUM_QUADS)]
+            for ball in self.ball_list:
+                current_quad = self.get_quadrant(ball)
+                if ball.previous_quad is not None and ball.previous_quad != current_quad:
+                    impulse = 10
+                    ball.change_x += random.uniform(-impulse, impulse)
+                    ball.change_y += random.uniform(-impulse, impulse)
+                ball.previous_quad = current_quad
+                quads[current_quad].append(ball)
+
+            if USE_ADAPTIVE_PARTITION:
+                quads = self.partitioner.split_balls(self.ball_list)
+
+            substeps = 1
+            if USE_SUBSTEPS:
+                speeds = [math.hypot(ball.change_x, ball.change_y) for ball in self.ball_list]
+                substeps = substep_count(speeds, [BALL_RADIUS], limit=MAX_SUBSTEPS)
+            dt = 1 / substeps
+
+        for _ in range(substeps):
+            with profiler.phase("update_and_collide"):
+                if USE_PARALLELISM:
+                    futures = [self.executor.submit(profiler.worker(f"update_and_collide[{k}]", update_and_collide), quad, dt)
+                               for k, quad in enumerate(quads)]
+                    for future in futures:
+                        future.result()
+                else:
+                    for quad in quads:
+                        update_and_collide(quad, dt)
+
+            if USE_ADAPTIVE_PARTITION:
+                with profiler.phase("border"):
+                    border, parts = self.partitioner.border_balls(quads, 2 * BALL_RADIUS)
+                    collide(border, parts)
+
+    def update_world(self):
+        world = self.world
+        with profiler.phase("quadrants"):
+            current_quad = self.get_quadrants(world)
+            changed = np.flatnonzero((self.previous_quad >= 0) & (self.previous_quad != current_quad))
+            impulse = 10
+            for i in changed.tolist():
+                world.vx[i] += random.uniform(-impulse, impulse)
+                world.vy[i] += random.uniform(-impulse, impulse)
+            self.previous_quad = current_quad
+
+            substeps = 1
+            if USE_SUBSTEPS:
+                substeps = substep_count(np.hypot(world.vx, world.vy), world.radius, limit=MAX_SUBSTEPS)
+            dt = 1 / substeps
+
+        if self.backend != QUADRANTS:
+            with profiler.phase("engine_step"):
+                self.engine.step_once(substeps)
+            return
+
+        with profiler.phase("quadrants"):
+            if USE_ADAPTIVE_PARTITION:
+                parts = self.partitioner.split(world.x, world.y)
+                quads = [np.flatnonzero(parts == q) for q in range(NUM_QUADS)]
+            else:
+                quads = [np.flatnonzero(current_quad == q) for q in range(NUM_QUADS)]
+
+        for _ in range(substeps):
+            with profiler.phase("update_and_collide"):
+                if USE_PARALLELISM:
+                    futures = [self.executor.submit(profiler.worker(f"update_and_collide[{k}]", update_and_collide_world),
+                                                    world, quad, dt)
+                               for k, quad in enumerate(quads)]
+                    for future in futures:
+                        future.result()
+                else:
+                    for quad in quads:
+                        update_and_collide_world(world, quad, dt)
+
+            if USE_ADAPTIVE_PARTITION:
+                with profiler.phase("border"):
+                    reach = 2 * float(world.radius.max()) if world.count else 0.0
+                    border = np.flatnonzero(self.partitioner.near_boundary(world.x, world.y, parts, reach))
+                    collide_world_border(world, border, parts[border])
+
+    def on_close(self):
+        self.engine.close()
+        if PROFILE:
+            profiler.write_chrome_trace(PROFILE_TRACE)
+        super().on_close()
 
 def main():
-    game = MyGame()
-    game.setup()
-    arcade.run()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", choices=sorted(BACKENDS) + [QUADRANTS], default=BACKEND,
+                        help="backend de física do mundo NumPy")
+    args = parser.parse_args()
+    with seeded(SEED):
+        game = MyGame(args.backend)
+        game.setup()
+        arcade.run()
 
 if __name__ == "__main__":
     main()
@@ -1,6 +1,31 @@
 import arcade
+import argparse
 import random
 import math
+from batch_renderer import CircleBatch
+from fixed_step import FixedTimestep, interpolate
+from scenarios import make_engine
+from backends import BACKENDS
+from seeding import seeded
+
+# Guarda as bolas em arrays NumPy (BallWorld) em vez de objetos Ball
+USE_NUMPY_WORLD = True
+# Desenha todas as bolas numa única chamada instanciada (requer USE_NUMPY_WORLD)
+USE_BATCH_RENDERER = True
+# Física em passo fixo (PHYSICS_RATE passos por segundo, no máximo
+# MAX_STEPS_PER_FRAME por frame), independente da taxa de desenho; o desenho
+# interpola entre os dois últimos estados do mundo NumPy
+USE_FIXED_TIMESTEP = True
+PHYSICS_RATE = 60
+RENDER_RATE = 60
+MAX_STEPS_PER_FRAME = 5
+# Regras de física (scenarios.py) e backend do passo do mundo NumPy
+# (backends.py); o backend também pode ser escolhido com --backend
+CENARIO = "without_colision"
+BACKEND = "spatial"
+
+# Semente dos sorteios (None: cada execução é diferente)
+SEED = 0
 
 SCREEN_WIDTH = 1600
 SCREEN_HEIGHT = 900
@@ -53,15 +78,26 @@ class Ball:
         arcade.draw_circle_filled(self.x, self.y, self.radius, self.color)
 
 class MyGame(arcade.Window):
-    def __init__(self):
-        super().__init__(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE)
+    def __init__(self, backend=BACKEND):
+        super().__init__(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE,
+                         update_rate=1 / RENDER_RATE, draw_rate=1 / RENDER_RATE)
         self.background_color = arcade.color.LIGHT_GRAY
         self.ball_list: list[Ball] = []
         self.total_balls_created = 0
         self.time_since_last_launch = 0.0
+        self.engine = make_engine(CENARIO, backend=backend, capacity=BALL_COUNT)
+        self.world = self.engine.world
+        self.batch = CircleBatch(self.ctx, capacity=BALL_COUNT)
+        self.timestep = FixedTimestep(PHYSICS_RATE, MAX_STEPS_PER_FRAME)
+        self.previous_x = self.world.x.copy()
+        self.previous_y = self.world.y.copy()
 
     def setup(self):
         self.ball_list.clear()
+        self.world.clear()
+        self.timestep = FixedTimestep(PHYSICS_RATE, MAX_STEPS_PER_FRAME)
+        self.previous_x = self.world.x.copy()
+        self.previous_y = self.world.y.copy()
         self.total_balls_created = 0
         self.time_since_last_launch = 0.0
 
@@ -86,11 +122,13 @@ class MyGame(arcade.Window):
         change_y = random.uniform(-4, 4)
 
         color = random.choice(colors)
-        new_ball = Ball(x, y, change_x, change_y, color)
 
         # Removida a verificação de colisão para permitir bolas sobrepostas
 
-        self.ball_list.append(new_ball)
+        if USE_NUMPY_WORLD:
+            self.world.add(x, y, change_x, change_y, BALL_RADIUS, color)
+        else:
+            self.ball_list.append(Ball(x, y, change_x, change_y, color))
         self.total_balls_created += 1
 
     def draw_launcher(self):
@@ -107,6 +145,15 @@ class MyGame(arcade.Window):
     def on_draw(self):
         self.clear()
         self.draw_launcher()
+        if USE_NUMPY_WORLD:
+            world = self.world
+            xs, ys = self.draw_positions()
+            if USE_BATCH_RENDERER:
+                self.batch.update(xs, ys, world.radius, world.color)
+                self.batch.draw()
+            else:
+                for x, y, r, color in zip(xs.tolist(), ys.tolist(), world.radius.tolist(), world.color.tolist()):
+                    arcade.draw_circle_filled(x, y, r, color)
         for ball in self.ball_list:
             ball.draw()
 
@@ -119,21 +166,48 @@ class MyGame(arcade.Window):
         fps_text = f"FPS: {fps:.1f}"
         arcade.draw_text(fps_text, SCREEN_WIDTH - 100, SCREEN_HEIGHT - 30, arcade.color.BLACK, 18)
 
+    def draw_positions(self):
+        world = self.world
+        if not USE_FIXED_TIMESTEP:
+            return world.x, world.y
+        alpha = self.timestep.alpha
+        return interpolate(self.previous_x, world.x, alpha), interpolate(self.previous_y, world.y, alpha)
+
     def on_update(self, delta_time: float):
         self.time_since_last_launch += delta_time
         if self.total_balls_created < BALL_COUNT and self.time_since_last_launch >= BALL_LAUNCH_INTERVAL:
             self.create_new_ball()
             self.time_since_last_launch = 0.0
 
+        if not USE_FIXED_TIMESTEP:
+            self.step()
+            return
+        for _ in range(self.timestep.advance(delta_time)):
+            self.previous_x = self.world.x.copy()
+            self.previous_y = self.world.y.copy()
+            self.step()
+
+    def step(self):
+        if USE_NUMPY_WORLD:
+            self.engine.step_once()
         for ball in self.ball_list:
             ball.update()
 
         # Removida a parte de colisão entre bolas
 
+    def on_close(self):
+        self.engine.close()
+        super().on_close()
+
 def main():
-    game = MyGame()
-    game.setup()
-    arcade.run()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default=BACKEND,
+                        help="backend de física do mundo NumPy")
+    args = parser.parse_args()
+    with seeded(SEED):
+        game = MyGame(args.backend)
+        game.setup()
+        arcade.run()
 
 if __name__ == "__main__":
     main()
@@ -1,12 +1,46 @@
 import arcade
+import argparse
 import random
 import math
-import threading
-import time
+import numpy as np
 from concurrent.futures import ThreadPoolExecutor
 
+from ball_world import substep_count
+from scenarios import make_engine
+from backends import BACKENDS
+from partition import BisectionPartitioner
+from population import ColorPopulation
+from slot_map import SlotMap
+from seeding import seeded
+
+# Guarda as bolas num BallWorld (arrays NumPy) avançado pelo
+# SimulationEngine: integração e separação dos contatos no backend, e as
+# regras de cor aplicadas aos contatos que o motor passa a cada subpasso.
+# Desligado, volta aos objetos Ball nas threads por quadrante abaixo
+USE_NUMPY_WORLD = True
+# Regras de física (scenarios.py) e backend do passo do mundo NumPy
+# (backends.py), também escolhido com --backend. As regras de cor precisam
+# ver cada contato, então com o process o passo roda no processo principal
+CENARIO = "tests"
+BACKEND = "spatial"
+
 # Paralelismo ativo
 USE_PARALLELISM = True
+# Divide o trabalho das threads pela densidade das bolas (bisseção recursiva)
+# em vez dos quadrantes fixos; os pares entre partes vão para um passe de
+# fronteira. Os quadrantes continuam valendo para o impulso.
+USE_ADAPTIVE_PARTITION = True
+REPARTITION_EVERY = 1
+# Subpassos adaptativos: quando a bola mais rápida andaria mais que meio raio
+# num frame (o impulso de até 10 px/frame), o frame é dividido em subpassos
+# para as bolas não se atravessarem. No mundo NumPy os subpassos rodam
+# dentro de SimulationEngine.step_once, e as mortes e nascimentos entram
+# no fim do frame
+USE_SUBSTEPS = True
+MAX_SUBSTEPS = 8
+
+# Semente dos sorteios (None: cada execução é diferente)
+SEED = 0
 
 SCREEN_WIDTH = 1600
 SCREEN_HEIGHT = 900
@@ -39,28 +73,32 @@ BALL_COLORS = [
 ]
 
 MAX_BALLS_PER_COLOR = 1000
-COOLDOWN_SECONDS = 0.5
-
-lock = threading.Lock()
+# Intervalo mínimo entre nascimentos de um mesmo par, em frames (ticks da
+# simulação, não tempo de relógio: 30 frames = 0,5 s a 60 fps)
+COOLDOWN_TICKS = 30
 
 class Ball:
     def __init__(self, x, y, change_x, change_y, color):
+        self.radius = BALL_RADIUS
+        self.handle = None
+        self.reset(x, y, change_x, change_y, color)
+
+    def reset(self, x, y, change_x, change_y, color):
         self.x = x
         self.y = y
-        self.radius = BALL_RADIUS
         self.color = color
         self.change_x = change_x
         self.change_y = change_y
         self.previous_quad = None
-        self.last_spawn_time = 0
+        self.last_spawn_tick = -COOLDOWN_TICKS
 
     @property
     def speed(self):
         return math.hypot(self.change_x, self.change_y)
 
-    def update(self):
-        self.x += self.change_x
-        self.y += self.change_y
+    def update(self, dt=1.0):
+        self.x += self.change_x * dt
+        self.y += self.change_y * dt
 
         # Rebote nas bordas
         if self.x - self.radius < 0:
@@ -76,9 +114,10 @@ class Ball:
             self.y = SCREEN_HEIGHT - self.radius
             self.change_y *= -1
 
-        # Fricção
-        self.change_x *= FRICTION
-        self.change_y *= FRICTION
+        # Fricção (por frame, dividida entre os subpassos)
+        friction = FRICTION ** dt
+        self.change_x *= friction
+        self.change_y *= friction
 
         if abs(self.change_x) < 0.01:
             self.change_x = 0
@@ -89,21 +128,45 @@ class Ball:
         arcade.draw_circle_filled(self.x, self.y, self.radius, self.color)
 
 def average_velocity(ball1, ball2):
-    avg_speed_x = (abs(ball1.change_x) + abs(ball2.change_x)) / 2
-    avg_speed_y = (abs(ball1.change_y) + abs(ball2.change_y)) / 2
-    dir_x = (ball1.change_x + ball2.change_x) / 2
-    dir_y = (ball1.change_y + ball2.change_y) / 2
+    return merged_velocity(ball1.change_x, ball1.change_y, ball2.change_x, ball2.change_y)
+
+def merged_velocity(vx1, vy1, vx2, vy2):
+    avg_speed_x = (abs(vx1) + abs(vx2)) / 2
+    avg_speed_y = (abs(vy1) + abs(vy2)) / 2
+    dir_x = (vx1 + vx2) / 2
+    dir_y = (vy1 + vy2) / 2
     new_change_x = math.copysign(avg_speed_x, dir_x)
     new_change_y = math.copysign(avg_speed_y, dir_y)
     return new_change_x, new_change_y
 
-def update_and_collide(balls, all_balls):
+def spawn_ball(all_balls, x, y, change_x, change_y, color):
+    # Reaproveita o objeto de uma bola morta quando houver
+    ball = all_balls.recycle()
+    if ball is None:
+        ball = Ball(x, y, change_x, change_y, color)
+    else:
+        ball.reset(x, y, change_x, change_y, color)
+    ball.handle = all_balls.insert(ball)
+    return ball
+
+# O passo das regras tem duas fases. Na detecção, cada quadrante move e
+# colide só as suas bolas e anota mortes e nascimentos num buffer próprio,
+# sem lock e sem tocar na lista global. Depois apply_commands aplica os
+# buffers na ordem dos quadrantes, numa thread só: primeiro as mortes,
+# depois os nascimentos respeitando MAX_BALLS_PER_COLOR. O resultado não
+# depende da ordem em que as threads terminam.
+
+def update_and_collide(balls, tick, dt=1.0):
+    for ball in balls:
+        ball.update(dt)
+    return collide(balls, tick)
+
+def collide(balls, tick, parts=None):
+    # Com parts, só os pares entre partes diferentes (passe de fronteira);
+    # tick é o frame atual, para o cooldown dos nascimentos
     balls_to_remove = set()
     balls_to_add = []
 
-    for ball in balls:
-        ball.update()
-
     n = len(balls)
     for i in range(n):
         if i in balls_to_remove:
@@ -112,6 +175,8 @@ def update_and_collide(balls, all_balls):
         for j in range(i + 1, n):
             if j in balls_to_remove:
                 continue
+            if parts is not None and parts[i] == parts[j]:
+                continue
             b2 = balls[j]
             dx = b1.x - b2.x
             dy = b1.y - b2.y
@@ -140,75 +205,100 @@ def update_and_collide(balls, all_balls):
                         b1.change_x *= 0.8
                         b1.change_y *= 0.8
                 else:
-                    now = time.time()
                     # Spawn cooldown
-                    if now - b1.last_spawn_time >= COOLDOWN_SECONDS and now - b2.last_spawn_time >= COOLDOWN_SECONDS:
+                    if tick - b1.last_spawn_tick >= COOLDOWN_TICKS and tick - b2.last_spawn_tick >= COOLDOWN_TICKS:
                         new_cx, new_cy = average_velocity(b1, b2)
                         mid_x = (b1.x + b2.x) / 2
                         mid_y = (b1.y + b2.y) / 2
-                        new_ball = Ball(mid_x, mid_y, new_cx, new_cy, b1.color)
-                        with lock:
-                            # Verifica limite por cor no all_balls antes de adicionar
-                            count_color = sum(1 for ball in all_balls if ball.color == b1.color)
-                            if count_color < MAX_BALLS_PER_COLOR:
-                                balls_to_add.append(new_ball)
-                                b1.last_spawn_time = now
-                                b2.last_spawn_time = now
+                        # O limite por cor é checado na fase de aplicação
+                        balls_to_add.append((mid_x, mid_y, new_cx, new_cy, b1.color))
                         balls_to_remove.add(i)
                         balls_to_remove.add(j)
                         break
 
-    with lock:
-        # Remove bolas
-        for index in sorted(balls_to_remove, reverse=True):
-            if balls[index] in all_balls:
-                all_balls.remove(balls[index])
-            del balls[index]
-        # Adiciona novas bolas
-        for ball in balls_to_add:
-            all_balls.append(ball)
-            balls.append(ball)
+    kills = [balls[index].handle for index in sorted(balls_to_remove)]
+    return kills, balls_to_add
+
+def apply_commands(all_balls, population, buffers):
+    # Remove bolas
+    for kills, _ in buffers:
+        for handle in kills:
+            ball = all_balls.remove(handle)
+            if ball is not None:
+                population.killed(ball.color)
+    # Adiciona novas bolas, reaproveitando os slots livres
+    for _, spawns in buffers:
+        for spawn in spawns:
+            color = spawn[4]
+            if population.try_spawn(color, MAX_BALLS_PER_COLOR):
+                spawn_ball(all_balls, *spawn)
 
 class MyGame(arcade.Window):
-    def __init__(self):
+    def __init__(self, backend=BACKEND):
         super().__init__(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE)
         self.background_color = arcade.color.LIGHT_GRAY
-        self.ball_list = []
+        self.ball_list = SlotMap()
         self.total_balls_created = 0
         self.time_since_last_launch = 0.0
+        self.tick = 0
         self.executor = ThreadPoolExecutor(max_workers=NUM_QUADS)
+        self.population = ColorPopulation()
+        self.partitioner = BisectionPartitioner(SCREEN_WIDTH, SCREEN_HEIGHT, NUM_QUADS, REPARTITION_EVERY)
+        # A separação segue a ordem dos pares, como no laço das Ball
+        self.engine = make_engine(CENARIO, backend=backend, capacity=BALL_COUNT, collision_mode="sequential")
+        self.engine.on_contacts = self.collide_world
+        self.world = self.engine.world
+        self.reset_world_state()
+
+    def reset_world_state(self):
+        # Dados de jogo das bolas do mundo NumPy, na ordem dos índices dele
+        self.color_index = np.empty(0, dtype=np.int64)
+        self.previous_quad = np.empty(0, dtype=np.int64)   # -1: ainda sem quadrante
+        self.dead = set()     # mortas no frame, saem do mundo no fim dele
+        self.births = []
 
     def setup(self):
         self.ball_list.clear()
+        self.world.clear()
+        self.reset_world_state()
+        self.population.reset()
         self.total_balls_created = 0
         self.time_since_last_launch = 0.0
+        self.tick = 0
 
     def create_new_ball(self):
-        with lock:
-            # Contagem por cor na lista global
-            color_count = {}
-            for ball in self.ball_list:
-                color_count[ball.color] = color_count.get(ball.color, 0) + 1
-
-            color = random.choice(BALL_COLORS)
-            if color_count.get(color, 0) >= MAX_BALLS_PER_COLOR:
-                return  # Limite alcançado
-
-            x = random.uniform(BALL_RADIUS, SCREEN_WIDTH - BALL_RADIUS)
-            y = random.uniform(BALL_RADIUS, SCREEN_HEIGHT - BALL_RADIUS)
-            change_x = random.uniform(-4, 4)
-            change_y = random.uniform(-4, 4)
-
-            new_ball = Ball(x, y, change_x, change_y, color)
-
-            # Evita sobreposição no spawn
-            for ball in self.ball_list:
-                dist = math.hypot(ball.x - new_ball.x, ball.y - new_ball.y)
-                if dist < BALL_RADIUS * 2:
-                    return
-
-            self.ball_list.append(new_ball)
+        color = random.choice(BALL_COLORS)
+        if self.population.count(color) >= MAX_BALLS_PER_COLOR:
+            return  # Limite alcançado
+
+        x = random.uniform(BALL_RADIUS, SCREEN_WIDTH - BALL_RADIUS)
+        y = random.uniform(BALL_RADIUS, SCREEN_HEIGHT - BALL_RADIUS)
+        change_x = random.uniform(-4, 4)
+        change_y = random.uniform(-4, 4)
+
+        # Evita sobreposição no spawn
+        if USE_NUMPY_WORLD:
+            world = self.world
+            if np.any(np.hypot(world.x - x, world.y - y) < BALL_RADIUS * 2):
+                return
+            self.population.spawned(color)
+            self.add_ball(x, y, change_x, change_y, BALL_COLORS.index(color))
             self.total_balls_created += 1
+            return
+
+        for ball in self.ball_list:
+            dist = math.hypot(ball.x - x, ball.y - y)
+            if dist < BALL_RADIUS * 2:
+                return
+
+        self.population.spawned(color)
+        spawn_ball(self.ball_list, x, y, change_x, change_y, color)
+        self.total_balls_created += 1
+
+    def add_ball(self, x, y, change_x, change_y, color_index):
+        self.world.add(x, y, change_x, change_y, BALL_RADIUS, BALL_COLORS[color_index])
+        self.color_index = np.append(self.color_index, color_index)
+        self.previous_quad = np.append(self.previous_quad, -1)
 
     def get_quadrant(self, ball):
         quad_w = SCREEN_WIDTH / NUM_QUADS_X
@@ -219,6 +309,14 @@ class MyGame(arcade.Window):
         y_index = min(y_index, NUM_QUADS_Y - 1)
         return y_index * NUM_QUADS_X + x_index
 
+    def get_quadrants(self, world):
+        # get_quadrant para todas as bolas de uma vez
+        quad_w = SCREEN_WIDTH / NUM_QUADS_X
+        quad_h = SCREEN_HEIGHT / NUM_QUADS_Y
+        x_index = np.minimum((world.x // quad_w).astype(np.int64), NUM_QUADS_X - 1)
+        y_index = np.minimum((world.y // quad_h).astype(np.int64), NUM_QUADS_Y - 1)
+        return y_index * NUM_QUADS_X + x_index
+
     def on_draw(self):
         self.clear()
         quad_w = SCREEN_WIDTH / NUM_QUADS_X
@@ -233,6 +331,10 @@ class MyGame(arcade.Window):
             arcade.draw_lrbt_rectangle_filled(left, left + quad_w, bottom, bottom + quad_h, QUAD_COLORS[i])
 
         # Desenhar bolas
+        if USE_NUMPY_WORLD:
+            world = self.world
+            for x, y, color in zip(world.x.tolist(), world.y.tolist(), world.color.tolist()):
+                arcade.draw_circle_filled(x, y, BALL_RADIUS, color)
         for ball in self.ball_list:
             ball.draw()
 
@@ -240,24 +342,24 @@ class MyGame(arcade.Window):
         arcade.draw_text(f"Bolas criadas: {self.total_balls_created}", 10, SCREEN_HEIGHT - 30, arcade.color.BLACK, 18)
 
         # Mostrar contagem por cor
-        counts = {}
-        for ball in self.ball_list:
-            counts[ball.color] = counts.get(ball.color, 0) + 1
-
         x = 10
         y = 10
         for color in BALL_COLORS:
-            count = counts.get(color, 0)
+            count = self.population.count(color)
             arcade.draw_text(f"{count}", x, y, color, 16)
             x += 60
 
     def on_update(self, delta_time: float):
+        self.tick += 1
         self.time_since_last_launch += delta_time
         if self.total_balls_created < BALL_COUNT and self.time_since_last_launch >= BALL_LAUNCH_INTERVAL:
             self.create_new_ball()
             self.time_since_last_launch = 0.0
 
-        quads = [[] for _ in range(NUM_QUADS)]
+        if USE_NUMPY_WORLD:
+            self.update_world()
+            return
+
         for ball in self.ball_list:
             current_quad = self.get_quadrant(ball)
             if ball.previous_quad is not None and ball.previous_quad != current_quad:
@@ -265,20 +367,119 @@ class MyGame(arcade.Window):
                 ball.change_x += random.uniform(-impulse, impulse)
                 ball.change_y += random.uniform(-impulse, impulse)
             ball.previous_quad = current_quad
-            quads[current_quad].append(ball)
 
+        substeps = 1
+        if USE_SUBSTEPS:
+            speeds = [ball.speed for ball in self.ball_list]
+            substeps = substep_count(speeds, [BALL_RADIUS], limit=MAX_SUBSTEPS)
+        for _ in range(substeps):
+            self.step(1 / substeps)
+
+    def split_work(self):
+        # Grupos de bolas de cada thread
+        if USE_ADAPTIVE_PARTITION:
+            return self.partitioner.split_balls(list(self.ball_list))
+        quads = [[] for _ in range(NUM_QUADS)]
+        for ball in self.ball_list:
+            quads[self.get_quadrant(ball)].append(ball)
+        return quads
+
+    def step(self, dt):
+        # Um passo (ou subpasso) das regras: detecção nas threads e aplicação
+        # dos buffers. Os grupos são refeitos a cada subpasso porque as bolas
+        # mortas no anterior já saíram da lista.
+        quads = self.split_work()
         if USE_PARALLELISM:
-            futures = [self.executor.submit(update_and_collide, quad, self.ball_list) for quad in quads]
-            for future in futures:
-                future.result()
+            futures = [self.executor.submit(update_and_collide, quad, self.tick, dt) for quad in quads]
+            buffers = [future.result() for future in futures]
         else:
-            for quad in quads:
-                update_and_collide(quad, self.ball_list)
+            buffers = [update_and_collide(quad, self.tick, dt) for quad in quads]
+
+        if USE_ADAPTIVE_PARTITION:
+            # Passe de fronteira com as bolas que sobreviveram às partes
+            dead = {handle for kills, _ in buffers for handle in kills}
+            alive = [[ball for ball in quad if ball.handle not in dead] for quad in quads]
+            border, parts = self.partitioner.border_balls(alive, 2 * BALL_RADIUS)
+            buffers.append(collide(border, self.tick, parts))
+        apply_commands(self.ball_list, self.population, buffers)
+
+    def update_world(self):
+        world = self.world
+        current_quad = self.get_quadrants(world)
+        changed = np.flatnonzero((self.previous_quad >= 0) & (self.previous_quad != current_quad))
+        impulse = 10
+        for i in changed.tolist():
+            world.vx[i] += random.uniform(-impulse, impulse)
+            world.vy[i] += random.uniform(-impulse, impulse)
+        self.previous_quad = current_quad
+
+        substeps = 1
+        if USE_SUBSTEPS:
+            substeps = substep_count(np.hypot(world.vx, world.vy), world.radius, limit=MAX_SUBSTEPS)
+        self.engine.step_once(substeps)
+        self.apply_deaths_and_births()
+
+    def collide_world(self, world, pairs_i, pairs_j):
+        # Chamado pelo motor com os pares candidatos, antes da separação:
+        # aplica as regras de cor aos pares em contato, na ordem dos pares.
+        # Quem morre fica em self.dead (e não joga mais neste frame) e os
+        # nascimentos em self.births; os dois entram no mundo no fim do frame
+        dx = world.x[pairs_j] - world.x[pairs_i]
+        dy = world.y[pairs_j] - world.y[pairs_i]
+        dist = np.hypot(dx, dy)
+        touching = (dist < world.radius[pairs_i] + world.radius[pairs_j]) & (dist > 0)
+
+        x, y, vx, vy = world.x, world.y, world.vx, world.vy
+        color = self.color_index
+        dead = self.dead
+        for i, j in zip(pairs_i[touching].tolist(), pairs_j[touching].tolist()):
+            if i in dead or j in dead:
+                continue
+            if color[i] != color[j]:
+                if math.hypot(vx[i], vy[i]) < math.hypot(vx[j], vy[j]):
+                    loser, winner = i, j
+                else:
+                    loser, winner = j, i
+                dead.add(loser)
+                vx[winner] *= 0.8
+                vy[winner] *= 0.8
+            else:
+                # O par vira uma bola só no meio; como as duas morrem, o
+                # cooldown das Ball nunca barra esse nascimento
+                new_cx, new_cy = merged_velocity(vx[i], vy[i], vx[j], vy[j])
+                self.births.append(((x[i] + x[j]) / 2, (y[i] + y[j]) / 2, new_cx, new_cy, int(color[i])))
+                dead.add(i)
+                dead.add(j)
+
+    def apply_deaths_and_births(self):
+        # Como apply_commands: primeiro as mortes, depois os nascimentos
+        # respeitando MAX_BALLS_PER_COLOR
+        if self.dead:
+            dead = np.fromiter(self.dead, dtype=np.int64)
+            for k in self.color_index[dead].tolist():
+                self.population.killed(BALL_COLORS[k])
+            keep = self.world.remove(dead)
+            self.color_index = self.color_index[keep]
+            self.previous_quad = self.previous_quad[keep]
+            self.dead = set()
+        for x, y, change_x, change_y, color_index in self.births:
+            if self.population.try_spawn(BALL_COLORS[color_index], MAX_BALLS_PER_COLOR):
+                self.add_ball(x, y, change_x, change_y, color_index)
+        self.births = []
+
+    def on_close(self):
+        self.engine.close()
+        super().on_close()
 
 def main():
-    game = MyGame()
-    game.setup()
-    arcade.run()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default=BACKEND,
+                        help="backend de física do mundo NumPy")
+    args = parser.parse_args()
+    with seeded(SEED):
+        game = MyGame(args.backend)
+        game.setup()
+        arcade.run()
 
 if __name__ == "__main__":
     main()
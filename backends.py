@@ -0,0 +1,284 @@
+import math
+import os
+
+from ball_world import all_pairs
+from collision import resolve_contacts
+from parallel_world import STRIPS, StripSolver, make_rules
+from spatial_hash import grid_pairs, cell_size_for
+from sweep_prune import SweepAndPrune
+from quadtree import LooseQuadtree
+
+# Arrays do BallWorld que o backend process põe na memória compartilhada,
+# na ordem das linhas do StripSolver
+FIELDS = ("_x", "_y", "_vx", "_vy", "_radius")
+
+# Backends de física do SimulationEngine. Todos seguem as mesmas regras do
+# BallWorld (gravidade, rebotes, fricção, zeragem) e a mesma colisão
+# (troca dos componentes normais e separação pela metade da sobreposição);
+# só muda como o passo é calculado:
+#
+#   python   referência em Python puro, bola a bola e par a par
+#   numpy    integração vetorizada e todos os pares (força bruta)
+#   spatial  integração vetorizada e broad-phase (grid, sweep ou tree)
+#   process  o passo inteiro em processos, por faixas verticais com halo
+#            (parallel_world.StripSolver)
+#
+# Cada backend tem integrate(world, idx), pairs(world, idx) -> (i, j) em
+# ordem lexicográfica e resolve(world, i, j, mode, iterations). Com idx (em
+# ordem), pairs só olha essas bolas e devolve índices do mundo: os mesmos
+# pares que daria com todas, restritos a elas. neighborhood(world) é o lado
+# de uma grade em que a broad-phase só junta bolas da mesma célula ou de
+# células vizinhas (None: junta quaisquer duas). Um backend com
+# step(world, mode, iterations, substeps) faz o frame inteiro de uma vez, e o
+# motor o usa quando não há sono nem regras de jogo vendo os contatos.
+#
+# Com a resolução "sequential", python e numpy (todos os pares) calculam
+# exatamente os mesmos números. O spatial só repete esses números enquanto
+# nenhum empurrão do frame junta duas bolas que estavam além do alcance da
+# broad-phase (2 * raio máximo + margem): em pilhas densas os empurrões se
+# encadeiam e o spatial diverge (with_colision com 800 bolas diverge da
+# força bruta perto do frame 80 com a grade, 71 com a tree e 38 com o
+# sweep; com 300 bolas não diverge em 150 frames, o que
+# tests/test_broad_phase.py confere). O process dá os mesmos números com
+# qualquer número de workers; os pares entre faixas são resolvidos em
+# Jacobi, então só com strips=1 ele repete o spatial.
+
+
+def _all_pairs(world, idx):
+    if idx is None:
+        return all_pairs(len(world))
+    pairs_i, pairs_j = all_pairs(len(idx))
+    return idx[pairs_i], idx[pairs_j]
+
+
+class PythonBackend:
+    name = "python"
+
+    def integrate(self, world, idx=None, dt=1.0):
+        xs = world.x.tolist()
+        ys = world.y.tolist()
+        vxs = world.vx.tolist()
+        vys = world.vy.tolist()
+        rs = world.radius.tolist()
+        width = world.width
+        height = world.height
+        friction = world.friction if dt == 1 else world.friction ** dt
+        indices = range(len(xs)) if idx is None else idx.tolist()
+
+        for k in indices:
+            x, y, vx, vy, r = xs[k], ys[k], vxs[k], vys[k], rs[k]
+            if world.gravity:
+                vy -= world.gravity * dt
+            if dt == 1:
+                x += vx
+                y += vy
+            else:
+                x += vx * dt
+                y += vy * dt
+
+            if x - r < 0:
+                x = r
+                vx *= -world.wall_bounce
+            if x + r > width:
+                x = width - r
+                vx *= -world.wall_bounce
+            if y - r < 0:
+                y = r
+                vy *= -world.floor_bounce
+                if world.floor_stop and abs(vy) < world.floor_stop:
+                    vy = 0.0
+            if y + r > height:
+                y = height - r
+                vy *= -world.ceiling_bounce
+
+            if world.friction != 1:
+                vx *= friction
+                vy *= friction
+            if world.stop_speed:
+                if abs(vx) < world.stop_speed:
+                    vx = 0.0
+                if abs(vy) < world.stop_speed:
+                    vy = 0.0
+            xs[k], ys[k], vxs[k], vys[k] = x, y, vx, vy
+
+        world.x[:] = xs
+        world.y[:] = ys
+        world.vx[:] = vxs
+        world.vy[:] = vys
+
+    def neighborhood(self, world):
+        return None
+
+    def pairs(self, world, idx=None):
+        return _all_pairs(world, idx)
+
+    def resolve(self, world, pairs_i, pairs_j, mode="sequential", iterations=1):
+        # Sempre par a par, na ordem dada (mode e iterations não se aplicam)
+        xs = world.x.tolist()
+        ys = world.y.tolist()
+        vxs = world.vx.tolist()
+        vys = world.vy.tolist()
+        rs = world.radius.tolist()
+
+        for a, b in zip(pairs_i.tolist(), pairs_j.tolist()):
+            dx = xs[b] - xs[a]
+            dy = ys[b] - ys[a]
+            dist = math.hypot(dx, dy)
+            if dist >= rs[a] + rs[b] or dist == 0:
+                continue
+
+            nx = dx / dist
+            ny = dy / dist
+            tx = -ny
+            ty = nx
+            v1n = vxs[a] * nx + vys[a] * ny
+            v1t = vxs[a] * tx + vys[a] * ty
+            v2n = vxs[b] * nx + vys[b] * ny
+            v2t = vxs[b] * tx + vys[b] * ty
+            v1n, v2n = v2n, v1n
+            vxs[a] = v1n * nx + v1t * tx
+            vys[a] = v1n * ny + v1t * ty
+            vxs[b] = v2n * nx + v2t * tx
+            vys[b] = v2n * ny + v2t * ty
+
+            sobreposicao = rs[a] + rs[b] - dist
+            xs[a] -= nx * sobreposicao / 2
+            ys[a] -= ny * sobreposicao / 2
+            xs[b] += nx * sobreposicao / 2
+            ys[b] += ny * sobreposicao / 2
+
+        world.x[:] = xs
+        world.y[:] = ys
+        world.vx[:] = vxs
+        world.vy[:] = vys
+
+
+class NumpyBackend:
+    name = "numpy"
+
+    def integrate(self, world, idx=None, dt=1.0):
+        world.integrate(idx, dt)
+
+    def neighborhood(self, world):
+        return None
+
+    def pairs(self, world, idx=None):
+        return _all_pairs(world, idx)
+
+    def resolve(self, world, pairs_i, pairs_j, mode="jacobi", iterations=1):
+        resolve_contacts(world, pairs_i, pairs_j, mode=mode, iterations=iterations)
+
+
+class SpatialBackend(NumpyBackend):
+    name = "spatial"
+
+    def __init__(self, broad_phase="grid"):
+        if broad_phase not in ("grid", "sweep", "tree"):
+            raise ValueError(f"Broad-phase desconhecida: {broad_phase}")
+        self.broad_phase = broad_phase
+        self.sweep = SweepAndPrune()
+        self.tree = None
+        self._cell_size = None
+        self._cell_count = -1
+
+    def cell_size(self, world):
+        # Os raios não mudam; só recalcula quando entram bolas novas
+        if self._cell_count != world.count:
+            self._cell_size = cell_size_for(world.radius)
+            self._cell_count = world.count
+        return self._cell_size
+
+    def neighborhood(self, world):
+        # A célula da grade e o alcance do sweep são o mesmo; na tree um par
+        # vai até 2 * (ri + rj) de distância em cada eixo
+        if self.broad_phase == "tree":
+            return 4 * float(world.radius.max()) if world.count else 1.0
+        return self.cell_size(world)
+
+    def pairs(self, world, idx=None):
+        # Com idx, a célula e o alcance continuam os do mundo inteiro
+        x, y, radius = world.x, world.y, world.radius
+        if idx is not None:
+            x, y, radius = x[idx], y[idx], radius[idx]
+        if self.broad_phase == "sweep":
+            pairs_i, pairs_j = self.sweep.pairs(x, y, radius, reach=self.cell_size(world))
+        elif self.broad_phase == "tree":
+            if self.tree is None:
+                self.tree = LooseQuadtree(world.width, world.height)
+            self.tree.refit(x, y, radius)
+            pairs_i, pairs_j = self.tree.pairs()
+        else:
+            pairs_i, pairs_j = grid_pairs(x, y, self.cell_size(world))
+        if idx is None:
+            return pairs_i, pairs_j
+        return idx[pairs_i], idx[pairs_j]
+
+
+class ProcessBackend(SpatialBackend):
+    # O passo inteiro roda nos workers de um StripSolver (parallel_world),
+    # em faixas verticais com halo: x, y, vx, vy e raio do mundo passam a
+    # ser visões da memória compartilhada dele (uma cópia só, refeita se o
+    # mundo crescer), e step() não copia nada por frame. O resultado não
+    # depende do número de workers, só de `strips`; com strips=1 é o do
+    # spatial com a grade. integrate/pairs/resolve (usados com o sono) são
+    # os do spatial, no processo principal.
+    name = "process"
+
+    def __init__(self, broad_phase="grid", workers=None, strips=STRIPS, min_balls=2000):
+        super().__init__(broad_phase)
+        self.workers = workers or os.cpu_count() or 1
+        self.strips = strips
+        self.min_balls = min_balls
+        self.solver = None
+        self._world = None
+        self._attached = None
+
+    def _attach(self, world):
+        self.close()
+        capacity = len(world._x)
+        rules = make_rules(world.width, world.height, **world.rules())
+        self.solver = StripSolver(rules, capacity, self.workers, self.strips, self.min_balls)
+        for row, name in enumerate(FIELDS):
+            self.solver.state[row, :capacity] = getattr(world, name)
+            setattr(world, name, self.solver.state[row, :capacity])
+        self._world = world
+        self._attached = world._x
+
+    def step(self, world, mode="jacobi", iterations=1, substeps=1):
+        if self.solver is None or world is not self._world or world._x is not self._attached:
+            self._attach(world)
+        return self.solver.step(world.count, mode, iterations, substeps)
+
+    def close(self):
+        if self.solver is None:
+            return
+        world = self._world
+        if world._x is self._attached:
+            # O mundo volta a ter arrays próprios antes do bloco ser liberado
+            for name in FIELDS:
+                setattr(world, name, getattr(world, name).copy())
+        self.solver.close()
+        self.solver = None
+        self._world = None
+        self._attached = None
+
+    def __getstate__(self):
+        # Os workers não vão para o checkpoint; sobem de novo ao retomar
+        state = self.__dict__.copy()
+        state.update(solver=None, _world=None, _attached=None)
+        return state
+
+
+BACKENDS = {
+    "python": PythonBackend,
+    "numpy": NumpyBackend,
+    "spatial": SpatialBackend,
+    "process": ProcessBackend,
+}
+
+
+def make_backend(name="spatial", **options):
+    # options vão para o construtor (ex.: broad_phase="sweep" no spatial)
+    if name not in BACKENDS:
+        raise ValueError(f"Backend desconhecido: {name}")
+    return BACKENDS[name](**options)
@@ -0,0 +1,240 @@
+import math
+import numpy as np
+
+# Estado do mundo em arrays NumPy contíguos (structure of arrays).
+# Cada campo das classes Bola/Ball vira um array; o passo de integração,
+# rebote nas paredes, fricção e zeragem de velocidades roda no array inteiro.
+
+
+class BallWorld:
+    def __init__(self, width, height, gravity=0.0, wall_bounce=1.0,
+                 floor_bounce=1.0, ceiling_bounce=1.0, floor_stop=0.0,
+                 friction=1.0, stop_speed=0.0, capacity=256):
+        self.width = width
+        self.height = height
+
+        # Regras de cada script viram parâmetros
+        self.gravity = gravity
+        self.wall_bounce = wall_bounce        # vx *= -wall_bounce nas laterais
+        self.floor_bounce = floor_bounce      # vy *= -floor_bounce no chão
+        self.ceiling_bounce = ceiling_bounce  # vy *= -ceiling_bounce no topo
+        self.floor_stop = floor_stop          # |vy| abaixo disso no chão vira 0
+        self.friction = friction
+        self.stop_speed = stop_speed          # |v| abaixo disso vira 0 (por eixo)
+
+        self.count = 0
+        self._x = np.zeros(capacity)
+        self._y = np.zeros(capacity)
+        self._vx = np.zeros(capacity)
+        self._vy = np.zeros(capacity)
+        self._radius = np.zeros(capacity)
+        self._color = np.zeros((capacity, 4), dtype=np.uint8)
+
+    def __len__(self):
+        return self.count
+
+    def rules(self):
+        return {
+            "gravity": self.gravity,
+            "wall_bounce": self.wall_bounce,
+            "floor_bounce": self.floor_bounce,
+            "ceiling_bounce": self.ceiling_bounce,
+            "floor_stop": self.floor_stop,
+            "friction": self.friction,
+            "stop_speed": self.stop_speed,
+        }
+
+    # Visões dos dados válidos (sem cópia)
+    @property
+    def x(self):
+        return self._x[:self.count]
+
+    @property
+    def y(self):
+        return self._y[:self.count]
+
+    @property
+    def vx(self):
+        return self._vx[:self.count]
+
+    @property
+    def vy(self):
+        return self._vy[:self.count]
+
+    @property
+    def radius(self):
+        return self._radius[:self.count]
+
+    @property
+    def color(self):
+        return self._color[:self.count]
+
+    def _grow(self):
+        capacity = max(1, len(self._x) * 2)
+        for name in ("_x", "_y", "_vx", "_vy", "_radius", "_color"):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def add(self, x, y, vx, vy, radius, color):
+        if self.count == len(self._x):
+            self._grow()
+        i = self.count
+        self._x[i] = x
+        self._y[i] = y
+        self._vx[i] = vx
+        self._vy[i] = vy
+        self._radius[i] = radius
+        self._color[i] = tuple(color)[:4] if len(color) >= 4 else tuple(color) + (255,)
+        self.count += 1
+        return i
+
+    def clear(self):
+        self.count = 0
+
+    def remove(self, idx):
+        # Tira as bolas idx; as outras descem mantendo a ordem, então os
+        # índices mudam. Devolve a máscara das que ficaram, para compactar
+        # junto os arrays paralelos de quem chamou
+        keep = np.ones(self.count, dtype=bool)
+        keep[idx] = False
+        n = int(np.count_nonzero(keep))
+        for name in ("_x", "_y", "_vx", "_vy", "_radius", "_color"):
+            array = getattr(self, name)
+            array[:n] = array[:self.count][keep]
+        self.count = n
+        return keep
+
+    def integrate(self, idx=None, dt=1.0):
+        # idx permite integrar só um subconjunto (ex.: um quadrante);
+        # dt < 1 é um subpasso (fração de frame)
+        if idx is None:
+            self.integrate_arrays(self.x, self.y, self.vx, self.vy, self.radius, dt)
+            return
+
+        x, y, vx, vy = self.x[idx], self.y[idx], self.vx[idx], self.vy[idx]
+        self.integrate_arrays(x, y, vx, vy, self.radius[idx], dt)
+        self.x[idx] = x
+        self.y[idx] = y
+        self.vx[idx] = vx
+        self.vy[idx] = vy
+
+    def integrate_arrays(self, x, y, vx, vy, r, dt=1.0):
+        # Aplica as regras deste mundo em arrays quaisquer (in-place),
+        # por exemplo cópias locais de um worker
+        if self.gravity:
+            vy -= self.gravity * dt
+
+        if dt == 1:
+            x += vx
+            y += vy
+        else:
+            x += vx * dt
+            y += vy * dt
+
+        # Colisão com as paredes
+        hit = x - r < 0
+        x[hit] = r[hit]
+        vx[hit] *= -self.wall_bounce
+        hit = x + r > self.width
+        x[hit] = self.width - r[hit]
+        vx[hit] *= -self.wall_bounce
+
+        hit = y - r < 0
+        y[hit] = r[hit]
+        vy[hit] *= -self.floor_bounce
+        if self.floor_stop:
+            vy[hit & (np.abs(vy) < self.floor_stop)] = 0
+        hit = y + r > self.height
+        y[hit] = self.height - r[hit]
+        vy[hit] *= -self.ceiling_bounce
+
+        # Fricção (por frame: k subpassos de 1/k compõem a mesma fricção)
+        if self.friction != 1:
+            friction = self.friction if dt == 1 else self.friction ** dt
+            vx *= friction
+            vy *= friction
+
+        # Zera velocidades muito pequenas
+        if self.stop_speed:
+            vx[np.abs(vx) < self.stop_speed] = 0
+            vy[np.abs(vy) < self.stop_speed] = 0
+
+    def collide_sequential(self, pairs_i, pairs_j):
+        # Resolve os pares um a um, na ordem dada (igual a Bola.resolver_colisao).
+        # Só as bolas envolvidas são lidas e escritas, então quadrantes
+        # disjuntos podem rodar em threads diferentes. Devolve o número de
+        # contatos resolvidos.
+        return collide_sequential_arrays(self.x, self.y, self.vx, self.vy, self.radius, pairs_i, pairs_j)
+
+
+def collide_sequential_arrays(x, y, vx, vy, radius, pairs_i, pairs_j):
+    # BallWorld.collide_sequential direto nos arrays (in-place), para servir
+    # também a cópias locais nos workers de processo
+    if len(pairs_i) == 0:
+        return 0
+    ids = np.unique(np.concatenate((pairs_i, pairs_j)))
+    local_i = np.searchsorted(ids, pairs_i).tolist()
+    local_j = np.searchsorted(ids, pairs_j).tolist()
+    xs = x[ids].tolist()
+    ys = y[ids].tolist()
+    vxs = vx[ids].tolist()
+    vys = vy[ids].tolist()
+    rs = radius[ids].tolist()
+
+    contacts = 0
+    for a, b in zip(local_i, local_j):
+        dx = xs[b] - xs[a]
+        dy = ys[b] - ys[a]
+        dist = math.hypot(dx, dy)
+        if dist >= rs[a] + rs[b] or dist == 0:
+            continue
+        contacts += 1
+
+        nx = dx / dist
+        ny = dy / dist
+        tx = -ny
+        ty = nx
+
+        v1n = vxs[a] * nx + vys[a] * ny
+        v1t = vxs[a] * tx + vys[a] * ty
+        v2n = vxs[b] * nx + vys[b] * ny
+        v2t = vxs[b] * tx + vys[b] * ty
+
+        # Troca os componentes normais (massa igual, colisão elástica)
+        v1n, v2n = v2n, v1n
+
+        vxs[a] = v1n * nx + v1t * tx
+        vys[a] = v1n * ny + v1t * ty
+        vxs[b] = v2n * nx + v2t * tx
+        vys[b] = v2n * ny + v2t * ty
+
+        sobreposicao = rs[a] + rs[b] - dist
+        xs[a] -= nx * sobreposicao / 2
+        ys[a] -= ny * sobreposicao / 2
+        xs[b] += nx * sobreposicao / 2
+        ys[b] += ny * sobreposicao / 2
+
+    x[ids] = xs
+    y[ids] = ys
+    vx[ids] = vxs
+    vy[ids] = vys
+    return contacts
+
+
+def substep_count(speed, radius, fraction=0.5, limit=16):
+    # Subpassos por frame para que nenhuma bola ande mais que fraction vezes
+    # o menor raio entre dois testes de colisão: com fraction <= 1 duas bolas
+    # não conseguem atravessar uma à outra sem serem vistas se tocando
+    if len(speed) == 0:
+        return 1
+    travel = fraction * float(np.min(radius))
+    if travel <= 0:
+        return limit
+    return int(min(limit, max(1, math.ceil(float(np.max(speed)) / travel))))
+
+
+def all_pairs(n):
+    # Todos os pares i < j (equivalente ao laço duplo original)
+    return np.triu_indices(n, k=1)
@@ -0,0 +1,118 @@
+import numpy as np
+from arcade.gl import BufferDescription
+
+# Desenho em lote de todas as bolas com uma única chamada instanciada,
+# em vez de um arcade.draw_circle_filled por bola. As posições vêm direto
+# dos arrays da simulação e são copiadas para a GPU de uma vez por frame.
+#
+# Usa só OpenGL 3.3 core (um quad por instância, círculo recortado no
+# fragment shader), então roda também em software com Mesa llvmpipe:
+#   LIBGL_ALWAYS_SOFTWARE=1 python Test_Max_Objects_Without_Colision.py
+
+VERTEX_SHADER = """
+#version 330
+
+uniform WindowBlock {
+    mat4 projection;
+    mat4 view;
+} window;
+
+in vec2 in_vert;
+in vec2 in_pos;
+in float in_radius;
+in vec4 in_color;
+
+out vec2 v_local;
+out vec4 v_color;
+
+void main() {
+    v_local = in_vert;
+    v_color = in_color;
+    gl_Position = window.projection * window.view * vec4(in_pos + in_vert * in_radius, 0.0, 1.0);
+}
+"""
+
+FRAGMENT_SHADER = """
+#version 330
+
+in vec2 v_local;
+in vec4 v_color;
+
+out vec4 fragColor;
+
+void main() {
+    if (dot(v_local, v_local) > 1.0) {
+        discard;
+    }
+    fragColor = v_color;
+}
+"""
+
+INSTANCE_DTYPE = np.dtype([("pos", "<f4", 2), ("radius", "<f4"), ("color", "u1", 4)])
+INSTANCE_FORMAT = "2f 1f 4f1"
+
+
+class CircleBatch:
+    def __init__(self, ctx, capacity=1024):
+        self.ctx = ctx
+        self.program = ctx.program(vertex_shader=VERTEX_SHADER, fragment_shader=FRAGMENT_SHADER)
+        quad = np.array([-1, -1, 1, -1, -1, 1, 1, 1], dtype="<f4")
+        self.quad = ctx.buffer(data=quad.tobytes())
+        self.count = 0
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        self.capacity = capacity
+        self.staging = np.zeros(capacity, dtype=INSTANCE_DTYPE)
+        self.instances = self.ctx.buffer(reserve=capacity * INSTANCE_DTYPE.itemsize, usage="stream")
+        self.geometry = self.ctx.geometry(
+            [
+                BufferDescription(self.quad, "2f", ["in_vert"]),
+                BufferDescription(self.instances, INSTANCE_FORMAT,
+                                  ["in_pos", "in_radius", "in_color"], instanced=True),
+            ],
+            mode=self.ctx.TRIANGLE_STRIP,
+        )
+
+    def _reserve(self, n):
+        if n <= self.capacity:
+            return
+        old = self.staging[:self.count]
+        capacity = self.capacity
+        while capacity < n:
+            capacity *= 2
+        self._allocate(capacity)
+        self.staging[:len(old)] = old
+
+    def update(self, x, y, radius, color):
+        # Atualiza tudo (usar quando bolas entram/saem ou mudam de cor)
+        n = len(x)
+        self._reserve(n)
+        staging = self.staging
+        staging["pos"][:n, 0] = x
+        staging["pos"][:n, 1] = y
+        staging["radius"][:n] = radius
+        staging["color"][:n] = color
+        self.count = n
+        self.instances.write(staging[:n].tobytes())
+
+    def update_positions(self, x, y):
+        # Só as posições: raio e cor continuam os do último update()
+        n = self.count
+        staging = self.staging
+        staging["pos"][:n, 0] = x
+        staging["pos"][:n, 1] = y
+        self.instances.write(staging[:n].tobytes())
+
+    def update_points(self, points):
+        # Posições (n, 2) numa cópia só, por exemplo a visão de um frame
+        # gravado (Recording.positions), sem separar x e y antes
+        n = self.count
+        self.staging["pos"][:n] = points
+        self.instances.write(self.staging[:n].tobytes())
+
+    def draw(self):
+        if self.count == 0:
+            return
+        self.ctx.enable(self.ctx.BLEND)
+        self.geometry.render(self.program, vertices=4, instances=self.count)
@@ -0,0 +1,312 @@
+import argparse
+import csv
+import json
+import os
+import platform
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from backends import BACKENDS, make_backend
+from collision import resolve_contacts
+from parallel_world import ProcessWorld, make_rules
+from scenarios import SCENARIOS as CONFIGS, make_world
+from simulation_engine import SimulationEngine
+from spatial_hash import grid_pairs, cell_size_for
+
+# Benchmark headless dos cenários Test_Max_Objects_*: roda só o passo de
+# física (sem janela do arcade) para uma varredura de N, mede a latência de
+# cada passo e procura por busca binária o maior N que cabe no orçamento
+# de tempo por frame.
+#
+#   python benchmark.py --sizes 500 1000 2000 4000 --json resultados.json --csv resultados.csv
+#   python benchmark.py --scenario without_gravity --search --budget-ms 16.6
+#   python benchmark.py --scenario without_gravity --broad-phase sweep
+#   python benchmark.py --scenario with_colision --backend python --sizes 200
+#
+# Com --render também mede o desenho (janela invisível do arcade); em
+# máquinas sem GPU: LIBGL_ALWAYS_SOFTWARE=1 ARCADE_HEADLESS=1
+
+BALL_RADIUS = 10
+NUM_QUADS_X = 4
+NUM_QUADS_Y = 2
+PERCENTILES = (50, 90, 99)
+
+
+def _fill(world, n, rng, speed):
+    r = BALL_RADIUS
+    xs = rng.uniform(r, world.width - r, n)
+    ys = rng.uniform(r, world.height - r, n)
+    vxs = rng.uniform(-speed, speed, n)
+    vys = rng.uniform(-speed, speed, n)
+    for x, y, vx, vy in zip(xs, ys, vxs, vys):
+        world.add(x, y, vx, vy, r, (0, 0, 255))
+
+
+def _backend(name, broad_phase):
+    # broad_phase só vale para os backends spatial e process
+    if name in ("spatial", "process"):
+        return make_backend(name, broad_phase=broad_phase)
+    return make_backend(name)
+
+
+def _engine_scenario(scenario, n, rng, mode, backend, speed):
+    # Regras do cenário em scenarios.py, passo pelo SimulationEngine
+    world = make_world(scenario, capacity=n)
+    _fill(world, n, rng, speed)
+    engine = SimulationEngine(world, mode, backend=backend, collide=CONFIGS[scenario].get("collide", True))
+    return engine.step_once, getattr(backend, "close", None)
+
+
+# Cada cenário recebe (n, rng, mode, backend) e devolve (step, close)
+
+def scenario_with_colision(n, rng, mode, backend):
+    # Test_Max_Objects_With_Colision.py: gravidade, amortecimento nas bordas
+    return _engine_scenario("with_colision", n, rng, mode, backend, 3)
+
+
+def scenario_without_colision(n, rng, mode, backend):
+    # Test_Max_Objects_Without_Colision.py: só integração
+    return _engine_scenario("without_colision", n, rng, mode, backend, 4)
+
+
+def scenario_without_gravity(n, rng, mode, backend):
+    # Test_Max_Objects_Without_Gravity.py: fricção e colisão entre bolas
+    return _engine_scenario("without_gravity", n, rng, mode, backend, 4)
+
+
+def _quadrants(world):
+    quad_w = world.width / NUM_QUADS_X
+    quad_h = world.height / NUM_QUADS_Y
+    x_index = np.minimum((world.x // quad_w).astype(np.int64), NUM_QUADS_X - 1)
+    y_index = np.minimum((world.y // quad_h).astype(np.int64), NUM_QUADS_Y - 1)
+    return y_index * NUM_QUADS_X + x_index
+
+
+def _impulse(world, previous, rng):
+    # Impulso ao trocar de quadrante, como no script original
+    current = _quadrants(world)
+    changed = np.flatnonzero((previous >= 0) & (previous != current))
+    world.vx[changed] += rng.uniform(-10, 10, len(changed))
+    world.vy[changed] += rng.uniform(-10, 10, len(changed))
+    previous[:] = current
+    return current
+
+
+def scenario_thread_test(n, rng, mode, backend):
+    # Test_Max_Objects_With_Thread_Test.py com os quadrantes no ThreadPoolExecutor
+    # (sempre com a grade: os quadrantes mudam de bolas a cada frame)
+    world = make_world("without_gravity", capacity=n)
+    _fill(world, n, rng, 4)
+    previous = np.full(n, -1)
+    executor = ThreadPoolExecutor(max_workers=NUM_QUADS_X * NUM_QUADS_Y)
+
+    def update_quad(idx):
+        world.integrate(idx)
+        pairs_i, pairs_j = grid_pairs(world.x[idx], world.y[idx], cell_size_for(world.radius[idx]))
+        resolve_contacts(world, pairs_i, pairs_j, mode=mode, idx=idx)
+
+    def step():
+        current = _impulse(world, previous, rng)
+        quads = [np.flatnonzero(current == q) for q in range(NUM_QUADS_X * NUM_QUADS_Y)]
+        for future in [executor.submit(update_quad, quad) for quad in quads]:
+            future.result()
+
+    return step, executor.shutdown
+
+
+def scenario_process_test(n, rng, mode, backend):
+    # Mesmo cenário com o backend de processos (parallel_world.py)
+    rules = make_rules(1600, 900, friction=0.99, stop_speed=0.01)
+    world = ProcessWorld(rules, capacity=n)
+    _fill(world, n, rng, 4)
+    previous = np.full(n, -1)
+
+    def step():
+        _impulse(world, previous, rng)
+        world.step()
+
+    return step, world.close
+
+
+def _render_scenario(n, rng, batched):
+    # Passo sem colisão + desenho, como Test_Max_Objects_Without_Colision.py
+    import arcade
+
+    window = arcade.Window(1600, 900, "benchmark", visible=False)
+    world = make_world("without_colision", capacity=n)
+    _fill(world, n, rng, 4)
+    if batched:
+        from batch_renderer import CircleBatch
+        batch = CircleBatch(window.ctx, capacity=n)
+
+    def step():
+        world.integrate()
+        window.clear()
+        if batched:
+            batch.update(world.x, world.y, world.radius, world.color)
+            batch.draw()
+        else:
+            for x, y, r, color in zip(world.x.tolist(), world.y.tolist(), world.radius.tolist(), world.color.tolist()):
+                arcade.draw_circle_filled(x, y, r, color)
+        # Espera a GPU terminar para medir o frame inteiro
+        window.ctx.finish()
+
+    return step, window.close
+
+
+def scenario_render_batch(n, rng, mode, backend):
+    return _render_scenario(n, rng, batched=True)
+
+
+def scenario_render_immediate(n, rng, mode, backend):
+    return _render_scenario(n, rng, batched=False)
+
+
+RENDER_SCENARIOS = {
+    "render_batch": scenario_render_batch,
+    "render_immediate": scenario_render_immediate,
+}
+
+SCENARIOS = {
+    "with_colision": scenario_with_colision,
+    "without_colision": scenario_without_colision,
+    "without_gravity": scenario_without_gravity,
+    "thread_test": scenario_thread_test,
+    "process_test": scenario_process_test,
+    **RENDER_SCENARIOS,
+}
+
+
+def measure(scenario, n, frames=100, warmup=20, mode="jacobi", seed=0, broad_phase="grid",
+            backend="spatial"):
+    rng = np.random.default_rng(seed)
+    step, close = SCENARIOS[scenario](n, rng, mode, _backend(backend, broad_phase))
+    try:
+        for _ in range(warmup):
+            step()
+        times = np.empty(frames)
+        for k in range(frames):
+            start = time.perf_counter()
+            step()
+            times[k] = time.perf_counter() - start
+    finally:
+        if close is not None:
+            close()
+
+    times_ms = times * 1000
+    result = {
+        "scenario": scenario,
+        "n": n,
+        "mode": mode,
+        "backend": backend,
+        "broad_phase": broad_phase,
+        "frames": frames,
+        "mean_ms": float(times_ms.mean()),
+        "max_ms": float(times_ms.max()),
+    }
+    for p in PERCENTILES:
+        result[f"p{p}_ms"] = float(np.percentile(times_ms, p))
+    return result
+
+
+def search_max_n(scenario, budget_ms, percentile=90, low=100, high=200000,
+                 tolerance=0.05, **options):
+    # Busca binária (geométrica) do maior N cujo percentil cabe no orçamento
+    key = f"p{percentile}_ms"
+    results = []
+
+    def fits(n):
+        result = measure(scenario, n, **options)
+        results.append(result)
+        return result[key] <= budget_ms
+
+    if not fits(low):
+        return 0, results
+    # Dobra até estourar o orçamento
+    while low * 2 <= high and fits(low * 2):
+        low *= 2
+    high = min(high, low * 2)
+    while high - low > max(1, int(low * tolerance)):
+        mid = (low + high) // 2
+        if fits(mid):
+            low = mid
+        else:
+            high = mid
+    return low, results
+
+
+def machine_info():
+    return {
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+    }
+
+
+def write_csv(path, rows):
+    fields = ["scenario", "n", "mode", "backend", "broad_phase", "frames", "mean_ms", "max_ms"] + [f"p{p}_ms" for p in PERCENTILES]
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark headless dos cenários Test_Max_Objects")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS) + ["all"], default="all")
+    parser.add_argument("--render", action="store_true", help="inclui os cenários de desenho em \"all\"")
+    parser.add_argument("--sizes", type=int, nargs="*", default=[500, 1000, 2000, 4000])
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--mode", choices=["jacobi", "sequential"], default="jacobi")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="spatial")
+    parser.add_argument("--broad-phase", choices=["grid", "sweep", "tree"], default="grid")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--search", action="store_true", help="procura o N máximo dentro do orçamento")
+    parser.add_argument("--budget-ms", type=float, default=16.6)
+    parser.add_argument("--percentile", type=int, choices=PERCENTILES, default=90)
+    parser.add_argument("--json", help="arquivo JSON de saída")
+    parser.add_argument("--csv", help="arquivo CSV de saída")
+    args = parser.parse_args()
+
+    if args.scenario == "all":
+        scenarios = sorted(name for name in SCENARIOS if args.render or name not in RENDER_SCENARIOS)
+    else:
+        scenarios = [args.scenario]
+    options = {"frames": args.frames, "warmup": args.warmup, "mode": args.mode, "seed": args.seed,
+               "broad_phase": args.broad_phase, "backend": args.backend}
+    rows = []
+    max_n = {}
+
+    for scenario in scenarios:
+        for n in args.sizes:
+            result = measure(scenario, n, **options)
+            rows.append(result)
+            print(f"{scenario:18} N={n:6}  p50={result['p50_ms']:8.2f} ms  "
+                  f"p90={result['p90_ms']:8.2f} ms  p99={result['p99_ms']:8.2f} ms")
+        if args.search:
+            best, results = search_max_n(scenario, args.budget_ms, args.percentile, **options)
+            rows.extend(results)
+            max_n[scenario] = best
+            print(f"{scenario:18} N máximo em {args.budget_ms} ms (p{args.percentile}): {best}")
+
+    if args.json:
+        report = {
+            "machine": machine_info(),
+            "budget_ms": args.budget_ms,
+            "percentile": args.percentile,
+            "results": rows,
+            "max_n": max_n,
+        }
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.csv:
+        write_csv(args.csv, rows)
+
+
+if __name__ == "__main__":
+    main()
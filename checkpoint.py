@@ -0,0 +1,100 @@
+import os
+import pickle
+import random
+import numpy as np
+
+from ball_world import BallWorld
+from frame_recording import RecordingWriter
+from simulation_engine import SimulationEngine
+
+# Checkpoints duráveis do estado completo da simulação (mundo, regras,
+# frame atual, bolas dormindo e estado dos geradores aleatórios), para
+# retomar execuções longas ou estender uma gravação pronta sem recalcular
+# os frames antigos.
+
+CHECKPOINT_VERSION = 1
+ARRAYS = ("x", "y", "vx", "vy", "radius", "color")
+
+
+def save_checkpoint(engine, path):
+    world = engine.world
+    state = {
+        "version": CHECKPOINT_VERSION,
+        "frame": engine.frame,
+        "collision_mode": engine.collision_mode,
+        "iterations": engine.iterations,
+        "sleep": engine.sleep,
+        "backend": engine.backend,
+        "collide": engine.collide,
+        "bounce": engine.bounce,
+        "width": world.width,
+        "height": world.height,
+        "rules": world.rules(),
+        "arrays": {name: np.array(getattr(world, name)) for name in ARRAYS},
+        "random_state": random.getstate(),
+        "numpy_random_state": np.random.get_state(),
+    }
+    # Escreve em arquivo temporário e troca atomicamente: uma queda no meio
+    # da escrita nunca deixa um checkpoint corrompido no lugar do anterior
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path):
+    with open(path, "rb") as f:
+        state = pickle.load(f)
+    if state.get("version") != CHECKPOINT_VERSION:
+        raise ValueError(f"{path}: versão de checkpoint não suportada")
+
+    arrays = state["arrays"]
+    count = len(arrays["x"])
+    world = BallWorld(state["width"], state["height"], capacity=max(1, count), **state["rules"])
+    for name in ARRAYS:
+        getattr(world, "_" + name)[:count] = arrays[name]
+    world.count = count
+
+    random.setstate(state["random_state"])
+    np.random.set_state(state["numpy_random_state"])
+
+    engine = SimulationEngine(world, state["collision_mode"], state["iterations"], state.get("sleep"),
+                              state.get("backend"), state.get("collide", True),
+                              state.get("bounce", True))
+    engine.frame = state["frame"]
+    return engine
+
+
+def record_run(engine, recording_path, total_frames, checkpoint_path, checkpoint_every,
+               append=False, progress=None, writer_class=RecordingWriter):
+    # Simula até total_frames gravando cada frame; a cada checkpoint_every
+    # frames sincroniza a gravação e salva o checkpoint, nessa ordem, para que
+    # o arquivo de frames nunca fique atrás do checkpoint
+    world = engine.world
+    writer = writer_class(recording_path, world.radius, world.color, world.width, world.height,
+                          append=append, keep_frames=engine.frame if append else None)
+
+    def checkpoint():
+        writer.sync()
+        save_checkpoint(engine, checkpoint_path)
+
+    def observer(engine):
+        writer.write_frame(world.x, world.y, world.vx, world.vy)
+        if engine.frame % checkpoint_every == 0:
+            checkpoint()
+        if progress is not None:
+            progress(engine.frame, total_frames)
+
+    # Uma interrupção pode cair no meio de um passo, com o mundo pela metade:
+    # nesse caso vale o último checkpoint periódico, não o estado atual
+    try:
+        engine.step(max(0, total_frames - engine.frame), observer=observer)
+    except KeyboardInterrupt:
+        print("\nInterrompido; use --resume para continuar do último checkpoint.")
+        raise
+    else:
+        checkpoint()
+    finally:
+        writer.close()
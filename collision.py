@@ -0,0 +1,110 @@
+import numpy as np
+
+# Narrow-phase em lote: resolve todos os contatos candidatos de um frame
+# com operações vetorizadas, no estilo Jacobi (acumula e depois aplica).
+#
+# A física é a mesma de Bola.resolver_colisao / update_and_collide:
+# troca dos componentes normais das velocidades (massas iguais) e
+# separação das bolas pela metade da sobreposição para cada lado.
+
+
+def _contacts(x, y, r, pairs_i, pairs_j):
+    dx = x[pairs_j] - x[pairs_i]
+    dy = y[pairs_j] - y[pairs_i]
+    dist = np.hypot(dx, dy)
+    hit = (dist < r[pairs_i] + r[pairs_j]) & (dist > 0)
+    i = pairs_i[hit]
+    j = pairs_j[hit]
+    dist = dist[hit]
+    nx = dx[hit] / dist
+    ny = dy[hit] / dist
+    overlap = r[i] + r[j] - dist
+    return i, j, nx, ny, overlap
+
+
+def _independent_batches(i, j, n):
+    # Divide os contatos em lotes em que nenhuma bola aparece duas vezes,
+    # preservando a ordem original dos pares (o primeiro par pendente
+    # sempre entra no lote, então o laço termina)
+    remaining = np.arange(len(i))
+    while len(remaining):
+        ri = i[remaining]
+        rj = j[remaining]
+        k = np.arange(len(remaining))
+        first = np.full(n, len(remaining))
+        np.minimum.at(first, ri, k)
+        np.minimum.at(first, rj, k)
+        take = (first[ri] == k) & (first[rj] == k)
+        yield remaining[take]
+        remaining = remaining[~take]
+
+
+def resolve_contacts_arrays(x, y, vx, vy, r, pairs_i, pairs_j, iterations=1, relaxation=1.0):
+    # Opera direto nos arrays (in-place), para servir tanto ao BallWorld
+    # quanto a blocos de memória compartilhada
+    n = len(x)
+    pairs_i = np.asarray(pairs_i, dtype=np.int64)
+    pairs_j = np.asarray(pairs_j, dtype=np.int64)
+    if len(pairs_i) == 0:
+        return 0
+
+    i, j, nx, ny, overlap = _contacts(x, y, r, pairs_i, pairs_j)
+    num_contacts = len(i)
+    if num_contacts == 0:
+        return 0
+
+    # Velocidades: uma troca por contato. Somar todas as trocas calculadas
+    # do mesmo estado injeta energia quando uma bola tem vários contatos,
+    # então a troca é aplicada em lotes independentes (cada lote é exato)
+    for batch in _independent_batches(i, j, n):
+        bi = i[batch]
+        bj = j[batch]
+        bnx = nx[batch]
+        bny = ny[batch]
+        dvn = (vx[bj] * bnx + vy[bj] * bny) - (vx[bi] * bnx + vy[bi] * bny)
+        vx[bi] += dvn * bnx
+        vy[bi] += dvn * bny
+        vx[bj] -= dvn * bnx
+        vy[bj] -= dvn * bny
+
+    # Posições: separação acumulada; as iterações extras de relaxação
+    # recalculam a sobreposição restante só com os pares em contato
+    for iteration in range(iterations):
+        if iteration > 0:
+            i, j, nx, ny, overlap = _contacts(x, y, r, i, j)
+            if len(i) == 0:
+                break
+        push = overlap * (relaxation / 2)
+        x += np.bincount(j, push * nx, n) - np.bincount(i, push * nx, n)
+        y += np.bincount(j, push * ny, n) - np.bincount(i, push * ny, n)
+
+    return num_contacts
+
+
+def resolve_contacts(world, pairs_i, pairs_j, mode="jacobi", iterations=1, relaxation=1.0, idx=None):
+    # mode="sequential" mantém a ordem par a par da implementação original.
+    # Com idx, os pares são índices locais de world.*[idx] e só essas bolas
+    # são escritas (quadrantes disjuntos podem rodar em paralelo).
+    # Devolve o número de contatos resolvidos.
+    if mode == "sequential":
+        if idx is not None:
+            pairs_i, pairs_j = idx[pairs_i], idx[pairs_j]
+        return world.collide_sequential(pairs_i, pairs_j)
+    if mode != "jacobi":
+        raise ValueError(f"Modo de colisão desconhecido: {mode}")
+
+    if idx is None:
+        return resolve_contacts_arrays(
+            world.x, world.y, world.vx, world.vy, world.radius,
+            pairs_i, pairs_j, iterations, relaxation,
+        )
+
+    x, y, vx, vy = world.x[idx], world.y[idx], world.vx[idx], world.vy[idx]
+    num_contacts = resolve_contacts_arrays(
+        x, y, vx, vy, world.radius[idx], pairs_i, pairs_j, iterations, relaxation,
+    )
+    world.x[idx] = x
+    world.y[idx] = y
+    world.vx[idx] = vx
+    world.vy[idx] = vy
+    return num_contacts
@@ -0,0 +1,291 @@
+import os
+import struct
+import zlib
+import numpy as np
+
+# Formato compacto de gravação:
+#   - raio e cor gravados uma vez; cores viram índices de uma paleta
+#   - velocidades não são gravadas (a reprodução só precisa das posições)
+#   - posições quantizadas em 16 bits contra a largura/altura da tela, com
+#     uma margem em volta (a separação das colisões pode empurrar uma bola
+#     um pouco para fora das paredes)
+#   - cada frame guarda só o resíduo da predição linear 2*p[t-1] - p[t-2]
+#     (bolas paradas ou em movimento retilíneo custam quase nada), em
+#     zigzag, separado por bytes altos/baixos e comprimido com zlib
+#   - um quadro-chave a cada keyframe_interval frames limita o custo de seek
+#
+# A leitura é por memory map, como na gravação bruta: só os blobs dos frames
+# decodificados (e os tamanhos dos registros) passam pela memória.
+#
+# A predição é feita sobre os valores já quantizados, então a codificação é
+# exata nesse domínio e o erro de posição nunca acumula: no máximo meio
+# passo de quantização, (width + 2 * margin) / 65535 / 2 em x e o análogo
+# em y (cerca de 0.016 px e 0.007 px numa tela de 2000x900 com bolas de
+# raio até 10). Só posições além da margem são cortadas.
+
+MAGIC = b"BOLACMP1"
+VERSION = 1
+HEADER = struct.Struct("<8sIIdddII")
+RECORD = struct.Struct("<I")
+LEVELS = 65535
+CACHED_SEGMENTS = 2   # trechos decodificados guardados na leitura
+
+
+def _zigzag(residual):
+    r = residual.view(np.int16)
+    return ((r << 1) ^ (r >> 15)).view(np.uint16)
+
+
+def _unzigzag(z):
+    return ((z >> 1) ^ (-(z & 1)).astype(np.uint16)).view(np.uint16)
+
+
+def _pack(values):
+    # Bytes baixos e altos separados comprimem bem melhor
+    raw = values.view(np.uint8).reshape(-1, 2)
+    return zlib.compress(np.ascontiguousarray(raw.T).tobytes(), 6)
+
+
+def _unpack(blob, count):
+    raw = np.frombuffer(zlib.decompress(blob), dtype=np.uint8).reshape(2, count)
+    return np.ascontiguousarray(raw.T).view(np.uint16).reshape(count)
+
+
+def _predict(prev, prev2):
+    # Aritmética módulo 2^16 (uint16), então não há estouro
+    if prev is None:
+        return None
+    if prev2 is None:
+        return prev
+    return prev + prev - prev2
+
+
+def position_error(width, height, margin=0.0):
+    # Erro máximo de posição introduzido pela quantização
+    return (width + 2 * margin) / LEVELS / 2, (height + 2 * margin) / LEVELS / 2
+
+
+class _Header:
+    def __init__(self, num_balls, width, height, margin, palette_size, keyframe_interval):
+        self.num_balls = num_balls
+        self.width = width
+        self.height = height
+        self.margin = margin
+        self.palette_size = palette_size
+        self.keyframe_interval = keyframe_interval
+        self.index_dtype = np.uint8 if palette_size <= 256 else np.uint16
+
+    @property
+    def data_offset(self):
+        n = self.num_balls
+        return (HEADER.size + n * 4 + self.palette_size * 4
+                + n * np.dtype(self.index_dtype).itemsize)
+
+
+def _read_header(f):
+    magic, version, n, width, height, margin, palette_size, interval = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("não é uma gravação compacta válida")
+    header = _Header(n, width, height, margin, palette_size, interval)
+    radius = np.frombuffer(f.read(n * 4), dtype="<f4")
+    palette = np.frombuffer(f.read(palette_size * 4), dtype=np.uint8).reshape(palette_size, 4)
+    index_dtype = np.dtype(header.index_dtype).newbyteorder("<")
+    color_index = np.frombuffer(f.read(n * index_dtype.itemsize), dtype=index_dtype)
+    return header, radius, palette, color_index
+
+
+def _map(path):
+    return np.memmap(path, dtype=np.uint8, mode="r")
+
+
+def _scan_records(data, offset, limit=None):
+    # Offsets (início do blob, tamanho) dos frames completos
+    records = []
+    while offset + RECORD.size <= len(data) and (limit is None or len(records) < limit):
+        (size,) = RECORD.unpack_from(data, offset)
+        if offset + RECORD.size + size > len(data):
+            break
+        records.append((offset + RECORD.size, size))
+        offset += RECORD.size + size
+    return records, offset
+
+
+class _Decoder:
+    # Estado de decodificação sequencial (últimos dois frames quantizados)
+    def __init__(self, num_balls, keyframe_interval):
+        self.count = 2 * num_balls
+        self.keyframe_interval = keyframe_interval
+        self.frame = -1
+        self.prev = None
+        self.prev2 = None
+
+    def decode(self, k, blob):
+        values = _unpack(blob, self.count)
+        if k % self.keyframe_interval == 0:
+            prev, prev2 = None, None
+        else:
+            prev, prev2 = self.prev, self.prev2
+        predicted = _predict(prev, prev2)
+        current = values if predicted is None else predicted + _unzigzag(values)
+        self.prev2 = prev
+        self.prev = current
+        self.frame = k
+        return current
+
+
+class CompactRecordingWriter:
+    def __init__(self, path, radius, color, width, height, keyframe_interval=60,
+                 append=False, keep_frames=None):
+        self.path = path
+        if append:
+            self._open_append(keep_frames)
+            return
+
+        radius = np.asarray(radius, dtype="<f4")
+        color = np.asarray(color, dtype=np.uint8)
+        if color.ndim == 2 and color.shape[1] == 3:
+            color = np.hstack((color, np.full((len(color), 1), 255, dtype=np.uint8)))
+        palette, color_index = np.unique(color.reshape(-1, 4), axis=0, return_inverse=True)
+        margin = 4 * float(radius.max()) if len(radius) else 0.0
+        self.header = _Header(len(radius), width, height, margin, len(palette), keyframe_interval)
+        self.frames = 0
+        self.prev = None
+        self.prev2 = None
+
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION, len(radius), width, height, margin,
+                                    len(palette), keyframe_interval))
+        self.file.write(radius.tobytes())
+        self.file.write(palette.astype(np.uint8).tobytes())
+        index_dtype = np.dtype(self.header.index_dtype).newbyteorder("<")
+        self.file.write(color_index.reshape(-1).astype(index_dtype).tobytes())
+
+    def _open_append(self, keep_frames):
+        with open(self.path, "rb") as f:
+            self.header = _read_header(f)[0]
+        data = _map(self.path)
+        records, end = _scan_records(data, self.header.data_offset, keep_frames)
+        if keep_frames is not None and len(records) < keep_frames:
+            raise ValueError(f"{self.path} tem {len(records)} frames, o checkpoint espera {keep_frames}")
+
+        # Reconstrói o estado do preditor a partir do último quadro-chave
+        decoder = _Decoder(self.header.num_balls, self.header.keyframe_interval)
+        if records:
+            last = len(records) - 1
+            for k in range(last - last % self.header.keyframe_interval, last + 1):
+                start, size = records[k]
+                decoder.decode(k, data[start:start + size])
+        del data
+        self.frames = len(records)
+        self.prev = decoder.prev
+        self.prev2 = decoder.prev2
+
+        self.file = open(self.path, "r+b")
+        self.file.truncate(end)
+        self.file.seek(end)
+
+    def quantize(self, x, y):
+        header = self.header
+        margin = header.margin
+        q = np.empty(2 * header.num_balls, dtype=np.uint16)
+        q[0::2] = np.clip(np.rint((np.asarray(x) + margin) * (LEVELS / (header.width + 2 * margin))), 0, LEVELS)
+        q[1::2] = np.clip(np.rint((np.asarray(y) + margin) * (LEVELS / (header.height + 2 * margin))), 0, LEVELS)
+        return q
+
+    def write_frame(self, x, y, vx=None, vy=None):
+        # vx/vy aceitos só para manter a interface do RecordingWriter
+        current = self.quantize(x, y)
+        if self.frames % self.header.keyframe_interval == 0:
+            prev, prev2 = None, None
+        else:
+            prev, prev2 = self.prev, self.prev2
+        predicted = _predict(prev, prev2)
+        values = current if predicted is None else _zigzag(current - predicted)
+        blob = _pack(values)
+        self.file.write(RECORD.pack(len(blob)))
+        self.file.write(blob)
+        self.prev2 = prev
+        self.prev = current
+        self.frames += 1
+
+    def flush(self):
+        self.file.flush()
+
+    def sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class CompactRecording:
+    # Lê os blobs comprimidos do memory map e decodifica sob demanda
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            header, self.radius, palette, color_index = _read_header(f)
+        self._data = _map(path)
+        self.header = header
+        self.num_balls = header.num_balls
+        self.width = header.width
+        self.height = header.height
+        self.color = palette[color_index]
+        self._records = _scan_records(self._data, header.data_offset)[0]
+        self._decoder = _Decoder(header.num_balls, header.keyframe_interval)
+        # Frames já decodificados dos últimos trechos (um trecho vai de um
+        # quadro-chave ao seguinte), do mais antigo para o mais recente:
+        # tocar para trás, arrastar dentro do trecho ou ir e voltar por cima
+        # de um quadro-chave não decodifica de novo. Só um seek para fora
+        # desses trechos decodifica, até keyframe_interval frames
+        self._segments = {}
+        margin = header.margin
+        self._scale = np.array([(header.width + 2 * margin) / LEVELS, (header.height + 2 * margin) / LEVELS])
+        self._origin = np.array([-margin, -margin])
+        # Posições do último frame pedido, reaproveitadas entre chamadas
+        self._points = np.empty((header.num_balls, 2))
+        self._points_frame = -1
+
+    def __len__(self):
+        return len(self._records)
+
+    def nbytes(self):
+        return len(self._data)
+
+    def position_error(self):
+        return position_error(self.width, self.height, self.header.margin)
+
+    def _quantized(self, k):
+        decoder = self._decoder
+        keyframe = k - k % self.header.keyframe_interval
+        segments = self._segments
+        segment = segments.pop(keyframe, {})
+        segments[keyframe] = segment
+        if len(segments) > CACHED_SEGMENTS:
+            del segments[next(iter(segments))]
+        cached = segment.get(k)
+        if cached is not None:
+            return cached
+        # Continua do frame decodificado se ele estiver no mesmo trecho,
+        # senão volta ao quadro-chave (custo de seek <= keyframe_interval)
+        start = decoder.frame + 1 if keyframe <= decoder.frame < k else keyframe
+        for t in range(start, k + 1):
+            offset, size = self._records[t]
+            segment[t] = decoder.decode(t, self._data[offset:offset + size])
+        return decoder.prev
+
+    def positions(self, k):
+        # Array (n, 2) com x, y do frame k. É sempre o mesmo array, válido
+        # até a próxima chamada: redesenhar o mesmo frame (pausado) não
+        # decodifica nem aloca nada
+        if k != self._points_frame:
+            np.multiply(self._quantized(k).reshape(-1, 2), self._scale, out=self._points)
+            self._points += self._origin
+            self._points_frame = k
+        return self._points
@@ -0,0 +1,106 @@
+import argparse
+import json
+import sys
+
+import numpy as np
+
+from backends import BACKENDS
+from scenarios import SCENARIOS, initial_states, make_engine
+
+# Confere se um backend otimizado ainda calcula a mesma física: roda o
+# backend de referência e o candidato lado a lado, a partir do mesmo estado
+# inicial do cenário (initial_states) com a mesma semente, e compara as
+# posições a cada frame.
+#
+#   python equivalence.py --scenario bolinha --candidate spatial --broad-phase sweep
+#   python equivalence.py --scenario without_gravity --candidate-mode jacobi --tolerance 1e-6
+#   python equivalence.py --scenario bolinha --n 4000 --candidate process
+#
+# Relata o primeiro frame em que o erro de posição passa da tolerância e o
+# maior erro visto; sai com código 1 quando há divergência.
+
+
+def position_error(a, b):
+    # Maior distância entre as posições da mesma bola nos dois mundos
+    if len(a.world) == 0:
+        return 0.0
+    return float(np.max(np.hypot(a.world.x - b.world.x, a.world.y - b.world.y)))
+
+
+def compare(reference, candidate, frames, tolerance=0.0, observer=None):
+    # Avança os dois motores juntos; observer(frame, error) a cada frame
+    first_divergence = None
+    max_error = 0.0
+    error = 0.0
+    for frame in range(1, frames + 1):
+        reference.step_once()
+        candidate.step_once()
+        error = position_error(reference, candidate)
+        if error > tolerance and first_divergence is None:
+            first_divergence = frame
+        max_error = max(max_error, error)
+        if observer is not None:
+            observer(frame, error)
+    return {
+        "frames": frames,
+        "tolerance": tolerance,
+        "first_divergence": first_divergence,
+        "max_error": max_error,
+        "final_error": error,
+    }
+
+
+def run(scenario, n, frames, seed=0, reference="python", candidate="spatial",
+        reference_mode="sequential", candidate_mode="sequential", broad_phase="grid",
+        tolerance=0.0):
+    states = initial_states(scenario, n, seed)
+    options = {"broad_phase": broad_phase} if candidate in ("spatial", "process") else {}
+    ref = make_engine(scenario, states, backend=reference, collision_mode=reference_mode)
+    try:
+        cand = make_engine(scenario, states, backend=candidate, collision_mode=candidate_mode, **options)
+        try:
+            result = compare(ref, cand, frames, tolerance)
+        finally:
+            # O backend process guarda memória compartilhada e workers
+            cand.close()
+    finally:
+        ref.close()
+    result.update({
+        "scenario": scenario, "n": n, "seed": seed,
+        "reference": reference, "reference_mode": reference_mode,
+        "candidate": candidate, "candidate_mode": candidate_mode, "broad_phase": broad_phase,
+    })
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara um backend candidato com o de referência")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="bolinha")
+    parser.add_argument("--n", type=int, default=300)
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--reference", choices=sorted(BACKENDS), default="python")
+    parser.add_argument("--candidate", choices=sorted(BACKENDS), default="spatial")
+    parser.add_argument("--reference-mode", choices=["jacobi", "sequential"], default="sequential")
+    parser.add_argument("--candidate-mode", choices=["jacobi", "sequential"], default="sequential")
+    parser.add_argument("--broad-phase", choices=["grid", "sweep", "tree"], default="grid")
+    parser.add_argument("--tolerance", type=float, default=0.0)
+    parser.add_argument("--json", help="arquivo JSON de saída")
+    args = parser.parse_args()
+
+    result = run(args.scenario, args.n, args.frames, args.seed, args.reference, args.candidate,
+                 args.reference_mode, args.candidate_mode, args.broad_phase, args.tolerance)
+    if result["first_divergence"] is None:
+        print(f"{args.scenario}: idênticos por {args.frames} frames "
+              f"(erro máximo {result['max_error']:.3g} px)")
+    else:
+        print(f"{args.scenario}: diverge no frame {result['first_divergence']}; "
+              f"erro máximo {result['max_error']:.3g} px, final {result['final_error']:.3g} px")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+    sys.exit(0 if result["first_divergence"] is None else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+import numpy as np
+
+# Física em passo fixo, desacoplada do desenho.
+# O tempo real de cada frame entra num acumulador e sai em passos de física
+# de tamanho fixo (1 / rate segundos): zero, um ou vários por frame. Num
+# frame lento a física alcança o tempo perdido até max_steps passos; o que
+# passar disso é descartado, para a cena não travar tentando alcançar.
+# O resto do acumulador (alpha, entre 0 e 1) diz quanto do próximo passo já
+# passou, e o desenho interpola entre os dois últimos estados com ele.
+
+
+class FixedTimestep:
+    def __init__(self, rate=60.0, max_steps=5):
+        self.step = 1.0 / rate
+        self.max_steps = max_steps
+        self.accumulator = 0.0
+        self.dropped = 0.0   # tempo descartado pelo limite de passos
+
+    def advance(self, delta_time):
+        # Número de passos de física a rodar neste frame
+        self.accumulator += delta_time
+        steps = int(self.accumulator // self.step)
+        if steps > self.max_steps:
+            excess = (steps - self.max_steps) * self.step
+            self.dropped += excess
+            self.accumulator -= excess
+            steps = self.max_steps
+        self.accumulator -= steps * self.step
+        return steps
+
+    @property
+    def alpha(self):
+        return min(1.0, self.accumulator / self.step)
+
+
+def interpolate(previous, current, alpha):
+    # Bolas que surgiram depois do último passo não têm estado anterior e
+    # são desenhadas na posição atual
+    n = min(len(previous), len(current))
+    result = np.array(current, dtype=np.float64)
+    result[:n] = previous[:n] + (result[:n] - previous[:n]) * alpha
+    return result
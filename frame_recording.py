@@ -0,0 +1,147 @@
+import os
+import struct
+import numpy as np
+
+# Gravação dos frames em arquivo binário, lido de volta por memory map.
+#
+# Layout (little-endian):
+#   cabeçalho   MAGIC, versão, número de bolas, largura, altura
+#   estáticos   radius float32[n], color uint8[n, 4]  (gravados uma vez)
+#   frames      float32[n, 4] por frame: x, y, vx, vy
+#
+# O número de frames vem do tamanho do arquivo, então um frame gravado pela
+# metade (queda no meio da escrita) é simplesmente ignorado na leitura.
+
+MAGIC = b"BOLAREC1"
+VERSION = 1
+HEADER = struct.Struct("<8sIIdd")
+FIELDS = 4  # x, y, vx, vy
+FRAME_DTYPE = np.dtype("<f4")
+
+
+def _layout(num_balls):
+    static_bytes = num_balls * 4 + num_balls * 4
+    data_offset = HEADER.size + static_bytes
+    # Alinha o início dos frames em 16 bytes
+    data_offset += -data_offset % 16
+    frame_bytes = num_balls * FIELDS * FRAME_DTYPE.itemsize
+    return data_offset, frame_bytes
+
+
+def _rgba(color):
+    color = np.asarray(color, dtype=np.uint8)
+    if color.shape[1] == 3:
+        alpha = np.full((len(color), 1), 255, dtype=np.uint8)
+        color = np.hstack((color, alpha))
+    return color
+
+
+class RecordingWriter:
+    def __init__(self, path, radius, color, width, height, append=False, keep_frames=None):
+        self.path = path
+        radius = np.asarray(radius, dtype="<f4")
+        self.num_balls = len(radius)
+        self.data_offset, self.frame_bytes = _layout(self.num_balls)
+        self._buffer = np.empty((self.num_balls, FIELDS), dtype=FRAME_DTYPE)
+
+        if append:
+            # Continua uma gravação existente, descartando frame incompleto
+            # (ou tudo depois de keep_frames, ao retomar de um checkpoint)
+            self.file = open(path, "r+b")
+            self.file.seek(0, 2)
+            frames = (self.file.tell() - self.data_offset) // self.frame_bytes
+            if keep_frames is not None:
+                if keep_frames > frames:
+                    raise ValueError(f"{path} tem {frames} frames, o checkpoint espera {keep_frames}")
+                frames = keep_frames
+            self.file.truncate(self.data_offset + frames * self.frame_bytes)
+            self.file.seek(0, 2)
+            return
+
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION, self.num_balls, width, height))
+        self.file.write(radius.tobytes())
+        self.file.write(_rgba(color).tobytes())
+        self.file.write(b"\0" * (self.data_offset - self.file.tell()))
+
+    def write_frame(self, x, y, vx, vy):
+        buffer = self._buffer
+        buffer[:, 0] = x
+        buffer[:, 1] = y
+        buffer[:, 2] = vx
+        buffer[:, 3] = vy
+        self.file.write(buffer.tobytes())
+
+    def flush(self):
+        self.file.flush()
+
+    def sync(self):
+        # Garante que os frames escritos estão no disco
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Recording:
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            magic, version, num_balls, width, height = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path} não é uma gravação de frames válida")
+            self.radius = np.frombuffer(f.read(num_balls * 4), dtype="<f4")
+            self.color = np.frombuffer(f.read(num_balls * 4), dtype=np.uint8).reshape(num_balls, 4)
+        self.num_balls = num_balls
+        self.width = width
+        self.height = height
+        self.data_offset, self.frame_bytes = _layout(num_balls)
+
+        num_frames = 0
+        if self.frame_bytes:
+            num_frames = (os.path.getsize(path) - self.data_offset) // self.frame_bytes
+        if num_frames > 0:
+            self.frames = np.memmap(path, dtype=FRAME_DTYPE, mode="r", offset=self.data_offset,
+                                    shape=(num_frames, num_balls, FIELDS))
+        else:
+            self.frames = np.empty((0, num_balls, FIELDS), dtype=FRAME_DTYPE)
+
+    def __len__(self):
+        return len(self.frames)
+
+    def frame(self, k):
+        # Visão (sem cópia) do frame k: colunas x, y, vx, vy
+        return self.frames[k]
+
+    def positions(self, k):
+        # Visão (sem cópia) das colunas x, y do frame k
+        return self.frames[k, :, :2]
+
+
+def _is_compact(path):
+    from compact_recording import MAGIC as COMPACT_MAGIC
+    with open(path, "rb") as f:
+        return f.read(len(COMPACT_MAGIC)) == COMPACT_MAGIC
+
+
+def open_recording(path):
+    # Abre o formato bruto ou o compacto, conforme o cabeçalho do arquivo
+    if _is_compact(path):
+        from compact_recording import CompactRecording
+        return CompactRecording(path)
+    return Recording(path)
+
+
+def writer_class_for(path):
+    # Classe de escrita compatível com uma gravação existente (para append)
+    if _is_compact(path):
+        from compact_recording import CompactRecordingWriter
+        return CompactRecordingWriter
+    return RecordingWriter
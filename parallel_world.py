@@ -0,0 +1,327 @@
+import os
+import threading
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+
+from ball_world import BallWorld, collide_sequential_arrays
+from collision import _contacts, resolve_contacts_arrays
+from spatial_hash import grid_pairs, cell_size_for
+
+# Passo com processos: um StripSolver guarda o estado em memória
+# compartilhada, onde os seus workers fazem o passo inteiro (integração,
+# pares e resolução), sem cópia por frame. ProcessWorld tem a interface do
+# BallWorld em cima desse estado; o backend "process" (backends.py) põe
+# nele os arrays de um BallWorld.
+#
+# StripSolver divide a tela em `strips` faixas verticais de mesma largura.
+# Cada bola pertence à faixa em que está seu x depois da integração; cada
+# faixa lê as suas bolas e um halo das vizinhas (as bolas a menos de uma
+# célula da grade da borda), acha os pares na grade e resolve:
+#   - pares com as duas bolas da faixa, no modo pedido (sequential/jacobi);
+#   - pares entre faixas (uma bola do halo), em Jacobi a partir do estado
+#     integrado: as duas faixas calculam o mesmo impulso e cada uma aplica
+#     só a metade da sua bola, então nenhuma bola é escrita por dois workers.
+# O resultado depende do número de faixas, não do de workers: cada worker
+# pega um bloco contíguo de faixas. Com uma faixa só é o passo serial.
+#
+# Os workers são persistentes e andam juntos por barreiras: o principal
+# escreve o comando no bloco de controle e libera a barreira de início; os
+# workers integram cada um um pedaço das bolas, resolvem as faixas lendo o
+# estado integrado (as escritas esperam todos terminarem de ler) e
+# escrevem de volta as suas bolas; a barreira de fim devolve o controle.
+
+X, Y, VX, VY, R = range(5)
+
+# Bloco de controle do StripSolver (float64), escrito pelo principal antes
+# de liberar os workers; depois de CONTROL vêm os contatos de cada worker
+COMMAND, COUNT, MODE, ITERATIONS, SUBSTEPS, CELL = range(6)
+CONTROL = 6
+STEP, STOP = 1, 2
+MODES = ("sequential", "jacobi")
+
+STRIPS = 8   # faixas padrão do StripSolver
+
+
+def solve_strips(state, n, first, last, strips, width, cell, mode="jacobi", iterations=1):
+    # Resolve as faixas [first, last) a partir do estado integrado, sem
+    # escrever nele. Devolve, por faixa, (bolas da faixa, x, y, vx, vy
+    # novos) e o número de contatos (um par entre faixas conta na faixa
+    # da bola de menor índice)
+    x = state[X, :n]
+    size = width / strips
+    owner = np.clip(np.floor(x / size), 0, strips - 1)
+    results = []
+    contacts = 0
+    for strip in range(first, last):
+        low = strip * size - cell if strip > 0 else -np.inf
+        high = (strip + 1) * size + cell if strip < strips - 1 else np.inf
+        ids = np.flatnonzero((x >= low) & (x < high))
+        own = owner[ids] == strip
+        if not own.any():
+            continue
+        lx, ly, lvx, lvy, lr = state[:, ids]
+        pairs_i, pairs_j = grid_pairs(lx, ly, cell)
+        own_i = own[pairs_i]
+        own_j = own[pairs_j]
+
+        # Pares entre faixas: impulso e separação do estado integrado
+        m = len(ids)
+        cross = own_i != own_j
+        ci, cj, nx, ny, overlap = _contacts(lx, ly, lr, pairs_i[cross], pairs_j[cross])
+        dvn = (lvx[cj] * nx + lvy[cj] * ny) - (lvx[ci] * nx + lvy[ci] * ny)
+        push = overlap / 2
+        dvx = np.bincount(ci, dvn * nx, m) - np.bincount(cj, dvn * nx, m)
+        dvy = np.bincount(ci, dvn * ny, m) - np.bincount(cj, dvn * ny, m)
+        dx = np.bincount(cj, push * nx, m) - np.bincount(ci, push * nx, m)
+        dy = np.bincount(cj, push * ny, m) - np.bincount(ci, push * ny, m)
+        contacts += int(np.count_nonzero(own[ci]))
+
+        inside = own_i & own_j
+        if mode == "sequential":
+            contacts += collide_sequential_arrays(lx, ly, lvx, lvy, lr, pairs_i[inside], pairs_j[inside])
+        else:
+            contacts += resolve_contacts_arrays(lx, ly, lvx, lvy, lr, pairs_i[inside], pairs_j[inside],
+                                                iterations)
+        lx += dx
+        ly += dy
+        lvx += dvx
+        lvy += dvy
+        results.append((ids[own], lx[own], ly[own], lvx[own], lvy[own]))
+    return results, contacts
+
+
+def _strip_step(state, n, rules, rank, num_workers, strips, cell, mode, iterations, substeps, wait):
+    # Passo do worker `rank`: wait() sincroniza com os outros workers
+    low, high = rank * n // num_workers, (rank + 1) * n // num_workers
+    first, last = rank * strips // num_workers, (rank + 1) * strips // num_workers
+    dt = 1.0 / substeps
+    contacts = 0
+    for substep in range(substeps):
+        if substep:
+            wait()
+        rules.integrate_arrays(state[X, low:high], state[Y, low:high], state[VX, low:high],
+                               state[VY, low:high], state[R, low:high], dt)
+        wait()
+        results, count = solve_strips(state, n, first, last, strips, rules.width, cell, mode, iterations)
+        contacts += count
+        wait()
+        for ids, x, y, vx, vy in results:
+            state[X, ids] = x
+            state[Y, ids] = y
+            state[VX, ids] = vx
+            state[VY, ids] = vy
+    return contacts
+
+
+def _strip_worker(rank, num_workers, state_name, control_name, capacity, rules, strips, start, phase):
+    state_shm = shared_memory.SharedMemory(name=state_name)
+    control_shm = shared_memory.SharedMemory(name=control_name)
+    state = np.ndarray((5, capacity), dtype=np.float64, buffer=state_shm.buf)
+    control = np.ndarray(CONTROL + num_workers, dtype=np.float64, buffer=control_shm.buf)
+    try:
+        while True:
+            start.wait()
+            if control[COMMAND] == STOP:
+                break
+            control[CONTROL + rank] = _strip_step(
+                state, int(control[COUNT]), rules, rank, num_workers, strips, control[CELL],
+                MODES[int(control[MODE])], int(control[ITERATIONS]), int(control[SUBSTEPS]), phase.wait)
+            start.wait()
+    except BaseException:
+        # Sem isso os outros workers e o principal esperariam para sempre
+        phase.abort()
+        start.abort()
+        raise
+    finally:
+        del state, control
+        state_shm.close()
+        control_shm.close()
+
+
+class StripSolver:
+    # Estado (x, y, vx, vy, raio) de até `capacity` bolas em memória
+    # compartilhada e o passo por faixas em num_workers processos
+    # persistentes; abaixo de min_balls bolas o passo roda no próprio
+    # processo, com o mesmo resultado
+    def __init__(self, rules, capacity, num_workers=None, strips=STRIPS, min_balls=2000):
+        self.rules = rules
+        self.capacity = capacity
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.strips = strips
+        self.min_balls = min_balls
+        # Os blocos são criados antes dos workers, que assim herdam o mesmo
+        # resource_tracker do processo principal
+        self._state = _Shared(5, np.float64)
+        self.state = self._state.ensure(capacity)
+        self._control = shared_memory.SharedMemory(create=True, size=8 * (CONTROL + self.num_workers))
+        self.control = np.ndarray(CONTROL + self.num_workers, dtype=np.float64, buffer=self._control.buf)
+        self._start_barrier = None
+        self._phase_barrier = None
+        self._workers = []
+
+    def _start(self):
+        self._start_barrier = mp.Barrier(self.num_workers + 1)
+        self._phase_barrier = mp.Barrier(self.num_workers)
+        for rank in range(self.num_workers):
+            worker = mp.Process(target=_strip_worker, daemon=True, args=(
+                rank, self.num_workers, self._state.name, self._control.name, self._state.capacity,
+                self.rules, self.strips, self._start_barrier, self._phase_barrier))
+            worker.start()
+            self._workers.append(worker)
+
+    def _release(self):
+        # Libera os workers e espera a próxima barreira de início/fim
+        try:
+            self._start_barrier.wait()
+        except threading.BrokenBarrierError:
+            raise RuntimeError("um worker do StripSolver falhou") from None
+
+    def step(self, n, mode="jacobi", iterations=1, substeps=1):
+        # Avança as n primeiras bolas em `substeps` subpassos e devolve o
+        # número de contatos resolvidos
+        if mode not in MODES:
+            raise ValueError(f"Modo de colisão desconhecido: {mode}")
+        if n == 0:
+            return 0
+        cell = cell_size_for(self.state[R, :n])
+        if self.num_workers == 1 or n < self.min_balls:
+            return _strip_step(self.state, n, self.rules, 0, 1, self.strips, cell, mode, iterations,
+                               substeps, lambda: None)
+
+        if not self._workers:
+            self._start()
+        control = self.control
+        control[:CONTROL] = STEP, n, MODES.index(mode), iterations, substeps, cell
+        self._release()
+        self._release()
+        return int(control[CONTROL:].sum())
+
+    def close(self):
+        if self._workers:
+            self.control[COMMAND] = STOP
+            try:
+                self._start_barrier.wait()
+            except threading.BrokenBarrierError:
+                pass
+            for worker in self._workers:
+                worker.join()
+            self._workers = []
+        self.state = None
+        self._state.close()
+        if self._control is not None:
+            self.control = None
+            self._control.close()
+            self._control.unlink()
+            self._control = None
+
+
+class ProcessWorld:
+    # Mesma interface de leitura/escrita do BallWorld (x, y, vx, vy, radius,
+    # color, add, clear), com o estado na memória compartilhada do
+    # StripSolver: x, y, vx, vy e radius são visões dela
+    def __init__(self, rules, capacity, num_workers=None, iterations=1, strips=STRIPS, min_balls=2000):
+        self.rules = rules
+        self.width = rules.width
+        self.height = rules.height
+        self.capacity = capacity
+        self.iterations = iterations
+        self._solver = StripSolver(rules, capacity, num_workers, strips, min_balls)
+        self._state = self._solver.state
+        self._color = np.zeros((capacity, 4), dtype=np.uint8)
+        self._count = 0
+        self.num_workers = self._solver.num_workers
+
+    @property
+    def count(self):
+        return self._count
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def x(self):
+        return self._state[X, :self._count]
+
+    @property
+    def y(self):
+        return self._state[Y, :self._count]
+
+    @property
+    def vx(self):
+        return self._state[VX, :self._count]
+
+    @property
+    def vy(self):
+        return self._state[VY, :self._count]
+
+    @property
+    def radius(self):
+        return self._state[R, :self._count]
+
+    @property
+    def color(self):
+        return self._color[:self._count]
+
+    def add(self, x, y, vx, vy, radius, color):
+        i = self._count
+        if i == self.capacity:
+            raise ValueError("ProcessWorld cheio: aumente a capacidade")
+        self._state[:, i] = x, y, vx, vy, radius
+        self._color[i] = tuple(color)[:4] if len(color) >= 4 else tuple(color) + (255,)
+        self._count = i + 1
+        return i
+
+    def clear(self):
+        self._count = 0
+
+    def step(self, substeps=1):
+        # Integra, acha os pares e resolve em lote (Jacobi) nas faixas, em
+        # `substeps` subpassos de 1/substeps de frame
+        return self._solver.step(self._count, "jacobi", self.iterations, substeps)
+
+    def close(self):
+        self._state = None
+        self._solver.close()
+
+
+def make_rules(width, height, **rules):
+    # Um BallWorld vazio serve só como portador das regras de integração
+    return BallWorld(width, height, capacity=1, **rules)
+
+
+class _Shared:
+    # Array em memória compartilhada que cresce trocando de bloco (os
+    # workers precisam abrir o bloco novo pelo nome)
+    def __init__(self, rows, dtype):
+        self.rows = rows
+        self.dtype = dtype
+        self.capacity = 0
+        self.shm = None
+        self.array = None
+
+    def ensure(self, capacity):
+        if capacity <= self.capacity:
+            return self.array
+        self.close()
+        self.capacity = max(capacity, 2 * self.capacity, 1024)
+        size = self.rows * self.capacity * np.dtype(self.dtype).itemsize
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        self.array = np.ndarray((self.rows, self.capacity), dtype=self.dtype, buffer=self.shm.buf)
+        return self.array
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def close(self):
+        if self.shm is None:
+            return
+        self.array = None
+        try:
+            self.shm.close()
+        except BufferError:
+            # Alguém ainda tem uma visão do bloco: o mapeamento some com ela
+            pass
+        self.shm.unlink()
+        self.shm = None
@@ -0,0 +1,118 @@
+import numpy as np
+
+# Divisão do domínio em tantas partes quantas forem as threads, adaptada à
+# densidade das bolas: bisseção recursiva (estilo k-d) que corta a região
+# pelo lado mais comprido na posição que separa as bolas na proporção das
+# partes de cada lado. Com as bolas aglomeradas, as partes encolhem em volta
+# do aglomerado e cada thread fica com mais ou menos o mesmo número de bolas,
+# ao contrário da grade fixa de quadrantes.
+#
+# Cada thread resolve só os pares com as duas bolas na sua parte. Os pares
+# que cruzam um corte ficam para um passe de fronteira separado, feito
+# depois, com as bolas a menos de um diâmetro de algum corte: assim todo par
+# tem exatamente um dono e nenhum contato entre partes é perdido. As partes
+# são as de antes do movimento; uma bola que saiu da sua parte pode encostar
+# em vizinhas mais longe do corte, então o alcance cresce o quanto a bola
+# mais afastada saiu da sua parte.
+
+
+def _coords(balls):
+    n = len(balls)
+    x = np.fromiter((ball.x for ball in balls), dtype=np.float64, count=n)
+    y = np.fromiter((ball.y for ball in balls), dtype=np.float64, count=n)
+    return x, y
+
+
+class BisectionPartitioner:
+    def __init__(self, width, height, parts, every=1):
+        self.width = width
+        self.height = height
+        self.parts = parts
+        self.every = every   # refaz os cortes a cada `every` frames
+        self.frame = 0
+        self.tree = None
+        self.rects = []
+
+    def split(self, x, y):
+        # Parte (0..parts-1) de cada bola
+        if self.tree is None or self.frame % self.every == 0:
+            self.rects = [None] * self.parts
+            idx = np.arange(len(x))
+            rect = (0.0, float(self.width), 0.0, float(self.height))
+            self.tree = self._build(x, y, idx, rect, 0, self.parts)
+        self.frame += 1
+        return self.locate(x, y)
+
+    def _build(self, x, y, idx, rect, first, parts):
+        # Nó folha: número da parte; nó interno: (eixo, corte, esquerda, direita)
+        if parts == 1:
+            self.rects[first] = rect
+            return first
+        left, right, bottom, top = rect
+        axis = 0 if right - left >= top - bottom else 1
+        values = (x if axis == 0 else y)[idx]
+        low, high = (left, right) if axis == 0 else (bottom, top)
+        left_parts = parts // 2
+
+        k = int(round(len(values) * left_parts / parts))
+        if 0 < k < len(values):
+            ordered = np.partition(values, (k - 1, k))
+            cut = 0.5 * (ordered[k - 1] + ordered[k])
+        else:
+            cut = low + (high - low) * left_parts / parts
+        cut = min(max(cut, low), high)
+
+        below = values < cut
+        if axis == 0:
+            rect_a, rect_b = (left, cut, bottom, top), (cut, right, bottom, top)
+        else:
+            rect_a, rect_b = (left, right, bottom, cut), (left, right, cut, top)
+        node_a = self._build(x, y, idx[below], rect_a, first, left_parts)
+        node_b = self._build(x, y, idx[~below], rect_b, first + left_parts, parts - left_parts)
+        return axis, cut, node_a, node_b
+
+    def locate(self, x, y):
+        labels = np.empty(len(x), dtype=np.int64)
+        self._locate(self.tree, x, y, np.arange(len(x)), labels)
+        return labels
+
+    def _locate(self, node, x, y, idx, labels):
+        if not isinstance(node, tuple):
+            labels[idx] = node
+            return
+        axis, cut, node_a, node_b = node
+        below = (x if axis == 0 else y)[idx] < cut
+        self._locate(node_a, x, y, idx[below], labels)
+        self._locate(node_b, x, y, idx[~below], labels)
+
+    def near_boundary(self, x, y, labels, reach):
+        # Bolas a menos de `reach` de um corte da própria parte (as bordas da
+        # tela não contam). Uma bola que saiu da sua parte durante o passo
+        # também entra, porque a distância fica negativa; a vizinha dela na
+        # outra parte pode estar até `reach` mais essa saída do corte.
+        rects = np.array(self.rects, dtype=np.float64).reshape(-1, 4)[labels]
+        left, right, bottom, top = rects.T
+        if len(x):
+            out_x = np.maximum(np.maximum(left - x, x - right), 0)
+            out_y = np.maximum(np.maximum(bottom - y, y - top), 0)
+            reach = reach + float(np.hypot(out_x, out_y).max())
+        return (((x - left < reach) & (left > 0))
+                | ((right - x < reach) & (right < self.width))
+                | ((y - bottom < reach) & (bottom > 0))
+                | ((top - y < reach) & (top < self.height)))
+
+    def split_balls(self, balls):
+        # split() para listas de objetos com .x e .y
+        groups = [[] for _ in range(self.parts)]
+        x, y = _coords(balls)
+        for ball, part in zip(balls, self.split(x, y).tolist()):
+            groups[part].append(ball)
+        return groups
+
+    def border_balls(self, groups, reach):
+        # Bolas de cada grupo perto de um corte, com a parte de origem
+        balls = [ball for group in groups for ball in group]
+        labels = np.repeat(np.arange(len(groups)), [len(group) for group in groups])
+        x, y = _coords(balls)
+        near = np.flatnonzero(self.near_boundary(x, y, labels, reach))
+        return [balls[k] for k in near.tolist()], labels[near].tolist()
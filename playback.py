@@ -0,0 +1,73 @@
+# Cursor de reprodução de uma gravação, separado do desenho: a posição é
+# fracionária (em frames), então velocidades como 0.5x repetem frames e 4x
+# pulam frames; velocidade negativa toca para trás. Nas pontas a reprodução
+# volta (vai-e-volta, como o Jogo original) ou para, com bounce=False.
+# Ir para qualquer frame só muda o número do frame; quem desenha pede à
+# gravação as posições desse frame. Na gravação bruta isso é uma visão do
+# memory map, O(1); na compacta um seek para longe decodifica até
+# keyframe_interval frames; tocando para frente ela decodifica só os frames
+# andados, e para trás um trecho inteiro a cada quadro-chave cruzado (ver
+# CompactRecording).
+
+MIN_SPEED = 1 / 16
+MAX_SPEED = 64.0
+
+
+class Playback:
+    def __init__(self, num_frames, speed=1.0, bounce=True):
+        self.num_frames = num_frames
+        self.position = 0.0
+        self.speed = speed
+        self.paused = False
+        self.bounce = bounce
+
+    @property
+    def last(self):
+        return max(0, self.num_frames - 1)
+
+    @property
+    def frame(self):
+        return int(self.position)
+
+    def seek(self, frame):
+        self.position = float(min(max(frame, 0), self.last))
+
+    def seek_fraction(self, fraction):
+        # fraction em [0, 1] ao longo da gravação (ex.: posição do mouse)
+        self.seek(round(fraction * self.last))
+
+    def step(self, frames=1):
+        # Avança (ou volta, com frames negativo) quadro a quadro, pausado
+        self.paused = True
+        self.seek(self.frame + frames)
+
+    def scale_speed(self, factor):
+        # Multiplica a velocidade mantendo o sentido
+        magnitude = min(max(abs(self.speed) * factor, MIN_SPEED), MAX_SPEED)
+        self.speed = magnitude if self.speed >= 0 else -magnitude
+
+    def reverse(self):
+        self.speed = -self.speed
+
+    def toggle_pause(self):
+        self.paused = not self.paused
+
+    def advance(self, frames=1.0):
+        # Anda speed * frames frames (um por on_update, no Jogo)
+        if self.paused or self.last == 0:
+            return self.frame
+        position = self.position + self.speed * frames
+        last = self.last
+        if self.bounce:
+            while position > last or position < 0:
+                position = 2 * last - position if position > last else -position
+                self.speed = -self.speed
+        elif position > last or position < 0:
+            position = min(max(position, 0), last)
+            self.paused = True
+        self.position = position
+        return self.frame
+
+    def status(self):
+        paused = " (pausado)" if self.paused else ""
+        return f"frame {self.frame}/{self.last}  velocidade {self.speed:g}x{paused}"
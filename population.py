@@ -0,0 +1,57 @@
+import threading
+
+# Contagem de bolas por cor mantida incrementalmente: cada nascimento ou
+# morte atualiza o contador em O(1), então o limite MAX_BALLS_PER_COLOR, o
+# placar e a checagem de "só uma cor restante" não varrem mais a lista.
+
+
+class ColorPopulation:
+    def __init__(self):
+        self._counts = {}
+        self._alive = set()   # cores com pelo menos uma bola
+        self._lock = threading.Lock()
+
+    def count(self, color):
+        return self._counts.get(color, 0)
+
+    def counts(self):
+        return dict(self._counts)
+
+    def total(self):
+        return sum(self._counts.values())
+
+    def spawned(self, color):
+        with self._lock:
+            self._add(color, 1)
+
+    def killed(self, color):
+        with self._lock:
+            self._add(color, -1)
+
+    def try_spawn(self, color, limit):
+        # Checa o limite e reserva a vaga atomicamente
+        with self._lock:
+            if self._counts.get(color, 0) >= limit:
+                return False
+            self._add(color, 1)
+            return True
+
+    def _add(self, color, delta):
+        count = self._counts.get(color, 0) + delta
+        self._counts[color] = count
+        if count > 0:
+            self._alive.add(color)
+        else:
+            self._alive.discard(color)
+
+    def single_color(self):
+        # A cor sobrevivente quando só resta uma, senão None
+        alive = self._alive
+        if len(alive) == 1:
+            return next(iter(alive))
+        return None
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+            self._alive.clear()
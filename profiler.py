@@ -0,0 +1,138 @@
+import contextlib
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# Perfil por fase do frame, com custo praticamente zero desligado: phase(),
+# span() e worker() devolvem um contexto vazio (ou a própria função) e
+# count() retorna na hora.
+#
+# Ligado, cada fase vira um evento "X" do formato trace_event do Chrome
+# (aberto no Perfetto ou em chrome://tracing), na thread em que rodou; as
+# tarefas do executor aparecem como spans nas threads dos workers. As fases
+# também somam o tempo do frame para o overlay, e os contadores (pares
+# testados x contatos reais) viram eventos "C" a cada frame.
+
+_NULL = contextlib.nullcontext()
+
+
+def candidate_pairs(n, parts=None):
+    # Pares testados pelo laço duplo de n bolas; com parts, só os pares
+    # entre partes diferentes (passe de fronteira)
+    total = n * (n - 1) // 2
+    if parts is None:
+        return total
+    sizes = {}
+    for part in parts:
+        sizes[part] = sizes.get(part, 0) + 1
+    return total - sum(k * (k - 1) // 2 for k in sizes.values())
+
+
+class Profiler:
+    def __init__(self, enabled=False, history=120, max_events=500000):
+        self.enabled = enabled
+        self.frame = 0
+        self.frames = deque(maxlen=history)      # (ms por fase, contadores) dos últimos frames
+        self.events = deque(maxlen=max_events)   # eventos do trace
+        self._phases = {}
+        self._counters = {}
+        self._threads = {}
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self._pid = os.getpid()
+
+    def phase(self, name):
+        # Fase do frame: entra no trace e no tempo por fase do overlay
+        if not self.enabled:
+            return _NULL
+        return self._span(name, True)
+
+    def span(self, name):
+        # Só no trace (ex.: trechos dentro dos workers)
+        if not self.enabled:
+            return _NULL
+        return self._span(name, False)
+
+    def worker(self, name, fn):
+        # fn embrulhada para executor.submit: um span na thread do worker
+        if not self.enabled:
+            return fn
+
+        def run(*args, **kwargs):
+            with self._span(name, False):
+                return fn(*args, **kwargs)
+        return run
+
+    def count(self, name, value):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    @contextlib.contextmanager
+    def _span(self, name, is_phase):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            thread = threading.current_thread()
+            event = {
+                "name": name, "ph": "X", "pid": self._pid, "tid": thread.ident,
+                "ts": (start - self._origin) * 1e6, "dur": (end - start) * 1e6,
+                "args": {"frame": self.frame},
+            }
+            with self._lock:
+                self.events.append(event)
+                self._threads[thread.ident] = thread.name
+                if is_phase:
+                    self._phases[name] = self._phases.get(name, 0.0) + (end - start) * 1000
+
+    def end_frame(self):
+        if not self.enabled:
+            return
+        with self._lock:
+            if self._counters:
+                self.events.append({
+                    "name": "pares", "ph": "C", "pid": self._pid,
+                    "ts": (time.perf_counter() - self._origin) * 1e6,
+                    "args": dict(self._counters),
+                })
+            self.frames.append((self._phases, self._counters))
+            self._phases = {}
+            self._counters = {}
+            self.frame += 1
+
+    def averages(self):
+        # Média por frame (ms por fase e contadores) no histórico
+        phases = {}
+        counters = {}
+        for frame_phases, frame_counters in self.frames:
+            for name, ms in frame_phases.items():
+                phases[name] = phases.get(name, 0.0) + ms
+            for name, value in frame_counters.items():
+                counters[name] = counters.get(name, 0) + value
+        n = max(1, len(self.frames))
+        return ({name: ms / n for name, ms in phases.items()},
+                {name: value / n for name, value in counters.items()})
+
+    def overlay_lines(self):
+        phases, counters = self.averages()
+        lines = [f"{name}: {ms:.2f} ms" for name, ms in phases.items()]
+        tested = counters.get("pairs_tested")
+        if tested:
+            contacts = counters.get("contacts", 0)
+            lines.append(f"pares testados: {tested:.0f}  contatos: {contacts:.0f} "
+                         f"({100 * contacts / tested:.2f}%)")
+        return lines
+
+    def write_chrome_trace(self, path):
+        with self._lock:
+            events = list(self.events)
+            threads = dict(self._threads)
+        names = [{"name": "thread_name", "ph": "M", "pid": self._pid, "tid": tid, "args": {"name": name}}
+                 for tid, name in threads.items()]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": names + events, "displayTimeUnit": "ms"}, f)
@@ -0,0 +1,167 @@
+import numpy as np
+
+from spatial_hash import NEIGHBOR_OFFSETS, _cross_pairs
+
+# Broad-phase por quadtree "loose" para bolas de tamanhos bem diferentes.
+# O nível L divide a tela em células de lado size / 2^L e cada bola fica no
+# nível mais fundo em que cabe com folga: seu alcance (raio + margem) não
+# passa de meia célula, então a bola nunca sai da célula "frouxa" (a célula
+# esticada meia célula para cada lado). Bolas grandes ficam em células
+# grandes e bolas pequenas em células pequenas, sem o pior caso da grade
+# uniforme dimensionada pela maior bola.
+#
+# Duas bolas que se tocam estão em células vizinhas (3x3) do mesmo nível, ou
+# então a célula da bola maior é vizinha do ancestral da célula da menor no
+# nível da maior.
+#
+# A árvore é guardada linearizada: cada bola tem a chave (nível, cx, cy) do
+# seu nó e a ordem das bolas por chave é mantida entre frames. refit()
+# recalcula os nós e só reordena o que mudou (sort estável do NumPy,
+# adaptativo, sobre a ordem do frame anterior), e os nós ocupados saem da
+# sequência ordenada; a busca de vizinhos é por busca binária nas chaves.
+
+MAX_DEPTH = 16
+STRIDE = 2 ** MAX_DEPTH + 4
+
+
+def _key(level, cx, cy):
+    return (level * STRIDE + (cx + 1)) * STRIDE + (cy + 1)
+
+
+class LooseQuadtree:
+    def __init__(self, width, height, margin=None):
+        self.size = float(max(width, height))
+        self.margin = margin   # None: a margem de cada bola é o próprio raio
+        self.order = np.empty(0, dtype=np.int64)
+        self.keys = np.empty(0, dtype=np.int64)
+        self.x = self.y = self.reach = np.empty(0)
+        self.moved = 0         # bolas que trocaram de nó no último refit
+
+    def _reach(self, radius):
+        if self.margin is None:
+            return 2 * radius
+        return radius + 0.5 * self.margin
+
+    def refit(self, x, y, radius):
+        # Cópias: query() e pairs() usam as posições do último refit
+        x = np.array(x, dtype=np.float64)
+        y = np.array(y, dtype=np.float64)
+        n = len(x)
+        reach = self._reach(np.broadcast_to(np.asarray(radius, dtype=np.float64), x.shape))
+
+        # Nível mais fundo em que 2 * alcance <= lado da célula
+        depth = np.floor(np.log2(self.size / np.maximum(2 * reach, 1e-12)))
+        level = np.clip(depth, 0, MAX_DEPTH).astype(np.int64)
+        cell = self.size / np.exp2(level)
+        limit = np.left_shift(1, level)
+        cx = np.clip(np.floor(x / cell), -1, limit).astype(np.int64)
+        cy = np.clip(np.floor(y / cell), -1, limit).astype(np.int64)
+        keys = _key(level, cx, cy)
+
+        order = self.order
+        old = len(order)
+        if old > n:
+            order = np.arange(n, dtype=np.int64)
+            self.moved = n
+        else:
+            self.moved = int(np.count_nonzero(keys[:old] != self.keys[:old])) + n - old
+            if old < n:
+                order = np.concatenate((order, np.arange(old, n, dtype=np.int64)))
+        ordered = keys[order]
+        if n > 1 and np.any(ordered[1:] < ordered[:-1]):
+            order = order[np.argsort(ordered, kind="stable")]
+
+        self.order = order
+        self.keys = keys
+        self.level, self.cx, self.cy = level, cx, cy
+        self.x, self.y, self.reach = x, y, reach
+
+    def _nodes(self):
+        sorted_keys = self.keys[self.order]
+        nodes, starts, counts = np.unique(sorted_keys, return_index=True, return_counts=True)
+        return sorted_keys, nodes, starts, counts
+
+    def _lookup(self, nodes, starts, counts, target):
+        found = np.minimum(np.searchsorted(nodes, target), len(nodes) - 1)
+        exists = nodes[found] == target
+        return np.where(exists, starts[found], 0), np.where(exists, counts[found], 0)
+
+    def pairs(self):
+        # Retorna (i, j) com i < j em ordem lexicográfica, como grid_pairs
+        n = len(self.order)
+        if n < 2:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+        sorted_keys, nodes, starts, counts = self._nodes()
+        node_of = np.repeat(np.arange(len(nodes)), counts)
+        position = np.arange(n, dtype=np.int64)
+        level = self.level[self.order]
+        cx = self.cx[self.order]
+        cy = self.cy[self.order]
+
+        parts_i = []
+        parts_j = []
+        # Mesmo nó
+        remaining = counts[node_of] - (position - starts[node_of]) - 1
+        a, b = _cross_pairs(position, position + 1, remaining)
+        parts_i.append(a)
+        parts_j.append(b)
+        # Nós vizinhos do mesmo nível (meia vizinhança, cada par uma vez)
+        for dx, dy in NEIGHBOR_OFFSETS:
+            start, count = self._lookup(nodes, starts, counts, sorted_keys + dx * STRIDE + dy)
+            a, b = _cross_pairs(position, start, count)
+            parts_i.append(a)
+            parts_j.append(b)
+        # Níveis mais grossos: vizinhança 3x3 do ancestral
+        occupied = np.unique(level)
+        for coarse in occupied.tolist():
+            finer = np.flatnonzero(level > coarse)
+            if len(finer) == 0:
+                continue
+            shift = level[finer] - coarse
+            ax = np.right_shift(cx[finer], shift)
+            ay = np.right_shift(cy[finer], shift)
+            for dx in (-1, 0, 1):
+                for dy in (-1, 0, 1):
+                    target = _key(coarse, ax + dx, ay + dy)
+                    start, count = self._lookup(nodes, starts, counts, target)
+                    a, b = _cross_pairs(finer, start, count)
+                    parts_i.append(a)
+                    parts_j.append(b)
+
+        i = self.order[np.concatenate(parts_i)]
+        j = self.order[np.concatenate(parts_j)]
+        limit = self.reach[i] + self.reach[j]
+        near = (np.abs(self.x[i] - self.x[j]) <= limit) & (np.abs(self.y[i] - self.y[j]) <= limit)
+        i = i[near]
+        j = j[near]
+        low = np.minimum(i, j)
+        high = np.maximum(i, j)
+        lexical = np.lexsort((high, low))
+        return low[lexical], high[lexical]
+
+    def query(self, x, y, radius):
+        # Índices das bolas que tocam o círculo (x, y, radius), em ordem
+        if len(self.order) == 0:
+            return np.empty(0, dtype=np.int64)
+        sorted_keys = self.keys[self.order]
+        found = []
+        for level in np.unique(self.level).tolist():
+            cell = self.size / 2 ** level
+            # A bola pode estar até meia célula fora da própria célula
+            reach = radius + 0.5 * cell
+            y0 = int(np.floor((y - reach) / cell))
+            y1 = int(np.floor((y + reach) / cell))
+            # Numa coluna cx as chaves de y0..y1 são contíguas
+            for cx in range(int(np.floor((x - reach) / cell)), int(np.floor((x + reach) / cell)) + 1):
+                start = np.searchsorted(sorted_keys, _key(level, cx, y0), side="left")
+                end = np.searchsorted(sorted_keys, _key(level, cx, y1), side="right")
+                found.append(self.order[start:end])
+        found = np.sort(np.concatenate(found))
+        # Raio verdadeiro da bola: o alcance inclui a margem
+        if self.margin is None:
+            radii = self.reach[found] / 2
+        else:
+            radii = self.reach[found] - 0.5 * self.margin
+        hit = np.hypot(self.x[found] - x, self.y[found] - y) < radius + radii
+        return found[hit]
@@ -0,0 +1,250 @@
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from checkpoint import record_run
+from compact_recording import CompactRecordingWriter
+from frame_recording import RecordingWriter
+from scenarios import SCENARIOS, initial_states, make_engine
+from simulation_engine import ENGINE_VERSION
+from sleeping import SleepTracker
+
+# Cache de execuções pré-processadas, endereçado pelo conteúdo: a chave é o
+# hash da configuração completa da execução (cenário e regras, número de
+# bolas, frames, semente, backend, modo de colisão, sono, formato) mais a
+# versão do motor, então um pedido idêntico reaproveita a gravação pronta e
+# qualquer mudança de parâmetro ou de física gera outra chave.
+#
+# Cada entrada é <chave>.rec (a gravação) e <chave>.json (a configuração).
+# O mtime da gravação marca o último uso; ao passar de max_bytes as entradas
+# usadas há mais tempo saem primeiro (LRU).
+#
+#   python run_cache.py sweep --scenario bolinha_gravity --n 20 200 --seed 0 1 2 \
+#       --gravity 0.3 0.5 --sleep 0 30 --workers 4
+#   python run_cache.py list
+#
+# O sweep distribui a grade de combinações num pool de processos e pula as
+# que já estão no cache.
+
+CACHE_DIR = "cache_execucoes"
+MAX_BYTES = 2 * 1024 ** 3
+
+
+def run_config(scenario, n, frames, seed, backend="spatial", collision_mode="sequential",
+               rules=None, sleep=None, compact=True, backend_options=None):
+    # Configuração normalizada: as regras já vêm mescladas com as do cenário,
+    # para que {} e {"gravity": 0.3} (o padrão) deem a mesma chave
+    if scenario not in SCENARIOS:
+        raise ValueError(f"Cenário desconhecido: {scenario}")
+    if seed is None:
+        raise ValueError("Execução sem semente não é reproduzível e não entra no cache")
+    return {
+        "scenario": scenario,
+        "rules": {**SCENARIOS[scenario]["rules"], **(rules or {})},
+        "n": n,
+        "frames": frames,
+        "seed": seed,
+        "backend": backend,
+        "backend_options": dict(backend_options or {}),
+        "collision_mode": collision_mode,
+        "sleep": list(sleep) if sleep else None,
+        "compact": compact,
+        "engine_version": ENGINE_VERSION,
+    }
+
+
+def cache_key(config):
+    text = json.dumps(config, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def simulate(config, path, progress=None):
+    # Grava a execução descrita por config em path, do mesmo jeito que os
+    # scripts de pré-processamento
+    states = initial_states(config["scenario"], config["n"], config["seed"])
+    sleep = SleepTracker(*config["sleep"]) if config["sleep"] else None
+    engine = make_engine(config["scenario"], states, backend=config["backend"],
+                         collision_mode=config["collision_mode"], sleep=sleep, rules=config["rules"],
+                         **config["backend_options"])
+    writer_class = CompactRecordingWriter if config["compact"] else RecordingWriter
+    checkpoint = path + ".ckpt"
+    try:
+        record_run(engine, path, config["frames"], checkpoint, max(1, config["frames"]),
+                   progress=progress, writer_class=writer_class)
+    finally:
+        engine.close()
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+    return path
+
+
+class RunCache:
+    def __init__(self, root=CACHE_DIR, max_bytes=MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, config):
+        return os.path.join(self.root, cache_key(config) + ".rec")
+
+    def lookup(self, config):
+        # Caminho da gravação guardada (marcada como usada agora) ou None
+        path = self.path(config)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def __contains__(self, config):
+        return os.path.exists(self.path(config))
+
+    def temp_path(self, config):
+        # Onde gravar uma execução nova antes de store(..., move=True)
+        return f"{self.path(config)}.{os.getpid()}.tmp"
+
+    def store(self, config, source, move=False):
+        # Copia (ou move) a gravação para o cache; a troca por os.replace
+        # nunca deixa uma entrada pela metade visível
+        path = self.path(config)
+        if move:
+            os.replace(source, path)
+        else:
+            temp = self.temp_path(config)
+            shutil.copyfile(source, temp)
+            os.replace(temp, path)
+        with open(path[:-len(".rec")] + ".json", "w") as f:
+            json.dump(config, f, indent=2, sort_keys=True)
+        self.evict(keep=path)
+        return path
+
+    def entries(self):
+        # (caminho, tamanho, último uso), do uso mais antigo para o mais novo
+        result = []
+        for name in os.listdir(self.root):
+            if not name.endswith(".rec"):
+                continue
+            path = os.path.join(self.root, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            result.append((path, stat.st_size, stat.st_mtime))
+        result.sort(key=lambda entry: entry[2])
+        return result
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self, keep=None):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        removed = []
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            for name in (path, path[:-len(".rec")] + ".json"):
+                try:
+                    os.remove(name)
+                except FileNotFoundError:
+                    pass
+            total -= size
+            removed.append(path)
+        return removed
+
+    def config_of(self, path):
+        try:
+            with open(path[:-len(".rec")] + ".json") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+
+def sweep(cache, configs, workers=None, progress=None):
+    # Simula em paralelo as configurações que faltam no cache; devolve
+    # (quantas já estavam, quantas foram simuladas)
+    pending = [config for config in configs if config not in cache]
+    cached = len(configs) - len(pending)
+    if not pending:
+        return cached, 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(simulate, config, cache.temp_path(config)): config
+                   for config in pending}
+        for done, future in enumerate(as_completed(futures), 1):
+            config = futures[future]
+            cache.store(config, future.result(), move=True)
+            if progress is not None:
+                progress(done, len(pending), config)
+    return cached, len(pending)
+
+
+def grid(scenario, ns, frames, seeds, gravities=None, backend="spatial",
+         collision_mode="sequential", sleep=None, compact=True, backend_options=None):
+    # Produto cartesiano dos parâmetros do sweep
+    configs = []
+    for n, frame_count, seed, gravity in itertools.product(ns, frames, seeds, gravities or [None]):
+        rules = {"gravity": gravity} if gravity is not None else None
+        configs.append(run_config(scenario, n, frame_count, seed, backend, collision_mode,
+                                  rules, sleep, compact, backend_options))
+    return configs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cache de execuções pré-processadas")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--max-bytes", type=int, default=MAX_BYTES,
+                        help="tamanho máximo do cache (as entradas menos usadas saem primeiro)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    sweep_parser = commands.add_parser("sweep", help="simula uma grade de parâmetros em paralelo")
+    sweep_parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="bolinha")
+    sweep_parser.add_argument("--n", type=int, nargs="+", default=[20])
+    sweep_parser.add_argument("--frames", type=int, nargs="+", default=[30 * 5])
+    sweep_parser.add_argument("--seed", type=int, nargs="+", default=[0])
+    sweep_parser.add_argument("--gravity", type=float, nargs="+",
+                              help="valores de gravidade (padrão: a do cenário)")
+    sweep_parser.add_argument("--backend", default="spatial")
+    sweep_parser.add_argument("--backend-workers", type=int,
+                              help="processos do backend process em cada execução")
+    sweep_parser.add_argument("--collision-mode", choices=["jacobi", "sequential"], default="sequential")
+    sweep_parser.add_argument("--sleep", type=float, nargs=2, metavar=("LIMIAR", "FRAMES"),
+                              help="liga o sono das bolas, como DORMIR nos scripts (LIMIAR 0: mesmo resultado)")
+    sweep_parser.add_argument("--raw", action="store_true", help="grava sem o formato compacto")
+    sweep_parser.add_argument("--workers", type=int, help="processos do pool (padrão: um por núcleo)")
+
+    commands.add_parser("list", help="lista as entradas do cache, da menos usada para a mais usada")
+    args = parser.parse_args()
+
+    cache = RunCache(args.cache_dir, args.max_bytes)
+    if args.command == "list":
+        for path, size, used in cache.entries():
+            config = cache.config_of(path) or {}
+            print(f"{os.path.basename(path)[:12]}  {size / 1e6:8.2f} MB  "
+                  f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(used))}  "
+                  f"{config.get('scenario')} n={config.get('n')} frames={config.get('frames')} "
+                  f"seed={config.get('seed')} regras={config.get('rules')}")
+        print(f"total: {cache.size() / 1e6:.2f} MB de {cache.max_bytes / 1e6:.2f} MB")
+        return
+
+    sleep = (args.sleep[0], int(args.sleep[1])) if args.sleep else None
+    backend_options = {"workers": args.backend_workers} if args.backend_workers else None
+    configs = grid(args.scenario, args.n, args.frames, args.seed, args.gravity, args.backend,
+                   args.collision_mode, sleep, not args.raw, backend_options)
+
+    def progress(done, total, config):
+        print(f"[{done}/{total}] n={config['n']} frames={config['frames']} seed={config['seed']} "
+              f"regras={config['rules']}")
+
+    cached, simulated = sweep(cache, configs, args.workers, progress)
+    print(f"{len(configs)} combinações: {cached} já no cache, {simulated} simuladas")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import random
+
+from ball_world import BallWorld
+from backends import make_backend
+from seeding import seeded
+from simulation_engine import SimulationEngine
+
+# Regras de física de cada script como configuração do SimulationEngine:
+# tamanho da tela, parâmetros do BallWorld e se há colisão entre bolas.
+# O backend é escolhido à parte (make_engine(..., backend="python")), então
+# qualquer cenário roda em qualquer backend. "spawn" muda o sorteio do
+# estado inicial (initial_states) em relação a DEFAULT_SPAWN; "bounce": False
+# faz as colisões só separarem as bolas, sem trocar velocidades.
+
+DEFAULT_SPAWN = {"margin": 50, "y_min": 50, "speed_x": 3.0, "speed_y": 3.0, "radius": (2, 5)}
+
+SCENARIOS = {
+    # Bolinha.py e Bolinha-preprocessing.py: choques elásticos, sem perdas
+    "bolinha": {"width": 2000, "height": 900, "rules": {}},
+    # Bolinha-preprocessing-gravity.py
+    "bolinha_gravity": {
+        "width": 2000, "height": 900,
+        "rules": {"gravity": 0.3, "ceiling_bounce": 0.8, "floor_bounce": 0.8, "floor_stop": 0.5},
+        "spawn": {"y_min": 200, "speed_y": 1.0},
+    },
+    # Test_Max_Objects_With_Colision.py
+    "with_colision": {
+        "width": 800, "height": 600,
+        "rules": {"gravity": 0.5, "wall_bounce": 0.6, "floor_bounce": 0.4, "ceiling_bounce": 0.4,
+                  "floor_stop": 0.1, "stop_speed": 0.05},
+    },
+    # Test_Max_Objects_Without_Colision.py
+    "without_colision": {
+        "width": 1600, "height": 900,
+        "rules": {"friction": 0.99, "stop_speed": 0.01},
+        "collide": False,
+    },
+    # Test_Max_Objects_Without_Gravity.py e Test_Max_Objects_With_Thread_Test.py
+    "without_gravity": {"width": 1600, "height": 900, "rules": {"friction": 0.99, "stop_speed": 0.01}},
+    # Guerra de Bolas.py: sem fricção, as colisões só empurram
+    "guerra": {
+        "width": 1600, "height": 900,
+        "rules": {"stop_speed": 0.01},
+        "bounce": False,
+    },
+    # Tests.py: a mesma guerra com fricção
+    "tests": {
+        "width": 1600, "height": 900,
+        "rules": {"friction": 0.99, "stop_speed": 0.01},
+        "bounce": False,
+    },
+}
+
+
+def make_world(scenario, capacity=256, rules=None):
+    # rules substitui regras do cenário (ex.: {"gravity": 0.5})
+    config = SCENARIOS[scenario]
+    merged = {**config["rules"], **(rules or {})}
+    return BallWorld(config["width"], config["height"], capacity=max(1, capacity), **merged)
+
+
+def initial_states(scenario, n, seed=None):
+    # Estado inicial como nos scripts de pré-processamento, no formato
+    # (x, y, vx, vy, radius, cor); a mesma semente dá sempre o mesmo estado
+    config = SCENARIOS[scenario]
+    spawn = {**DEFAULT_SPAWN, **config.get("spawn", {})}
+    margin = spawn["margin"]
+    states = []
+    with seeded(seed):
+        for _ in range(n):
+            x = random.randint(margin, config["width"] - margin)
+            y = random.randint(spawn["y_min"], config["height"] - margin)
+            vx = random.uniform(-spawn["speed_x"], spawn["speed_x"])
+            vy = random.uniform(-spawn["speed_y"], spawn["speed_y"])
+            radius = random.randint(*spawn["radius"])
+            cor = (random.randint(0, 255), random.randint(0, 255), random.randint(0, 255))
+            states.append((x, y, vx, vy, radius, cor))
+    return states
+
+
+def make_engine(scenario, states=(), backend="spatial", collision_mode="jacobi", iterations=1,
+                sleep=None, rules=None, capacity=0, **backend_options):
+    # states no formato antigo: (x, y, vx, vy, radius, cor); capacity reserva
+    # espaço para bolas acrescentadas depois (o process só copia o mundo
+    # para a memória compartilhada de novo quando ele cresce)
+    if scenario not in SCENARIOS:
+        raise ValueError(f"Cenário desconhecido: {scenario}")
+    world = make_world(scenario, max(len(states), capacity), rules)
+    for x, y, vx, vy, radius, cor in states:
+        world.add(x, y, vx, vy, radius, cor)
+    return SimulationEngine(world, collision_mode, iterations, sleep,
+                            backend=make_backend(backend, **backend_options),
+                            collide=SCENARIOS[scenario].get("collide", True),
+                            bounce=SCENARIOS[scenario].get("bounce", True))
@@ -0,0 +1,26 @@
+import contextlib
+import random
+
+import numpy as np
+
+# Execuções reproduzíveis: os scripts sorteiam tudo com o módulo global
+# random (e alguns com np.random). seeded(seed) semeia os dois geradores
+# durante o bloco e devolve o estado anterior na saída, para que duas
+# execuções com a mesma semente sorteiem exatamente os mesmos números.
+# Com seed None nada muda (sorteio diferente a cada execução).
+
+
+@contextlib.contextmanager
+def seeded(seed):
+    if seed is None:
+        yield
+        return
+    state = random.getstate()
+    numpy_state = np.random.get_state()
+    random.seed(seed)
+    np.random.seed(seed)
+    try:
+        yield
+    finally:
+        random.setstate(state)
+        np.random.set_state(numpy_state)
@@ -0,0 +1,122 @@
+import numpy as np
+
+from ball_world import BallWorld
+from backends import SpatialBackend
+
+# Motor de passos persistente: o estado fica no BallWorld entre os frames,
+# sem recriar objetos Bola nem tuplas a cada passo.
+# O cálculo do passo fica num backend (backends.py; padrão: spatial com a
+# grade) e as regras de cada script em scenarios.py.
+# Com um SleepTracker (sleep=...), as bolas paradas dormem e deixam de ser
+# integradas, de entrar na broad-phase e de ser resolvidas (com limiar 0, sem
+# mudar o resultado); com o mundo todo dormindo o passo não faz nada.
+# Com bounce=False as colisões só separam as bolas, sem trocar velocidades
+# (Guerra de Bolas.py e Tests.py), e on_contacts(world, i, j), se definido,
+# recebe os pares candidatos de cada passo antes da resolução: é onde as
+# regras de jogo veem os contatos.
+
+# Versão da física calculada pelo motor: mude quando um passo passar a dar
+# resultado diferente, para invalidar as execuções guardadas (run_cache.py).
+ENGINE_VERSION = 4
+
+
+class SimulationEngine:
+    def __init__(self, world, collision_mode="jacobi", iterations=1, sleep=None,
+                 backend=None, collide=True, bounce=True):
+        self.world = world
+        self.collision_mode = collision_mode
+        self.iterations = iterations
+        self.sleep = sleep
+        self.backend = backend if backend is not None else SpatialBackend()
+        self.collide = collide
+        self.bounce = bounce
+        self.on_contacts = None
+        self.frame = 0
+
+    @classmethod
+    def from_states(cls, states, width, height, collision_mode="jacobi", iterations=1, sleep=None,
+                    backend=None, **rules):
+        # states no formato antigo: (x, y, vx, vy, radius, cor)
+        world = BallWorld(width, height, capacity=max(1, len(states)), **rules)
+        for x, y, vx, vy, radius, cor in states:
+            world.add(x, y, vx, vy, radius, cor)
+        return cls(world, collision_mode, iterations, sleep, backend)
+
+    def step_once(self, substeps=1):
+        # substeps > 1 divide o frame em subpassos de 1/substeps (sem sono)
+        world = self.world
+        backend = self.backend
+        sleep = self.sleep
+        if sleep is None:
+            step = getattr(backend, "step", None)
+            if step is not None and self.collide and self.bounce and self.on_contacts is None:
+                # O backend faz o frame inteiro (process)
+                step(world, self.collision_mode, self.iterations, substeps)
+                self.frame += 1
+                return
+            dt = 1.0 / substeps
+            for _ in range(substeps):
+                backend.integrate(world, None, dt)
+                if self.collide:
+                    pairs_i, pairs_j = backend.pairs(world)
+                    self._resolve(pairs_i, pairs_j)
+            self.frame += 1
+            return
+
+        if substeps != 1:
+            raise ValueError("O sono não funciona com subpassos")
+        sleep.sync(world.count)
+        if sleep.all_asleep():
+            sleep.skipped += 1
+            self.frame += 1
+            return
+        sleep.begin(world)
+        backend.integrate(world, sleep.awake_indices())
+        if self.collide:
+            pairs_i, pairs_j = self._awake_pairs()
+            self._resolve(*sleep.active_pairs(pairs_i, pairs_j))
+        else:
+            pairs_i = pairs_j = np.empty(0, dtype=np.int64)
+        sleep.settle(world, pairs_i, pairs_j)
+        self.frame += 1
+
+    def _awake_pairs(self):
+        # Broad-phase sem as ilhas dormindo longe das acordadas; quando uma
+        # ilha acorda, refeita com ela (ver sleeping.py)
+        world = self.world
+        sleep = self.sleep
+        cell = self.backend.neighborhood(world)
+        while True:
+            idx = sleep.broad_phase_indices(world, cell)
+            pairs_i, pairs_j = self.backend.pairs(world, idx)
+            woken = sleep.wake_touched(pairs_i, pairs_j)
+            if idx is None or len(woken) == 0:
+                return pairs_i, pairs_j
+
+    def _resolve(self, pairs_i, pairs_j):
+        world = self.world
+        if self.on_contacts is not None:
+            self.on_contacts(world, pairs_i, pairs_j)
+        if self.bounce:
+            self.backend.resolve(world, pairs_i, pairs_j, self.collision_mode, self.iterations)
+            return
+        # A separação não depende das velocidades, então devolver as de antes
+        # da resolução deixa exatamente o empurrão
+        vx = world.vx.copy()
+        vy = world.vy.copy()
+        self.backend.resolve(world, pairs_i, pairs_j, self.collision_mode, self.iterations)
+        world.vx[:] = vx
+        world.vy[:] = vy
+
+    def step(self, n=1, observer=None):
+        # observer(engine) é chamado depois de cada frame
+        for _ in range(n):
+            self.step_once()
+            if observer is not None:
+                observer(self)
+
+    def close(self):
+        # Libera os recursos do backend (os workers do process)
+        close = getattr(self.backend, "close", None)
+        if close is not None:
+            close()
@@ -0,0 +1,165 @@
+import numpy as np
+
+# Corpos dormindo: uma bola cujo estado (x, y, vx, vy) não muda mais que
+# `threshold` por `frames` passos seguidos é candidata a dormir. As bolas
+# ligadas por pares da broad-phase formam uma ilha (union-find sobre os
+# pares) e a ilha só dorme quando todas as bolas dela são candidatas;
+# dormindo, ninguém da ilha é integrado nem resolvido, e a ilha fica no
+# estado em que dormiu. Nenhuma velocidade é alterada pelo sono.
+#
+# Uma ilha só tem pares entre as próprias bolas, então evolui isolada: com
+# threshold=0 o estado dela se repete exatamente a cada passo e pular a ilha
+# dá o mesmo resultado que simular. Quando a broad-phase liga uma dorminhoca
+# a qualquer bola de fora da ilha (outra bola chegou perto, ou alguém da
+# vizinhança se moveu), a ilha acorda no mesmo frame, antes da resolução.
+# Com threshold > 0 bolas quase paradas também dormem, e aí o resultado
+# pode mudar.
+#
+# As ilhas dormindo também ficam fora da broad-phase: só entram as bolas
+# acordadas e as dorminhocas nas células vizinhas das delas, numa grade em
+# que o backend só forma pares de bolas vizinhas (neighborhood). Todo par de
+# uma acordada com uma dorminhoca aparece; quando ele acorda uma ilha, a
+# broad-phase é refeita com ela, até nenhuma ilha acordar, e os pares entre
+# acordadas são os mesmos da broad-phase com todas as bolas. Num frame em
+# que entram bolas (a célula da grade pode mudar) entram todas.
+#
+# Com o mundo todo dormindo o passo inteiro é pulado: uma simulação que já
+# parou não custa quase nada por frame.
+
+
+def islands(n, pairs_i, pairs_j):
+    # Union-find vetorizado: cada par liga a raiz maior à menor e a
+    # compressão de caminho é por "pointer jumping", até todos os pares
+    # terem a mesma raiz. Devolve a raiz (menor índice) da ilha de cada bola.
+    parent = np.arange(n)
+    while True:
+        root_i = parent[pairs_i]
+        root_j = parent[pairs_j]
+        split = root_i != root_j
+        if not split.any():
+            return parent
+        low = np.minimum(root_i[split], root_j[split])
+        high = np.maximum(root_i[split], root_j[split])
+        np.minimum.at(parent, high, low)
+        while True:
+            jumped = parent[parent]
+            if np.array_equal(jumped, parent):
+                break
+            parent = jumped
+
+
+def _state(world):
+    return np.stack((world.x, world.y, world.vx, world.vy))
+
+
+def _write(world, state, mask):
+    world.x[mask], world.y[mask], world.vx[mask], world.vy[mask] = state[:, mask]
+
+
+class SleepTracker:
+    def __init__(self, threshold=0.0, frames=30):
+        self.threshold = threshold   # maior mudança de estado por passo de uma bola quieta
+        self.frames = frames         # passos quietos até poder dormir
+        self.quiet = np.zeros(0, dtype=np.int64)
+        self.island = np.zeros(0, dtype=np.int64)   # -1: acordada
+        self.rest = np.zeros((4, 0))     # estado em que a dorminhoca dormiu
+        self.moved = np.zeros((4, 0))    # esse estado depois de integrado
+        self.previous = np.zeros((4, 0))
+        self.skipped = 0             # passos pulados com o mundo todo dormindo
+        self.grown = False           # entraram bolas neste frame
+
+    @property
+    def asleep(self):
+        return self.island >= 0
+
+    def sync(self, count):
+        # Bolas novas nascem acordadas
+        old = len(self.island)
+        self.grown = count > old
+        if count > old:
+            self.quiet = np.concatenate((self.quiet, np.zeros(count - old, dtype=np.int64)))
+            self.island = np.concatenate((self.island, np.full(count - old, -1, dtype=np.int64)))
+            extra = np.zeros((4, count - old))
+            self.rest = np.concatenate((self.rest, extra), axis=1)
+            self.moved = np.concatenate((self.moved, extra), axis=1)
+        elif count < old:
+            self.quiet = self.quiet[:count]
+            self.island = self.island[:count]
+            self.rest = self.rest[:, :count]
+            self.moved = self.moved[:, :count]
+
+    def all_asleep(self):
+        return len(self.island) > 0 and bool(self.asleep.all())
+
+    def awake_indices(self):
+        return np.flatnonzero(self.island < 0)
+
+    def begin(self, world):
+        # Antes da integração: guarda o estado do frame e põe as dorminhocas
+        # no estado integrado, como se tivessem sido simuladas
+        self.previous = _state(world)
+        _write(world, self.moved, self.asleep)
+
+    def broad_phase_indices(self, world, cell):
+        # Bolas que entram na broad-phase (em ordem): as acordadas e as
+        # dorminhocas na mesma célula de lado `cell` de uma acordada ou numa
+        # vizinha. None: todas (ninguém dormindo, cell None ou bolas novas)
+        asleep = self.asleep
+        if cell is None or self.grown or not asleep.any():
+            return None
+        cx = np.floor(world.x / cell).astype(np.int64)
+        cy = np.floor(world.y / cell).astype(np.int64)
+        cx -= cx.min() - 1
+        cy -= cy.min() - 1
+        stride = int(cy.max()) + 2
+        keys = cx * stride + cy
+        offsets = np.array([dx * stride + dy for dx in (-1, 0, 1) for dy in (-1, 0, 1)])
+        near = (np.unique(keys[~asleep])[:, None] + offsets).ravel()
+        return np.flatnonzero(~asleep | np.isin(keys, near))
+
+    def wake_touched(self, pairs_i, pairs_j):
+        # Acorda as ilhas ligadas por algum par a uma bola de fora da ilha e
+        # devolve os índices das bolas acordadas agora
+        crossing = self.island[pairs_i] != self.island[pairs_j]
+        if not crossing.any():
+            return np.empty(0, dtype=np.int64)
+        ends = np.concatenate((self.island[pairs_i[crossing]], self.island[pairs_j[crossing]]))
+        woken = np.flatnonzero(np.isin(self.island, ends[ends >= 0]))
+        self.island[woken] = -1
+        self.quiet[woken] = 0
+        return woken
+
+    def active_pairs(self, pairs_i, pairs_j):
+        # Pares a resolver, na ordem dada: depois de wake_touched, os que não
+        # têm bola acordada são internos a uma ilha dormindo
+        keep = self.island[pairs_i] < 0
+        return pairs_i[keep], pairs_j[keep]
+
+    def settle(self, world, pairs_i, pairs_j):
+        # Depois da resolução: as dorminhocas voltam ao estado em que dormiram,
+        # conta os passos quietos e põe para dormir as ilhas acordadas em que
+        # todas as bolas estão quietas há `frames` passos
+        asleep = self.asleep
+        _write(world, self.rest, asleep)
+        awake = ~asleep
+        state = _state(world)
+        still = awake & (np.abs(state - self.previous).max(axis=0) <= self.threshold)
+        self.quiet[still] += 1
+        self.quiet[awake & ~still] = 0
+
+        ready = awake & (self.quiet >= self.frames)
+        if not ready.any():
+            return
+        root = islands(len(awake), pairs_i, pairs_j)
+
+        # Uma ilha com alguma bola ainda agitada continua acordada
+        restless = np.zeros(len(awake), dtype=bool)
+        restless[root[awake & ~ready]] = True
+        sleeping = ready & ~restless[root]
+        if not sleeping.any():
+            return
+        self.island[sleeping] = root[sleeping]
+        self.rest[:, sleeping] = state[:, sleeping]
+        x, y, vx, vy = state[:, sleeping]
+        world.integrate_arrays(x, y, vx, vy, world.radius[sleeping].copy())
+        self.moved[:, sleeping] = x, y, vx, vy
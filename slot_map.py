@@ -0,0 +1,86 @@
+# Armazenamento das bolas em "slot map": cada bola inserida recebe um
+# handle (slot, geração) estável, a remoção troca o último elemento para o
+# buraco (swap-remove) em O(1) e os slots liberados voltam para uma lista
+# livre. A iteração percorre um array denso, sem buracos.
+#
+# Um handle antigo (de uma bola já removida) não encontra mais nada: a
+# geração do slot é incrementada a cada remoção, então remover duas vezes
+# ou consultar uma bola morta é seguro e barato.
+#
+# Os objetos removidos ficam guardados para serem reaproveitados por
+# recycle(), evitando alocar uma bola nova a cada nascimento.
+
+
+class SlotMap:
+    def __init__(self):
+        self._items = []        # denso, na ordem de iteração
+        self._slots = []        # slot de cada posição densa
+        self._dense = []        # posição densa de cada slot (-1 se livre)
+        self._generations = []  # geração atual de cada slot
+        self._free = []         # slots livres
+        self._recycled = []     # objetos removidos, prontos para reuso
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __contains__(self, handle):
+        slot, generation = handle
+        return (slot < len(self._generations) and self._generations[slot] == generation
+                and self._dense[slot] >= 0)
+
+    def insert(self, item):
+        if self._free:
+            slot = self._free.pop()
+        else:
+            slot = len(self._dense)
+            self._dense.append(-1)
+            self._generations.append(0)
+        self._dense[slot] = len(self._items)
+        self._items.append(item)
+        self._slots.append(slot)
+        return slot, self._generations[slot]
+
+    def get(self, handle):
+        if handle not in self:
+            return None
+        return self._items[self._dense[handle[0]]]
+
+    def remove(self, handle):
+        # Devolve o objeto removido, ou None se o handle já não vale
+        if handle not in self:
+            return None
+        slot = handle[0]
+        index = self._dense[slot]
+        item = self._items[index]
+
+        # Move o último elemento para o buraco
+        last_item = self._items.pop()
+        last_slot = self._slots.pop()
+        if index < len(self._items):
+            self._items[index] = last_item
+            self._slots[index] = last_slot
+            self._dense[last_slot] = index
+
+        self._dense[slot] = -1
+        self._generations[slot] += 1
+        self._free.append(slot)
+        self._recycled.append(item)
+        return item
+
+    def recycle(self):
+        # Um objeto removido para reaproveitar, ou None
+        if self._recycled:
+            return self._recycled.pop()
+        return None
+
+    def clear(self):
+        for slot in self._slots:
+            self._dense[slot] = -1
+            self._generations[slot] += 1
+            self._free.append(slot)
+        self._recycled.extend(self._items)
+        self._items.clear()
+        self._slots.clear()
@@ -0,0 +1,86 @@
+import numpy as np
+
+# Broad-phase por grade uniforme (spatial hash / cell list).
+# As bolas são agrupadas por célula a cada frame e só pares na mesma célula
+# ou em células vizinhas viram candidatos para o teste de colisão exato.
+
+# Metade da vizinhança 3x3: cada par de células aparece uma única vez
+NEIGHBOR_OFFSETS = ((1, -1), (1, 0), (1, 1), (0, 1))
+
+
+def cell_size_for(radii, margin=None):
+    # Célula com o tamanho do maior diâmetro: duas bolas que se tocam
+    # estão sempre na mesma célula ou em células vizinhas.
+    # A margem cobre o quanto as bolas podem ser empurradas durante a
+    # resolução das colisões do mesmo frame (padrão: um raio máximo).
+    max_radius = float(np.max(radii)) if len(radii) else 1.0
+    if margin is None:
+        margin = max_radius
+    return 2 * max_radius + margin
+
+
+def _cross_pairs(cell_of_a, starts_b, counts_b):
+    # Para cada bola a (posição na ordem ordenada), gera pares com todas as
+    # bolas da célula b correspondente, sem laço em Python
+    total = int(counts_b.sum())
+    if total == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+    a = np.repeat(cell_of_a, counts_b)
+    group_start = np.cumsum(counts_b) - counts_b
+    offset = np.arange(total, dtype=np.int64) - np.repeat(group_start, counts_b)
+    b = np.repeat(starts_b, counts_b) + offset
+    return a, b
+
+
+def grid_pairs(x, y, cell_size):
+    # Retorna (i, j) com i < j, em ordem lexicográfica, igual à ordem do laço
+    # "for i ... for j in range(i + 1, n)" da força bruta
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if n < 2:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+
+    cx = np.floor(x / cell_size).astype(np.int64)
+    cy = np.floor(y / cell_size).astype(np.int64)
+    cx -= cx.min() - 1
+    cy -= cy.min() - 1
+    stride = int(cy.max()) + 2
+    keys = cx * stride + cy
+
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    cells, starts, counts = np.unique(sorted_keys, return_index=True, return_counts=True)
+    cell_index = np.repeat(np.arange(len(cells)), counts)
+    position = np.arange(n, dtype=np.int64)
+
+    parts_i = []
+    parts_j = []
+
+    # Pares dentro da mesma célula
+    rank = position - starts[cell_index]
+    remaining = counts[cell_index] - rank - 1
+    a, b = _cross_pairs(position, position + 1, remaining)
+    parts_i.append(a)
+    parts_j.append(b)
+
+    # Pares com as células vizinhas
+    for dx, dy in NEIGHBOR_OFFSETS:
+        target = cells + dx * stride + dy
+        found = np.searchsorted(cells, target)
+        found = np.minimum(found, len(cells) - 1)
+        exists = cells[found] == target
+        neighbor_start = np.where(exists, starts[found], 0)[cell_index]
+        neighbor_count = np.where(exists, counts[found], 0)[cell_index]
+        a, b = _cross_pairs(position, neighbor_start, neighbor_count)
+        parts_i.append(a)
+        parts_j.append(b)
+
+    i = order[np.concatenate(parts_i)]
+    j = order[np.concatenate(parts_j)]
+    low = np.minimum(i, j)
+    high = np.maximum(i, j)
+    lexical = np.lexsort((high, low))
+    return low[lexical], high[lexical]
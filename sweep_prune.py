@@ -0,0 +1,100 @@
+import numpy as np
+
+from spatial_hash import _cross_pairs
+
+# Broad-phase por sweep-and-prune com coerência temporal.
+# Os intervalos [x - r, x + r] das bolas ficam ordenados num eixo e a ordem
+# é guardada entre frames. Como as bolas andam poucos pixels por frame, a
+# ordem do frame anterior já está quase certa: a reordenação usa o sort
+# estável do NumPy (timsort, adaptativo), que numa sequência quase ordenada
+# custa perto de O(n), como um insertion sort, mas sem laço em Python.
+#
+# Uma varredura só num eixo compara cada bola com todas as da mesma faixa
+# vertical da tela, o que com milhares de bolas vira milhões de candidatos.
+# Por isso o outro eixo é dividido em faixas da altura de um diâmetro (mais
+# a margem) e a ordenação é por (faixa, início do intervalo): cada bola só
+# varre a própria faixa e a seguinte. Bolas trocam de faixa raramente, então
+# a ordem continua quase pronta de um frame para o outro.
+
+
+class SweepAndPrune:
+    def __init__(self, axis=0, band=None):
+        self.axis = axis
+        self.band = band      # altura das faixas; None: 2 * raio máximo + margem
+        self.order = np.empty(0, dtype=np.int64)
+        self.candidates = 0   # pares testados no último frame
+
+    def _update_order(self, keys):
+        n = len(keys)
+        order = self.order
+        if len(order) > n:
+            order = np.arange(n, dtype=np.int64)
+        elif len(order) < n:
+            # Bolas novas entram no fim; a reordenação as coloca no lugar
+            order = np.concatenate((order, np.arange(len(order), n, dtype=np.int64)))
+        ordered = keys[order]
+        if n > 1 and np.any(ordered[1:] < ordered[:-1]):
+            order = order[np.argsort(ordered, kind="stable")]
+        self.order = order
+        return order
+
+    def pairs(self, x, y, radius, margin=None, reach=None):
+        # Retorna (i, j) com i < j em ordem lexicográfica, como grid_pairs.
+        # A margem tem o mesmo papel que em cell_size_for (padrão: um raio
+        # máximo) e cobre o quanto as bolas andam ao resolver as colisões:
+        # como na grade, entra todo par a menos de 2 * raio máximo + margem
+        # nos dois eixos, o alcance que a resolução sequencial precisa para
+        # ver os contatos criados pelos empurrões do mesmo frame. reach fixa
+        # esse alcance (ex.: o do mundo inteiro, com só parte das bolas).
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        radius = np.broadcast_to(np.asarray(radius, dtype=np.float64), x.shape)
+        n = len(x)
+        if n < 2:
+            self.order = np.arange(n, dtype=np.int64)
+            self.candidates = 0
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+        max_radius = float(radius.max())
+        if margin is None:
+            margin = max_radius
+        if reach is None:
+            reach = 2 * max_radius + margin
+        band = self.band if self.band is not None else reach
+
+        main, other = (x, y) if self.axis == 0 else (y, x)
+        low = main - radius
+        origin = float(low.min())
+        span = float(main.max()) + reach - origin + 1.0
+        band_index = np.floor((other - float(other.min())) / band)
+        keys = band_index * span + (low - origin)
+        order = self._update_order(keys)
+        sorted_keys = keys[order]
+        # Tudo relativo a origin e montado como as chaves, para que os limites
+        # da busca caiam exatamente nas mesmas posições
+        sorted_band = band_index[order]
+        sorted_main = (main - origin)[order]
+        sorted_high = sorted_main + reach
+
+        # Mesma faixa: as seguintes cujo início cai antes do alcance da bola
+        position = np.arange(n, dtype=np.int64)
+        end = np.searchsorted(sorted_keys, sorted_band * span + sorted_high, side="right")
+        same_a, same_b = _cross_pairs(position, position + 1, np.maximum(end - position - 1, 0))
+
+        # Faixa seguinte: inícios a menos do alcance (mais um raio) da bola
+        next_band = (sorted_band + 1) * span
+        start = np.searchsorted(sorted_keys, next_band + np.maximum(sorted_main - reach - max_radius, 0.0),
+                                side="left")
+        end = np.searchsorted(sorted_keys, next_band + sorted_high, side="right")
+        next_a, next_b = _cross_pairs(position, start, np.maximum(end - start, 0))
+
+        i = order[np.concatenate((same_a, next_a))]
+        j = order[np.concatenate((same_b, next_b))]
+        self.candidates = len(i)
+        near = (np.abs(main[i] - main[j]) < reach) & (np.abs(other[i] - other[j]) < reach)
+        i = i[near]
+        j = j[near]
+        low_index = np.minimum(i, j)
+        high_index = np.maximum(i, j)
+        lexical = np.lexsort((high_index, low_index))
+        return low_index[lexical], high_index[lexical]
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from equivalence import run
+from spatial_hash import cell_size_for, grid_pairs
+from sweep_prune import SweepAndPrune
+
+# As broad-phases precisam ver todo par a menos de uma célula da grade nos
+# dois eixos: na resolução sequencial os empurrões de um frame criam
+# contatos que a força bruta resolve no mesmo frame
+
+
+def test_sweep_covers_the_grid_reach():
+    rng = np.random.default_rng(0)
+    x = rng.uniform(0, 800, 3000)
+    y = rng.uniform(0, 600, 3000)
+    radius = rng.uniform(2, 6, 3000)
+    reach = cell_size_for(radius)
+    i, j = SweepAndPrune().pairs(x, y, radius)
+    grid_i, grid_j = grid_pairs(x, y, reach)
+    close = (np.abs(x[grid_i] - x[grid_j]) < reach) & (np.abs(y[grid_i] - y[grid_j]) < reach)
+    found = set(zip(i.tolist(), j.tolist()))
+    missed = [pair for pair in zip(grid_i[close].tolist(), grid_j[close].tolist()) if pair not in found]
+    assert close.any() and not missed
+
+
+@pytest.mark.parametrize("broad_phase", ["grid", "sweep", "tree"])
+def test_sequential_matches_brute_force(broad_phase):
+    result = run("with_colision", 300, 150, reference="numpy", broad_phase=broad_phase)
+    assert result["first_divergence"] is None
+
+
+def test_python_matches_numpy_in_dense_piles():
+    # Com todos os pares a ordem sequencial é a mesma, então nem as pilhas
+    # densas (onde o spatial diverge) separam python e numpy
+    result = run("with_colision", 400, 100, reference="python", candidate="numpy")
+    assert result["first_divergence"] is None
@@ -0,0 +1,56 @@
+import numpy as np
+
+from compact_recording import CompactRecording, CompactRecordingWriter, RECORD
+
+
+def walk(frames, n):
+    rng = np.random.default_rng(0)
+    radius = rng.uniform(2, 8, n)
+    color = rng.integers(0, 256, (n, 3))
+    xs = np.cumsum(rng.normal(0, 1, (frames, n)), axis=0) + 500
+    ys = np.cumsum(rng.normal(0, 1, (frames, n)), axis=0) + 400
+    return radius, color, xs, ys
+
+
+def test_append_and_seek(tmp_path):
+    n, frames = 200, 150
+    radius, color, xs, ys = walk(frames, n)
+    path = tmp_path / "gravacao.bin"
+    with CompactRecordingWriter(path, radius, color, 1000, 800) as writer:
+        for k in range(70):
+            writer.write_frame(xs[k], ys[k])
+    # Registro escrito pela metade, como numa queda no meio da gravação
+    with open(path, "ab") as f:
+        f.write(RECORD.pack(100))
+    with CompactRecordingWriter(path, radius, color, 1000, 800, append=True) as writer:
+        assert writer.frames == 70
+        for k in range(70, frames):
+            writer.write_frame(xs[k], ys[k])
+
+    recording = CompactRecording(path)
+    assert len(recording) == frames
+    error_x, error_y = recording.position_error()
+    for k in [149, 0, 61, 60, 59, 100, *range(frames)]:
+        positions = recording.positions(k)
+        assert np.abs(positions[:, 0] - xs[k]).max() <= error_x + 1e-9
+        assert np.abs(positions[:, 1] - ys[k]).max() <= error_y + 1e-9
+
+
+def test_playing_across_a_keyframe_decodes_once(tmp_path):
+    radius, color, xs, ys = walk(150, 50)
+    path = tmp_path / "gravacao.bin"
+    with CompactRecordingWriter(path, radius, color, 1000, 800) as writer:
+        for k in range(150):
+            writer.write_frame(xs[k], ys[k])
+    recording = CompactRecording(path)
+    decoder = recording._decoder
+    decoded = []
+    decode = decoder.decode
+    decoder.decode = lambda k, blob: decoded.append(k) or decode(k, blob)
+
+    # Para frente e de volta por cima do quadro-chave 60, várias vezes
+    for k in [*range(50, 70), *range(70, 50, -1), *range(50, 70)]:
+        recording.positions(k)
+    assert sorted(decoded) == list(range(71))
+    # O mesmo frame de novo devolve o mesmo array, sem recalcular
+    assert recording.positions(69) is recording.positions(69)
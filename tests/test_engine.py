@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from scenarios import initial_states, make_engine, make_world
+
+
+@pytest.mark.parametrize("backend", ["python", "numpy", "spatial", "process"])
+def test_push_only_keeps_the_integrated_velocities(backend):
+    # Nas colisões que só empurram, as velocidades são as da integração
+    states = initial_states("tests", 400, seed=1)
+    engine = make_engine("tests", states, backend=backend, collision_mode="sequential")
+    alone = make_world("tests", len(states))
+    for state in states:
+        alone.add(*state)
+    seen = []
+    engine.on_contacts = lambda world, i, j: seen.append(len(i))
+    try:
+        for _ in range(20):
+            engine.step_once()
+            alone.integrate()
+            alone.x[:] = engine.world.x
+            alone.y[:] = engine.world.y
+            assert np.array_equal(engine.world.vx, alone.vx)
+            assert np.array_equal(engine.world.vy, alone.vy)
+    finally:
+        engine.close()
+    assert len(seen) == 20 and sum(seen) > 0
+
+
+def test_remove_keeps_the_order():
+    world = make_world("guerra", 4)
+    for k in range(6):
+        world.add(k, 10 * k, 0, 0, 1, (k, 0, 0))
+    keep = world.remove([1, 4])
+    assert keep.tolist() == [True, False, True, True, False, True]
+    assert world.x.tolist() == [0, 2, 3, 5]
+    assert world.color[:, 0].tolist() == [0, 2, 3, 5]
@@ -0,0 +1,131 @@
+import numpy as np
+import pytest
+
+from collision import resolve_contacts
+from parallel_world import ProcessWorld, make_rules
+from scenarios import initial_states, make_engine, make_world
+from spatial_hash import cell_size_for, grid_pairs
+
+# O backend process faz o passo em faixas: o resultado não pode depender do
+# número de workers, e com uma faixa só tem que ser o do serial (spatial)
+
+
+def same_state(a, b):
+    return all(np.array_equal(getattr(a.world, k), getattr(b.world, k)) for k in ("x", "y", "vx", "vy"))
+
+
+@pytest.mark.parametrize("workers", [1, 2, 4])
+@pytest.mark.parametrize("mode", ["sequential", "jacobi"])
+@pytest.mark.parametrize("scenario, n, frames", [("bolinha", 1500, 10), ("with_colision", 300, 60)])
+def test_process_backend_with_one_strip_matches_serial(workers, mode, scenario, n, frames):
+    states = initial_states(scenario, n, seed=0)
+    serial = make_engine(scenario, states, backend="spatial", collision_mode=mode)
+    process = make_engine(scenario, states, backend="process", collision_mode=mode,
+                          workers=workers, strips=1, min_balls=0)
+    try:
+        for _ in range(frames):
+            serial.step_once()
+            process.step_once()
+            assert same_state(serial, process)
+    finally:
+        process.close()
+    # Depois de fechar, o mundo tem arrays próprios com o mesmo estado
+    assert same_state(serial, process)
+
+
+@pytest.mark.parametrize("mode", ["sequential", "jacobi"])
+@pytest.mark.parametrize("scenario, n, frames", [("bolinha", 1500, 10), ("with_colision", 300, 60)])
+def test_process_backend_does_not_depend_on_workers(mode, scenario, n, frames):
+    states = initial_states(scenario, n, seed=0)
+    engines = [make_engine(scenario, states, backend="process", collision_mode=mode,
+                           workers=workers, min_balls=0) for workers in (1, 2, 4)]
+    try:
+        for _ in range(frames):
+            for engine in engines:
+                engine.step_once()
+            assert all(same_state(engines[0], engine) for engine in engines[1:])
+    finally:
+        for engine in engines:
+            engine.close()
+
+
+def test_contacts_are_counted_once():
+    # No Jacobi os contatos saem do estado integrado, então a soma das
+    # faixas tem que ser o número de pares encostados, sem contar duas vezes
+    # os pares entre faixas
+    states = initial_states("bolinha", 1500, seed=0)
+    serial = make_engine("bolinha", states)
+    serial.world.integrate()
+    world = serial.world
+    pairs_i, pairs_j = grid_pairs(world.x, world.y, cell_size_for(world.radius))
+    dist = np.hypot(world.x[pairs_j] - world.x[pairs_i], world.y[pairs_j] - world.y[pairs_i])
+    expected = int(np.count_nonzero(dist < world.radius[pairs_i] + world.radius[pairs_j]))
+    process = make_engine("bolinha", states, backend="process", workers=4, min_balls=0)
+    try:
+        assert process.backend.step(process.world) == expected > 0
+    finally:
+        process.close()
+
+
+def fill(worlds, n):
+    for x, y, vx, vy, radius, cor in initial_states("bolinha", n, seed=0):
+        for world in worlds:
+            world.add(x * 0.8, y, vx, vy, radius, cor)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_process_world_with_one_strip_is_the_serial_step(workers):
+    # ProcessWorld com uma faixa contra o mesmo passo feito num BallWorld:
+    # integra, grade e resolução em lote
+    rules = make_rules(1600, 900, friction=0.99, stop_speed=0.01)
+    serial = make_world("without_gravity", capacity=2000)
+    world = ProcessWorld(rules, capacity=2000, num_workers=workers, iterations=2, strips=1, min_balls=0)
+    try:
+        fill([serial, world], 2000)
+        for _ in range(10):
+            serial.integrate()
+            pairs_i, pairs_j = grid_pairs(serial.x, serial.y, cell_size_for(serial.radius))
+            resolve_contacts(serial, pairs_i, pairs_j, iterations=2)
+            world.step()
+            for k in ("x", "y", "vx", "vy"):
+                assert np.array_equal(getattr(serial, k), getattr(world, k))
+    finally:
+        world.close()
+
+
+def test_process_world_substeps():
+    # step(3) faz três subpassos de 1/3 de frame, como o laço de subpassos
+    # do Test_Max_Objects_With_Thread_Test.py
+    rules = make_rules(1600, 900, friction=0.99, stop_speed=0.01)
+    serial = make_world("without_gravity", capacity=2000)
+    world = ProcessWorld(rules, capacity=2000, num_workers=2, strips=1, min_balls=0)
+    try:
+        fill([serial, world], 2000)
+        for _ in range(5):
+            for _ in range(3):
+                serial.integrate(dt=1 / 3)
+                pairs_i, pairs_j = grid_pairs(serial.x, serial.y, cell_size_for(serial.radius))
+                resolve_contacts(serial, pairs_i, pairs_j)
+            world.step(3)
+            for k in ("x", "y", "vx", "vy"):
+                assert np.array_equal(getattr(serial, k), getattr(world, k))
+    finally:
+        world.close()
+
+
+def test_process_world_does_not_depend_on_workers():
+    # Com várias faixas o resultado só depende do número de faixas
+    rules = make_rules(1600, 900, friction=0.99, stop_speed=0.01)
+    worlds = [ProcessWorld(rules, capacity=2000, num_workers=workers, iterations=2, min_balls=0)
+              for workers in (1, 2, 4)]
+    try:
+        fill(worlds, 2000)
+        for _ in range(10):
+            contacts = [world.step() for world in worlds]
+            assert contacts[0] > 0 and len(set(contacts)) == 1
+            for world in worlds[1:]:
+                for k in ("x", "y", "vx", "vy"):
+                    assert np.array_equal(getattr(worlds[0], k), getattr(world, k))
+    finally:
+        for world in worlds:
+            world.close()
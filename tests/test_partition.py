@@ -0,0 +1,29 @@
+import numpy as np
+
+from partition import BisectionPartitioner
+from spatial_hash import grid_pairs
+
+
+def test_border_pass_sees_every_contact_between_parts():
+    # Bolas andando até 10 px por frame cruzam os cortes; todo contato entre
+    # partes diferentes tem que ter as duas bolas no passe de fronteira
+    rng = np.random.default_rng(0)
+    radius = 10.0
+    partitioner = BisectionPartitioner(1600, 900, 8)
+    missed = 0
+    crossing = 0
+    for _ in range(20):
+        x = rng.uniform(radius, 1600 - radius, 3000)
+        y = rng.uniform(radius, 900 - radius, 3000)
+        labels = partitioner.split(x, y)
+        x = np.clip(x + rng.uniform(-10, 10, len(x)), radius, 1600 - radius)
+        y = np.clip(y + rng.uniform(-10, 10, len(y)), radius, 900 - radius)
+        near = partitioner.near_boundary(x, y, labels, 2 * radius)
+        i, j = grid_pairs(x, y, 2 * radius)
+        touching = np.hypot(x[j] - x[i], y[j] - y[i]) < 2 * radius
+        i, j = i[touching], j[touching]
+        cross = labels[i] != labels[j]
+        crossing += int(cross.sum())
+        missed += int((~(near[i[cross]] & near[j[cross]])).sum())
+    assert crossing > 0
+    assert missed == 0
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from scenarios import initial_states, make_engine
+from sleeping import SleepTracker
+
+# Uma pilha com atrito para de vez: as bolas dormem e o resultado tem que
+# ser o mesmo de simular tudo
+PILHA = {"friction": 0.9, "stop_speed": 0.05}
+
+
+def same_state(a, b):
+    return all(np.array_equal(getattr(a.world, k), getattr(b.world, k)) for k in ("x", "y", "vx", "vy"))
+
+
+@pytest.mark.parametrize("mode", ["sequential", "jacobi"])
+def test_settled_pile_matches_run_without_sleep(mode):
+    states = initial_states("bolinha_gravity", 60, seed=0)
+    plain = make_engine("bolinha_gravity", states, collision_mode=mode, rules=PILHA)
+    tracker = SleepTracker(threshold=0.0, frames=30)
+    sleepy = make_engine("bolinha_gravity", states, collision_mode=mode, rules=PILHA, sleep=tracker)
+    for _ in range(500):
+        plain.step_once()
+        sleepy.step_once()
+        assert same_state(plain, sleepy)
+    assert tracker.all_asleep()
+    assert tracker.skipped > 0
+
+
+def test_ball_dropped_on_sleeping_pile_wakes_it():
+    states = initial_states("bolinha_gravity", 60, seed=0)
+    plain = make_engine("bolinha_gravity", states, rules=PILHA)
+    tracker = SleepTracker(threshold=0.0, frames=30)
+    sleepy = make_engine("bolinha_gravity", states, rules=PILHA, sleep=tracker)
+    plain.step(500)
+    sleepy.step(500)
+    assert tracker.all_asleep()
+
+    x = float(sleepy.world.x[np.argmax(sleepy.world.y)])
+    for engine in (plain, sleepy):
+        engine.world.add(x, 100.0, 0.0, -5.0, 5, (255, 0, 0))
+    woke = False
+    for _ in range(100):
+        plain.step_once()
+        sleepy.step_once()
+        woke = woke or not tracker.asleep[:-1].all()
+        assert same_state(plain, sleepy)
+    assert woke
+
+
+@pytest.mark.parametrize("broad_phase", ["grid", "sweep", "tree"])
+def test_sleeping_islands_stay_out_of_the_broad_phase(broad_phase):
+    states = initial_states("bolinha_gravity", 60, seed=0)
+    plain = make_engine("bolinha_gravity", states, rules=PILHA, broad_phase=broad_phase)
+    tracker = SleepTracker(threshold=0.0, frames=30)
+    sleepy = make_engine("bolinha_gravity", states, rules=PILHA, sleep=tracker, broad_phase=broad_phase)
+    plain.step(500)
+    sleepy.step(500)
+
+    seen = []
+    pairs = sleepy.backend.pairs
+
+    def counted(world, idx=None):
+        seen.append(len(world) if idx is None else len(idx))
+        return pairs(world, idx)
+
+    sleepy.backend.pairs = counted
+    x = float(sleepy.world.x[np.argmax(sleepy.world.y)])
+    for engine in (plain, sleepy):
+        engine.world.add(x, 100.0, 0.0, -5.0, 5, (255, 0, 0))
+    for _ in range(100):
+        plain.step_once()
+        sleepy.step_once()
+        assert same_state(plain, sleepy)
+    assert seen and min(seen) < len(sleepy.world) // 4